@@ -0,0 +1,244 @@
+# Text front end: parses assembly listings and memory initialization lines.
+#
+# Everything here takes its inputs explicitly (labels, code layout, store
+# callbacks), so store_load.py and simulator.Simulator can share it. Parse
+# errors are printed and the offending line decodes to None.
+
+def parse_register(reg):
+    reg = reg.strip()
+    if reg.lower().startswith('x') and reg[1:].isdigit():
+        reg_num = int(reg[1:])
+        if 0 <= reg_num < 32:
+            return reg_num
+    print(f"Error: Invalid register {reg}")
+    return None
+
+def parse_immediate(value):
+    try:
+        return int(value, 0)
+    except ValueError:
+        print(f"Error: Invalid immediate value '{value}'")
+        return None
+
+def instruction_splitting(line):
+    line = line.strip()
+    if '#' in line:
+        line = line.split('#')[0].strip()
+
+    if not line:
+        return None, None, None, None, None, None
+
+    parts = line.replace(',', ' ').split()
+    opcode = parts[0].upper()
+
+    # Handling Load and Store Instructions with Offset Notation
+    if opcode in ['SW', 'SB', 'SH', 'LW', 'LH', 'LHU', 'LB', 'LBU']:
+        if len(parts) != 3:
+            print(f"Error: {opcode} instruction missing operands. line='{line}'")
+            return None, None, None, None, None, None
+        reg1 = parse_register(parts[1])
+        try:
+            offset_str, base_register = parts[2].split('(')
+            offset = parse_immediate(offset_str)
+            reg2 = parse_register(base_register[:-1])
+        except ValueError:
+            print(f"Error: Invalid offset notation. line='{line}'")
+            return None, None, None, None, None, None
+        if opcode in ['SW', 'SB', 'SH']:
+            return opcode, None, reg2, reg1, offset, None  # rs2, offset, rs1
+        else:
+            return opcode, reg1, reg2, None, offset, None  # rd, rs1, offset
+
+
+    # Handling JALR Instruction
+    elif opcode == 'JALR':
+        if len(parts) == 2:
+            # Format: jalr rd
+            rd = parse_register(parts[1])
+            return opcode, rd, None, None, 0, None
+        elif len(parts) == 3:
+            # Format: jalr rd, rs1
+            rd = parse_register(parts[1])
+            rs1 = parse_register(parts[2])
+            return opcode, rd, rs1, None, 0, None
+        elif len(parts) == 4:
+            # Format: jalr rd, rs1, imm
+            rd = parse_register(parts[1])
+            rs1 = parse_register(parts[2])
+            imm = parse_immediate(parts[3])
+            return opcode, rd, rs1, None, imm, None
+        else:
+            print(f"Error: JALR instruction missing operands. line='{line}'")
+            return None, None, None, None, None, None
+
+    # Immediate Arithmetic and Logical Instructions
+    elif opcode in ['ADDI', 'ANDI', 'ORI', 'XORI', 'SLTI', 'SLTIU',
+                    'SLLI', 'SRLI', 'SRAI']:
+        if len(parts) != 4:
+            print(f"Error: {opcode} instruction missing operands. line='{line}'")
+            return None, None, None, None, None, None
+        rd = parse_register(parts[1])
+        rs1 = parse_register(parts[2])
+        imm = parse_immediate(parts[3])
+        return opcode, rd, rs1, None, imm, None
+
+    # R-type instructions 
+    elif opcode in ['ADD', 'SUB', 'SLT', 'SLTU', 'XOR', 'OR', 'AND',
+                    'SLL', 'SRL', 'SRA']:
+        if len(parts) != 4:
+            print(f"Error: {opcode} instruction missing operands. line='{line}'")
+            return None, None, None, None, None, None
+        rd = parse_register(parts[1])
+        rs1 = parse_register(parts[2])
+        rs2 = parse_register(parts[3])
+        return opcode, rd, rs1, rs2, None, None
+
+    # Branch Instructions
+    elif opcode in ['BEQ', 'BNE', 'BLT', 'BGE', 'BLTU', 'BGEU']:
+        if len(parts) != 4:
+            print(f"Error: {opcode} instruction missing operands. line='{line}'")
+            return None, None, None, None, None, None
+        rs1 = parse_register(parts[1])
+        rs2 = parse_register(parts[2])
+        label = parts[3]
+        return opcode, None, rs1, rs2, label, None
+
+    # Upper Immediate Instructions
+    elif opcode in ['LUI', 'AUIPC']:
+        if len(parts) != 3:
+            print(f"Error: {opcode} instruction missing operands. line='{line}'")
+            return None, None, None, None, None, None
+        rd = parse_register(parts[1])
+        imm = parse_immediate(parts[2])
+        return opcode, rd, None, None, imm, None
+
+    # Jump Instructions
+    elif opcode == 'JAL':
+        if len(parts) == 2:
+            # Format: jal label
+            rd = 1  # Default return register x1
+            label = parts[1]
+            return opcode, rd, None, None, label, None
+        elif len(parts) == 3:
+            # Format: jal rd, label
+            rd = parse_register(parts[1])
+            label = parts[2]
+            return opcode, rd, None, None, label, None
+        else:
+            print(f"Error: JAL instruction missing operands. line='{line}'")
+            return None, None, None, None, None, None
+
+    # System instructions (ECALL, EBREAK, FENCE, FENCE.TSO, PAUSE)
+    elif opcode in ['ECALL', 'EBREAK', 'FENCE', 'FENCE.TSO', 'PAUSE']:
+        return opcode, None, None, None, None, None
+
+    else:
+        print(f"Error: Unrecognized instruction format. line='{line}'")
+        return None, None, None, None, None, None
+
+# Opcode ids used by the decoded program (the id is the index into OPCODES)
+OPCODES = (
+    'ADD', 'SUB', 'SLT', 'SLTU', 'XOR', 'OR', 'AND', 'SLL', 'SRL', 'SRA',
+    'ADDI', 'ANDI', 'ORI', 'XORI', 'SLTI', 'SLTIU', 'SLLI', 'SRLI', 'SRAI',
+    'BEQ', 'BNE', 'BLT', 'BGE', 'BLTU', 'BGEU',
+    'LW', 'LH', 'LHU', 'LB', 'LBU', 'SW', 'SH', 'SB',
+    'JAL', 'JALR', 'LUI', 'AUIPC',
+    'ECALL', 'EBREAK', 'FENCE', 'FENCE.TSO', 'PAUSE'
+)
+OPCODE_IDS = {opcode: op_id for op_id, opcode in enumerate(OPCODES)}
+
+# Operands each opcode group needs before it can be executed
+REQUIRED_OPERANDS = {}
+for _opcode in ['ADD', 'SUB', 'SLT', 'SLTU', 'XOR', 'OR', 'AND', 'SLL', 'SRL', 'SRA']:
+    REQUIRED_OPERANDS[_opcode] = ('rd', 'rs1', 'rs2')
+for _opcode in ['ADDI', 'ANDI', 'ORI', 'XORI', 'SLTI', 'SLTIU', 'SLLI', 'SRLI', 'SRAI',
+                'LW', 'LH', 'LHU', 'LB', 'LBU', 'JALR']:
+    REQUIRED_OPERANDS[_opcode] = ('rd', 'rs1', 'imm')
+for _opcode in ['SW', 'SH', 'SB']:
+    REQUIRED_OPERANDS[_opcode] = ('rs1', 'rs2', 'imm')
+for _opcode in ['BEQ', 'BNE', 'BLT', 'BGE', 'BLTU', 'BGEU']:
+    REQUIRED_OPERANDS[_opcode] = ('rs1', 'rs2', 'imm')
+for _opcode in ['JAL', 'LUI', 'AUIPC']:
+    REQUIRED_OPERANDS[_opcode] = ('rd', 'imm')
+for _opcode in ['ECALL', 'EBREAK', 'FENCE', 'FENCE.TSO', 'PAUSE']:
+    REQUIRED_OPERANDS[_opcode] = ()
+
+def collect_labels(instruction_lines, code_base=0, pc_stride=1):
+    # First pass: strip comments and blank lines, and map every label to the
+    # address of the instruction after it. Returns (instructions, labels).
+    labels = {}
+    executable_instructions = []
+    for line in instruction_lines:
+        stripped_line = line.strip()
+
+        # Remove comments
+        if '#' in stripped_line:
+            stripped_line = stripped_line.split('#')[0].strip()
+
+        # Skip empty lines
+        if not stripped_line:
+            continue
+
+        # Check for labels
+        if stripped_line.endswith(':'):
+            label_name = stripped_line[:-1].strip()
+            if label_name in labels:
+                raise ValueError(f"Duplicate label '{label_name}' found.")
+            labels[label_name] = code_base + len(executable_instructions) * pc_stride
+        else:
+            executable_instructions.append(stripped_line)
+    return executable_instructions, labels
+
+def decode_program(instruction_list, labels, code_base=0, pc_stride=1):
+    # One-time decode pass: every executable line becomes a record
+    # (opcode id, rd, rs1, rs2, imm_or_label, target) and the fetch loop only
+    # indexes into the resulting list. Lines that fail to parse are reported
+    # here once and stored as None so execution skips them.
+    decoded = []
+    for index, line in enumerate(instruction_list):
+        opcode, rd, rs1, rs2, imm_or_label, _ = instruction_splitting(line)
+        if not opcode:
+            decoded.append(None)
+            continue
+        operands = {'rd': rd, 'rs1': rs1, 'rs2': rs2, 'imm': imm_or_label}
+        missing = [name for name in REQUIRED_OPERANDS[opcode] if operands[name] is None]
+        if missing:
+            print(f"Error: {opcode} instruction at index {index} has invalid operands {missing}. line='{line}'")
+            decoded.append(None)
+            continue
+
+        # Resolve branch and jump labels (addresses) to their instruction index up front
+        target = None
+        if opcode in ['BEQ', 'BNE', 'BLT', 'BGE', 'BLTU', 'BGEU', 'JAL']:
+            if imm_or_label in labels:
+                target = (labels[imm_or_label] - code_base) // pc_stride
+            else:
+                print(f"Error: Label '{imm_or_label}' not found. line='{line}'")
+
+        decoded.append((OPCODE_IDS[opcode], rd, rs1, rs2, imm_or_label, target))
+    return decoded
+
+def apply_memory_line(line, store_byte, store_word):
+    # One 'address, value' memory initialization line: a "string", a 'c'har
+    # or a number (stored as a word)
+    parts = line.split(',')
+    if len(parts) != 2:
+        print(f"Error: Invalid memory initialization line '{line}'. Expected format 'address,value'.")
+        return
+    address_str, value_str = parts
+    address = int(address_str.strip(), 0)
+    value = value_str.strip()
+    if value.startswith('"') and value.endswith('"'):
+        # Handle string values
+        string_value = value[1:-1]
+        for i, char in enumerate(string_value):
+            store_byte(address + i, ord(char))
+    elif value.startswith("'") and value.endswith("'"):
+        # Handle character values
+        if len(value) != 3:
+            print(f"Error: Invalid character value '{value}'.")
+            return
+        store_byte(address, ord(value[1]))
+    else:
+        # Handle numeric values
+        store_word(address, int(value, 0))
@@ -0,0 +1,200 @@
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import expected_state
+import memory_model
+import simulator as simulator_module
+from simulator import Simulator
+
+# Batch runner: executes many programs in parallel, one Simulator per
+# program, across a pool of worker processes (one per core by default).
+#
+#     python batch_runner.py "Tests/Test Cases for Submission" --output-dir results
+#
+# Inputs are files, directories (every program inside) or glob patterns.
+# For a program foo.txt the runner also picks up, when present:
+#
+#   foo.mem             memory initialization file (--memory applies one to all)
+#   foo.expected.json   expected final state, see expected_state.py
+#
+# --update-goldens turns the run into a reference run that rewrites the
+# expected-state files from the final states instead of checking them.
+#
+# Results are printed as each program finishes, followed by a timing
+# report. Workers only send back a small summary; the full final state is
+# written by the worker itself to <output-dir>/<program>.state.json.
+
+PROGRAM_EXTENSIONS = ('.txt', '.s', '.asm', '.bin', '.img', '.raw', '.elf')
+MEMORY_SUFFIX = '.mem'
+DEFAULT_MAX_STEPS = 10_000_000
+DEFAULT_TIME_LIMIT = 60.0
+
+def is_program_file(path):
+    name = os.path.basename(path)
+    if name.endswith(expected_state.EXPECTED_SUFFIX) or name.endswith('.state.json'):
+        return False
+    extension = os.path.splitext(name)[1]
+    return extension.lower() in PROGRAM_EXTENSIONS or (not extension and os.path.isfile(path))
+
+def collect_programs(inputs):
+    # Expand files, directories and glob patterns, keeping the given order
+    programs = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths = sorted(os.path.join(item, name) for name in os.listdir(item))
+            programs += [path for path in paths if os.path.isfile(path) and is_program_file(path)]
+        elif os.path.isfile(item):
+            programs.append(item)
+        else:
+            matches = sorted(glob.glob(item, recursive=True))
+            if not matches:
+                raise ValueError(f"no programs match '{item}'")
+            programs += [path for path in matches if os.path.isfile(path) and is_program_file(path)]
+    unique = list(dict.fromkeys(os.path.normpath(path) for path in programs))
+    if not unique:
+        raise ValueError("no programs to run")
+    return unique
+
+def companion_file(program, suffix):
+    path = os.path.splitext(program)[0] + suffix
+    return path if os.path.isfile(path) else None
+
+def state_file_name(program):
+    # Flatten the program path so programs with the same name in different
+    # directories do not overwrite each other's results
+    relative = os.path.relpath(program)
+    if relative.startswith('..'):
+        relative = os.path.abspath(program).lstrip(os.sep)
+    return os.path.splitext(relative)[0].replace(os.sep, '__') + '.state.json'
+
+def state_to_json(state):
+    state = dict(state)
+    state['memory'] = {f"0x{address:08X}": value for address, value in sorted(state['memory'].items())}
+    return state
+
+def run_program(program, memory_file, expected_file, max_steps, memory_backend, output_dir,
+                update_golden=False, memory_ranges=None, time_limit=None):
+    # Worker: run one program to completion. Never raises, so one broken
+    # program cannot take the batch down.
+    result = {'program': program, 'status': 'error', 'steps': 0, 'elapsed': 0.0, 'details': []}
+    output = io.StringIO()
+    simulator = Simulator(memory_backend)
+    try:
+        with contextlib.redirect_stdout(output):
+            simulator.load(program, memory_file)
+            run = simulator.run(max_steps, time_limit)
+        result['elapsed'] = run.elapsed
+        result['steps'] = simulator.steps
+        if run.stop_reason == simulator_module.STOP_STEP_BUDGET:
+            result['status'] = 'budget'
+            result['details'].append(f"step budget of {max_steps} instructions exhausted")
+        elif run.stop_reason == simulator_module.STOP_TIME_BUDGET:
+            result['status'] = 'budget'
+            result['details'].append(f"time budget of {time_limit}s exhausted after {run.steps} instructions")
+        elif update_golden:
+            golden_path = expected_file or os.path.splitext(program)[0] + expected_state.EXPECTED_SUFFIX
+            expected_state.save_expected(golden_path,
+                                         expected_state.golden_from_simulator(simulator, memory_ranges))
+            result['status'] = 'updated'
+        elif expected_file is None:
+            result['status'] = 'ran'
+        else:
+            result['details'] = expected_state.check_simulator(simulator, expected_state.load_expected(expected_file))
+            result['status'] = 'fail' if result['details'] else 'pass'
+        if output_dir:
+            state = state_to_json(simulator.snapshot())
+            state['program'] = program
+            state['messages'] = output.getvalue().splitlines()
+            with open(os.path.join(output_dir, state_file_name(program)), 'w') as file:
+                json.dump(state, file, indent=1)
+    except Exception as e:
+        result['details'].append(f"{type(e).__name__}: {e}")
+    finally:
+        simulator.close()
+    result['messages'] = len(output.getvalue().splitlines())
+    return result
+
+def format_result(result):
+    line = (f"{result['status'].upper():<7} {result['program']}  "
+            f"{result['steps']} steps  {result['elapsed'] * 1000:.2f} ms")
+    if result['messages']:
+        line += f"  ({result['messages']} loader messages)"
+    return '\n'.join([line] + [f"        {detail}" for detail in result['details']])
+
+def print_report(results, wall_time, jobs):
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    busy = sum(result['elapsed'] for result in results)
+    steps = sum(result['steps'] for result in results)
+    print(f"\n{'='*25} Batch Report {'='*25}")
+    print(f"Programs: {len(results)}  " + '  '.join(f"{status}: {count}" for status, count in sorted(counts.items())))
+    print(f"Workers: {jobs}  Wall time: {wall_time:.3f}s  Simulation time: {busy:.3f}s  "
+          f"Parallel speedup: {busy / wall_time if wall_time > 0 else 0.0:.2f}x")
+    print(f"Instructions: {steps}  ({steps / wall_time if wall_time > 0 else 0.0:,.0f} instructions/s overall)")
+    slowest = sorted(results, key=lambda result: result['elapsed'], reverse=True)[:5]
+    if slowest:
+        print("Slowest programs:")
+        for result in slowest:
+            print(f"  {result['elapsed'] * 1000:10.2f} ms  {result['program']}")
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Run many RV32I programs in parallel")
+    parser.add_argument('inputs', nargs='+', help="program files, directories or glob patterns")
+    parser.add_argument('--memory', default=None,
+                        help="memory initialization file for every program (default: <program>.mem if present)")
+    parser.add_argument('--memory-backend', choices=list(memory_model.MEMORY_BACKENDS), default='paged',
+                        help="memory backend used by every simulator")
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: number of cores)")
+    parser.add_argument('--max-steps', type=int, default=DEFAULT_MAX_STEPS,
+                        help="instructions a program may run before it is stopped and reported as over budget")
+    parser.add_argument('--time-limit', type=float, default=DEFAULT_TIME_LIMIT,
+                        help="seconds a program may run before it is stopped and reported as over budget")
+    parser.add_argument('--output-dir', default=None,
+                        help="directory for the per-program <program>.state.json final states")
+    parser.add_argument('--update-goldens', action='store_true',
+                        help="treat this run as the reference: (re)write every <program>.expected.json")
+    parser.add_argument('--memory-range', action='append', type=expected_state.parse_memory_range, default=None,
+                        metavar='START:END',
+                        help="with --update-goldens: memory range to record (repeatable; "
+                             "default: every byte the program wrote)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    try:
+        programs = collect_programs(args.inputs)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    jobs = max(1, min(args.jobs, len(programs)))
+
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(run_program, program,
+                                   args.memory or companion_file(program, MEMORY_SUFFIX),
+                                   companion_file(program, expected_state.EXPECTED_SUFFIX),
+                                   args.max_steps, args.memory_backend, args.output_dir,
+                                   args.update_goldens, args.memory_range, args.time_limit)
+                   for program in programs]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(format_result(result), flush=True)
+    print_report(results, time.perf_counter() - start, jobs)
+    if any(result['status'] in ('fail', 'error', 'budget') for result in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
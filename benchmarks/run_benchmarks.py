@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+# Benchmark runner for the simulator.
+#
+# Every kernel in benchmarks/kernels is run through store_load.py, once per
+# engine and memory backend, each in its own process so peak RSS and
+# timings are not polluted by earlier runs:
+#
+#     python benchmarks/run_benchmarks.py --json results.json
+#     python benchmarks/run_benchmarks.py --compare results.json
+#
+# For every run it reports the instructions executed, MIPS (from the
+# engine's own timing of the execution loop), the wall time of the whole
+# process and its peak RSS. Per-opcode costs come from generated
+# micro-kernels: a loop whose body repeats one instruction
+# OPCODE_BODY_COPIES times, minus the same loop with an empty body.
+#
+# --compare prints the MIPS ratio against an earlier --json file, so the
+# effect of a change can be checked commit against commit.
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+KERNEL_DIR = os.path.join(BENCHMARK_DIR, 'kernels')
+SIMULATOR = os.path.join(os.path.dirname(BENCHMARK_DIR), 'store_load.py')
+
+# Benchmark engine name -> store_load.py arguments
+ENGINES = {
+    'interp': ['--engine', 'interp'],
+    'closure': ['--engine', 'closure'],
+    'block': ['--engine', 'block', '--no-jit'],
+    'jit': ['--engine', 'block'],
+}
+MEMORY_BACKENDS = ['dict', 'paged']
+
+STATISTICS_LINE = re.compile(r"Engine '\w+': executed (\d+) instructions in ([0-9.]+)s")
+
+# Micro-kernel instruction per opcode; x6/x7 hold distinct non-zero values,
+# loads and stores use a fixed scratch word, BEQ is never taken and BNE
+# always falls through to its own next instruction
+OPCODE_BODIES = {
+    'ADD': 'ADD x5, x6, x7', 'SUB': 'SUB x5, x6, x7', 'XOR': 'XOR x5, x6, x7',
+    'SLL': 'SLL x5, x6, x7', 'SRA': 'SRA x5, x6, x7', 'SLT': 'SLT x5, x6, x7',
+    'ADDI': 'ADDI x5, x6, 12', 'ANDI': 'ANDI x5, x6, 255', 'SLLI': 'SLLI x5, x6, 3',
+    'LUI': 'LUI x5, 0x12345000', 'AUIPC': 'AUIPC x5, 0x1000',
+    'LW': 'LW x5, 256(x0)', 'LH': 'LH x5, 256(x0)', 'LB': 'LB x5, 256(x0)', 'LBU': 'LBU x5, 256(x0)',
+    'SW': 'SW x6, 256(x0)', 'SH': 'SH x6, 256(x0)', 'SB': 'SB x6, 256(x0)',
+    'BEQ': 'BEQ x6, x7, {next}', 'BNE': 'BNE x6, x7, {next}', 'JAL': 'JAL x0, {next}',
+}
+OPCODE_BODY_COPIES = 16
+OPCODE_ITERATIONS = 1500
+
+def opcode_kernel(opcode, iterations=OPCODE_ITERATIONS):
+    # Listing for one micro-kernel; opcode None gives the empty loop
+    lines = ["ADDI x6, x0, 1234", "ADDI x7, x0, 5", "SW x7, 256(x0)",
+             f"ADDI x31, x0, {iterations}", "loop:"]
+    if opcode is not None:
+        for copy in range(OPCODE_BODY_COPIES):
+            lines.append("    " + OPCODE_BODIES[opcode].format(next=f"next_{copy}"))
+            lines.append(f"next_{copy}:")
+    lines += ["    ADDI x31, x31, -1", "    BNE x31, x0, loop"]
+    return '\n'.join(lines) + '\n'
+
+def list_kernels(names=None):
+    kernels = sorted(name[:-len('.txt')] for name in os.listdir(KERNEL_DIR) if name.endswith('.txt'))
+    if names:
+        unknown = [name for name in names if name not in kernels]
+        if unknown:
+            raise ValueError(f"unknown kernels {unknown}, available: {kernels}")
+        kernels = [name for name in kernels if name in names]
+    return kernels
+
+def peak_rss_bytes(rusage):
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return rusage.ru_maxrss if sys.platform == 'darwin' else rusage.ru_maxrss * 1024
+
+def run_simulator(program, engine, memory_backend):
+    # Run one program in a fresh process; returns (steps, elapsed, wall, peak RSS)
+    command = [sys.executable, SIMULATOR, program, '--trace', 'final',
+               '--memory-backend', memory_backend] + ENGINES[engine]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    output = process.stdout.read()
+    process.stdout.close()
+    if hasattr(os, 'wait4'):
+        _, status, rusage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        rss = peak_rss_bytes(rusage)
+    else:
+        process.wait()
+        rss = None
+    wall = time.perf_counter() - start
+    match = STATISTICS_LINE.search(output)
+    if match is None:
+        raise RuntimeError(f"{engine}/{memory_backend} run of {program} failed:\n{output[-2000:]}")
+    return int(match.group(1)), float(match.group(2)), wall, rss
+
+def best_run(program, engine, memory_backend, repeat):
+    # Fastest of `repeat` runs (least disturbed by the rest of the machine)
+    runs = [run_simulator(program, engine, memory_backend) for _ in range(repeat)]
+    return min(runs, key=lambda run: run[1])
+
+def benchmark_kernels(kernels, engines, memory_backends, repeat):
+    results = []
+    for kernel in kernels:
+        program = os.path.join(KERNEL_DIR, kernel + '.txt')
+        for engine in engines:
+            for memory_backend in memory_backends:
+                steps, elapsed, wall, rss = best_run(program, engine, memory_backend, repeat)
+                result = {'kernel': kernel, 'engine': engine, 'memory_backend': memory_backend,
+                          'instructions': steps, 'seconds': elapsed, 'wall_seconds': wall,
+                          'mips': steps / elapsed / 1e6 if elapsed > 0 else 0.0, 'peak_rss': rss}
+                results.append(result)
+                print(f"{kernel:<10} {engine:<8} {memory_backend:<6} {steps:>10} {elapsed:>9.3f}s "
+                      f"{wall:>9.3f}s {result['mips']:>8.3f} {format_rss(rss):>10}", flush=True)
+    return results
+
+def measure_opcode_costs(opcodes, engines, memory_backends, repeat):
+    # {engine: {backend: {opcode: nanoseconds per instruction}}}
+    costs = {}
+    with tempfile.TemporaryDirectory() as directory:
+        programs = {}
+        for opcode in [None] + opcodes:
+            programs[opcode] = os.path.join(directory, f"{opcode or 'empty'}.txt")
+            with open(programs[opcode], 'w') as file:
+                file.write(opcode_kernel(opcode))
+        for engine in engines:
+            for memory_backend in memory_backends:
+                baseline = best_run(programs[None], engine, memory_backend, repeat)
+                table = costs.setdefault(engine, {}).setdefault(memory_backend, {})
+                for opcode in opcodes:
+                    steps, elapsed, _, _ = best_run(programs[opcode], engine, memory_backend, repeat)
+                    extra = steps - baseline[0]
+                    table[opcode] = max(elapsed - baseline[1], 0.0) / extra * 1e9 if extra else 0.0
+                print(f"{engine:<8} {memory_backend:<6} " +
+                      ' '.join(f"{opcode}={table[opcode]:.0f}" for opcode in opcodes), flush=True)
+    return costs
+
+def format_rss(rss):
+    return '-' if rss is None else f"{rss / (1 << 20):.1f} MiB"
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_comparison(results, baseline_path):
+    with open(baseline_path, 'r') as file:
+        baseline = json.load(file)
+    previous = {(result['kernel'], result['engine'], result['memory_backend']): result
+                for result in baseline['results']}
+    print(f"\n{'='*25} Compared with {baseline.get('revision') or baseline_path} {'='*25}")
+    for result in results:
+        old = previous.get((result['kernel'], result['engine'], result['memory_backend']))
+        if old and old['mips'] > 0:
+            print(f"{result['kernel']:<10} {result['engine']:<8} {result['memory_backend']:<6} "
+                  f"{old['mips']:>8.3f} -> {result['mips']:>8.3f} MIPS ({result['mips'] / old['mips']:.2f}x)")
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the RV32I simulator engines and memory backends")
+    parser.add_argument('--kernels', nargs='+', default=None, help="kernels to run (default: all)")
+    parser.add_argument('--engines', nargs='+', choices=list(ENGINES), default=list(ENGINES))
+    parser.add_argument('--memory-backends', nargs='+', choices=MEMORY_BACKENDS, default=MEMORY_BACKENDS)
+    parser.add_argument('--repeat', type=int, default=1, help="runs per measurement, the fastest is kept")
+    parser.add_argument('--opcodes', nargs='+', choices=list(OPCODE_BODIES), default=list(OPCODE_BODIES),
+                        help="opcodes to measure the per-instruction cost of")
+    parser.add_argument('--no-opcode-costs', action='store_true', help="skip the per-opcode micro-kernels")
+    parser.add_argument('--json', default=None, help="write all results to this file")
+    parser.add_argument('--compare', default=None, help="earlier --json file to compare MIPS against")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    try:
+        kernels = list_kernels(args.kernels)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print(f"{'kernel':<10} {'engine':<8} {'memory':<6} {'instrs':>10} {'run':>10} {'wall':>10} "
+          f"{'MIPS':>8} {'peak RSS':>10}")
+    results = benchmark_kernels(kernels, args.engines, args.memory_backends, args.repeat)
+    opcode_costs = None
+    if not args.no_opcode_costs:
+        print(f"\n{'='*25} Per-opcode cost (ns per instruction) {'='*25}")
+        opcode_costs = measure_opcode_costs(args.opcodes, args.engines, args.memory_backends, args.repeat)
+
+    if args.compare:
+        print_comparison(results, args.compare)
+    if args.json:
+        report = {'revision': git_revision(), 'python': platform.python_version(),
+                  'machine': platform.machine(), 'results': results, 'opcode_costs': opcode_costs}
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+import sys
+from array import array
+from itertools import compress, repeat
+from operator import add, and_, floordiv, is_, is_not, mul, not_, or_
+
+# Loader for raw little-endian RV32I machine code (flat .bin images).
+#
+# Instruction words are decoded by opcode/funct3/funct7 into the same records
+# assembler.decode_program() produces for assembly text:
+#
+#     (opcode id, rd, rs1, rs2, imm_or_label, target)
+#
+# Branch and JAL offsets are resolved to instruction indexes (target). The
+# label slot holds a synthesized name for the target (e.g. 'L_00000010'),
+# also added to labels with its byte address, so listings, traces and the
+# debugger can name it.
+#
+# decode_image() works on whole columns instead of word by word: the words
+# are grouped by encoding layout with bytes.translate() and compress(), each
+# group is split into its four byte columns with strided slices, and every
+# field is put together from per-byte lookup tables with map(), so the
+# Python-level work per word is a handful of C calls. Repetitive groups are
+# decoded once per distinct word, and the listing is disassembled lazily
+# (see Listing). decode_word() is the readable single-word reference.
+
+# File extensions treated as raw machine-code programs
+BINARY_EXTENSIONS = ('.bin', '.img', '.raw')
+
+R_TYPE = {  # (funct3, funct7) -> opcode
+    (0, 0x00): 'ADD', (0, 0x20): 'SUB', (1, 0x00): 'SLL', (2, 0x00): 'SLT',
+    (3, 0x00): 'SLTU', (4, 0x00): 'XOR', (5, 0x00): 'SRL', (5, 0x20): 'SRA',
+    (6, 0x00): 'OR', (7, 0x00): 'AND'
+}
+I_TYPE = {0: 'ADDI', 2: 'SLTI', 3: 'SLTIU', 4: 'XORI', 6: 'ORI', 7: 'ANDI'}
+SHIFT_IMMEDIATE = {(1, 0x00): 'SLLI', (5, 0x00): 'SRLI', (5, 0x20): 'SRAI'}
+LOADS = {0: 'LB', 1: 'LH', 2: 'LW', 4: 'LBU', 5: 'LHU'}
+STORES = {0: 'SB', 1: 'SH', 2: 'SW'}
+BRANCHES = {0: 'BEQ', 1: 'BNE', 4: 'BLT', 5: 'BGE', 6: 'BLTU', 7: 'BGEU'}
+
+FENCE_TSO_WORD = 0x8330000F
+PAUSE_WORD = 0x0100000F
+
+def is_binary_program(path):
+    return path.lower().endswith(BINARY_EXTENSIONS)
+
+def sign_extend(value, bits):
+    sign_bit = 1 << (bits - 1)
+    return (value & (sign_bit - 1)) - (value & sign_bit)
+
+def byte_table(function):
+    # bytes.translate() table applying function to every byte value
+    return bytes(function(value) for value in range(256))
+
+def lookup_table(function):
+    # The same for results that do not fit a byte; used with map(table.__getitem__, column)
+    return [function(value) for value in range(256)]
+
+def opcode_name(major, funct3, funct7):
+    # The opcode/funct3/funct7 part of decode_word(); None where invalid
+    if major == 0x33:
+        return R_TYPE.get((funct3, funct7))
+    if major == 0x13:
+        return I_TYPE.get(funct3) or SHIFT_IMMEDIATE.get((funct3, funct7))
+    if major == 0x03:
+        return LOADS.get(funct3)
+    if major == 0x23:
+        return STORES.get(funct3)
+    if major == 0x63:
+        return BRANCHES.get(funct3)
+    if major == 0x67:
+        return 'JALR' if funct3 == 0 else None
+    return {0x6F: 'JAL', 0x37: 'LUI', 0x17: 'AUIPC'}[major]
+
+# Words are decoded in groups that share an encoding layout. Within a
+# layout, (class << 10) | (funct3 << 7) | funct7 picks the opcode, where the
+# class tells the major opcodes of the layout apart. SYSTEM (ECALL/EBREAK)
+# and MISC-MEM (FENCE...) words are matched on the whole word instead.
+LAYOUTS = {  # layout -> major opcodes, in class order
+    'R': (0x33,), 'I': (0x13, 0x03, 0x67), 'S': (0x23,), 'B': (0x63,), 'J': (0x6F,),
+    'U': (0x37, 0x17), 'SYSTEM': (0x73, 0x0F),
+}
+LAYOUT_NAMES = (None,) + tuple(LAYOUTS)  # code 0: not an instruction
+LAYOUT_OF_MAJOR = {major: layout for layout, majors in LAYOUTS.items() for major in majors}
+CLASS_OF_MAJOR = {major: cls for majors in LAYOUTS.values() for cls, major in enumerate(majors)}
+LAYOUT_CODES = byte_table(lambda byte: LAYOUT_NAMES.index(LAYOUT_OF_MAJOR.get(byte & 0x7F)))
+LAYOUT_SELECTORS = [byte_table(lambda byte: byte == code) for code in range(len(LAYOUT_NAMES))]
+OPCODE_TABLES = {
+    layout: [opcode_name(majors[key >> 10], (key >> 7) & 0x7, key & 0x7F) for key in range(len(majors) << 10)]
+    for layout, majors in LAYOUTS.items() if layout != 'SYSTEM'
+}
+# Words sampled from the start of a group to tell whether it is repetitive
+REPEAT_SAMPLE = 4096
+
+# I-layout immediates; a shift keeps only its shamt
+IMMEDIATE_MASKS = [0x1F if name in ('SLLI', 'SRLI', 'SRAI') else -1 for name in OPCODE_TABLES['I']]
+
+# Field pieces by the byte they come from (byte 0 holds bits 0-7, and so on)
+HIGH_BIT = byte_table(lambda byte: byte >> 7)
+HIGH_NIBBLE = byte_table(lambda byte: byte >> 4)
+HIGH_SEVEN = byte_table(lambda byte: byte >> 1)                # funct7 from byte 3
+LOW_NIBBLE_X2 = byte_table(lambda byte: (byte & 0xF) << 1)
+LOW_BIT_X16 = byte_table(lambda byte: (byte & 0x1) << 4)
+CLASS_X1024 = lookup_table(lambda byte: CLASS_OF_MAJOR.get(byte & 0x7F, 0) << 10)
+FUNCT3_X128 = lookup_table(lambda byte: ((byte >> 4) & 0x7) << 7)
+I_IMMEDIATE_HIGH = lookup_table(lambda byte: sign_extend(byte, 8) << 4)
+S_IMMEDIATE_HIGH = lookup_table(lambda byte: sign_extend(byte >> 1, 7) << 5)
+UPPER_B1 = lookup_table(lambda byte: (byte & 0xF0) << 8)
+UPPER_B2 = lookup_table(lambda byte: byte << 16)
+UPPER_B3 = lookup_table(lambda byte: byte << 24)
+BRANCH_B0 = lookup_table(lambda byte: (byte >> 7) << 11)
+BRANCH_B3 = lookup_table(lambda byte: -((byte >> 7) << 12) + (((byte >> 1) & 0x3F) << 5))
+JAL_B1 = lookup_table(lambda byte: (byte >> 4) << 12)
+JAL_B2 = lookup_table(lambda byte: ((byte & 0xF) << 16) | (((byte >> 4) & 0x1) << 11) | ((byte >> 5) << 1))
+JAL_B3 = lookup_table(lambda byte: -((byte >> 7) << 20) + ((byte & 0x7F) << 4))
+
+def decode_word(word):
+    # Decode one instruction word into (opcode, rd, rs1, rs2, imm, branch offset).
+    # The branch offset (in bytes) is only set for branches and JAL.
+    # Returns None for words that are not RV32I instructions.
+    opcode = word & 0x7F
+    rd = (word >> 7) & 0x1F
+    funct3 = (word >> 12) & 0x7
+    rs1 = (word >> 15) & 0x1F
+    rs2 = (word >> 20) & 0x1F
+    funct7 = word >> 25
+
+    if opcode == 0x33:
+        name = R_TYPE.get((funct3, funct7))
+        return name and (name, rd, rs1, rs2, None, None)
+    if opcode == 0x13:
+        if funct3 in I_TYPE:
+            return (I_TYPE[funct3], rd, rs1, None, sign_extend(word >> 20, 12), None)
+        name = SHIFT_IMMEDIATE.get((funct3, funct7))
+        return name and (name, rd, rs1, None, rs2, None)  # rs2 field holds shamt
+    if opcode == 0x03:
+        name = LOADS.get(funct3)
+        return name and (name, rd, rs1, None, sign_extend(word >> 20, 12), None)
+    if opcode == 0x23:
+        name = STORES.get(funct3)
+        offset = sign_extend((funct7 << 5) | rd, 12)
+        return name and (name, None, rs1, rs2, offset, None)
+    if opcode == 0x63:
+        name = BRANCHES.get(funct3)
+        offset = sign_extend(((word >> 31) << 12) | (((word >> 7) & 0x1) << 11)
+                             | (((word >> 25) & 0x3F) << 5) | (((word >> 8) & 0xF) << 1), 13)
+        return name and (name, None, rs1, rs2, None, offset)
+    if opcode == 0x6F:
+        offset = sign_extend(((word >> 31) << 20) | (((word >> 12) & 0xFF) << 12)
+                             | (((word >> 20) & 0x1) << 11) | (((word >> 21) & 0x3FF) << 1), 21)
+        return ('JAL', rd, None, None, None, offset)
+    if opcode == 0x67 and funct3 == 0:
+        return ('JALR', rd, rs1, None, sign_extend(word >> 20, 12), None)
+    if opcode == 0x37:
+        return ('LUI', rd, None, None, word & 0xFFFFF000, None)
+    if opcode == 0x17:
+        return ('AUIPC', rd, None, None, word & 0xFFFFF000, None)
+    if opcode == 0x73 and funct3 == 0 and rs1 == 0 and rd == 0:
+        if word >> 20 == 0:
+            return ('ECALL', None, None, None, None, None)
+        if word >> 20 == 1:
+            return ('EBREAK', None, None, None, None, None)
+        return None
+    if opcode == 0x0F and funct3 == 0:
+        if word == FENCE_TSO_WORD:
+            return ('FENCE.TSO', None, None, None, None, None)
+        if word == PAUSE_WORD:
+            return ('PAUSE', None, None, None, None, None)
+        return ('FENCE', None, None, None, None, None)
+    return None
+
+def disassemble(opcode, rd, rs1, rs2, imm_or_label):
+    # Assembly text for a decoded instruction, in the syntax instruction_splitting() reads
+    if opcode in ['ADD', 'SUB', 'SLT', 'SLTU', 'XOR', 'OR', 'AND', 'SLL', 'SRL', 'SRA']:
+        return f"{opcode} x{rd}, x{rs1}, x{rs2}"
+    if opcode in ['ADDI', 'ANDI', 'ORI', 'XORI', 'SLTI', 'SLTIU', 'SLLI', 'SRLI', 'SRAI', 'JALR']:
+        return f"{opcode} x{rd}, x{rs1}, {imm_or_label}"
+    if opcode in ['LW', 'LH', 'LHU', 'LB', 'LBU']:
+        return f"{opcode} x{rd}, {imm_or_label}(x{rs1})"
+    if opcode in ['SW', 'SH', 'SB']:
+        return f"{opcode} x{rs2}, {imm_or_label}(x{rs1})"
+    if opcode in ['BEQ', 'BNE', 'BLT', 'BGE', 'BLTU', 'BGEU']:
+        return f"{opcode} x{rs1}, x{rs2}, {imm_or_label}"
+    if opcode == 'JAL':
+        return f"{opcode} x{rd}, {imm_or_label}"
+    if opcode in ['LUI', 'AUIPC']:
+        return f"{opcode} x{rd}, 0x{imm_or_label:X}"
+    return opcode
+
+def resolve_branch(index, offset, base_address, instruction_count):
+    # (label, target address, target index) of a branch/JAL byte offset. The
+    # index is None when the target is not an instruction; a target just past
+    # the last word ends the program, like a label at the end of a listing.
+    target_address = base_address + index * 4 + offset
+    target = None
+    if offset % 4 == 0 and 0 <= index + offset // 4 <= instruction_count:
+        target = index + offset // 4
+    return f"L_{target_address:08X}", target_address, target
+
+def decode_instruction(word, opcode_ids, index, base_address, instruction_count):
+    # (record, listing line) for a single word at the given index, used when
+    # code is rewritten while the program runs
+    template = decode_word(word)
+    if template is None:
+        return None, f".word 0x{word:08X}"
+    opcode, rd, rs1, rs2, imm, offset = template
+    target = None
+    if offset is not None:
+        imm, _, target = resolve_branch(index, offset, base_address, instruction_count)
+    return (opcode_ids[opcode], rd, rs1, rs2, imm, target), disassemble(opcode, rd, rs1, rs2, imm)
+
+def read_words(data):
+    # Little-endian 32-bit words; a trailing partial word is ignored
+    words = array('I')
+    words.frombytes(bytes(data[:len(data) - len(data) % 4]))
+    if sys.byteorder == 'big':
+        words.byteswap()
+    return words
+
+class Listing:
+    # Listing lines of a decoded image, disassembled the first time each is
+    # read: most lines of a large image are never shown, and formatting them
+    # all would cost more than the decode itself. Lines can be replaced, for
+    # code rewritten while the program runs.
+    def __init__(self, words, base_address):
+        self.words = words
+        self.base_address = base_address
+        self.lines = {}
+
+    def __len__(self):
+        return len(self.words)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self.words)))]
+        if index < 0:
+            index += len(self.words)
+        line = self.lines.get(index)
+        if line is None:
+            line = self.lines[index] = listing_line(self.words[index], index, self.base_address, len(self.words))
+        return line
+
+    def __setitem__(self, index, line):
+        self.lines[index % len(self.words)] = line
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self.words)))
+
+def listing_line(word, index, base_address, instruction_count):
+    template = decode_word(word)
+    if template is None:
+        return f".word 0x{word:08X}"
+    opcode, rd, rs1, rs2, imm, offset = template
+    if offset is not None:
+        imm = resolve_branch(index, offset, base_address, instruction_count)[0]
+    return disassemble(opcode, rd, rs1, rs2, imm)
+
+def decode_image(data, opcode_ids, base_address=0):
+    # Decode a flat machine-code image. Returns (decoded program, listing,
+    # labels, count of undecodable words). Undecodable words decode to None
+    # and are listed as '.word' data.
+    words = read_words(data)
+    instruction_count = len(words)
+    word_list = words.tolist()
+    layouts = bytes(data[0:instruction_count * 4:4]).translate(LAYOUT_CODES)
+    targets_found = {}  # layout -> (indexes, labels, addresses) of resolved branches/JALs
+
+    # Decode the words of each layout together, then merge the records back
+    # into program order: every word takes the next record of its group
+    groups = [repeat(None)] * len(LAYOUT_NAMES)
+    invalid_words = layouts.count(0)
+    for code, layout in enumerate(LAYOUT_NAMES):
+        if layout is None or bytes([code]) not in layouts:
+            continue
+        selector = layouts.translate(LAYOUT_SELECTORS[code])
+        group = list(compress(word_list, selector))
+        if layout in ('B', 'J'):
+            indexes = list(compress(range(instruction_count), selector))
+            records = decode_layout(layout, op_ids_of(opcode_ids, layout), *byte_columns(group), indexes,
+                                    base_address, instruction_count, targets_found)
+        else:
+            # The other records do not depend on where the word is, so a
+            # group that looks repetitive from its first words is decoded
+            # once per distinct word
+            repetitive = len(set(group[:REPEAT_SAMPLE])) <= len(group[:REPEAT_SAMPLE]) // 2
+            distinct = list(dict.fromkeys(group)) if repetitive else group
+            if layout == 'SYSTEM':
+                records = decode_system(opcode_ids, distinct)
+            else:
+                records = decode_layout(layout, op_ids_of(opcode_ids, layout), *byte_columns(distinct))
+            if repetitive:
+                records = list(map(dict(zip(distinct, records)).__getitem__, group))
+        invalid_words += records.count(None)
+        groups[code] = iter(records)
+    decoded_program = list(map(next, map(groups.__getitem__, layouts)))
+    return decoded_program, Listing(words, base_address), target_labels(targets_found), invalid_words
+
+def op_ids_of(opcode_ids, layout):
+    return [opcode_ids.get(opcode) for opcode in OPCODE_TABLES[layout]]
+
+def byte_columns(words):
+    # (byte 0 of every word, byte 1, byte 2, byte 3)
+    words = array('I', words)
+    if sys.byteorder == 'big':
+        words.byteswap()
+    data = words.tobytes()
+    return tuple(data[i::4] for i in range(4))
+
+def decode_layout(layout, op_ids, b0, b1, b2, b3, indexes=None, base_address=0, instruction_count=0,
+                  targets_found=None):
+    # Records for the words of one layout, given as byte columns; None for
+    # words whose funct3/funct7 is not an RV32I instruction
+    keys = list(map(or_, map(or_, map(CLASS_X1024.__getitem__, b0), map(FUNCT3_X128.__getitem__, b1)),
+                    b3.translate(HIGH_SEVEN)))
+    opcodes = list(map(op_ids.__getitem__, keys))
+    rd = list(map(or_, b0.translate(HIGH_BIT), b1.translate(LOW_NIBBLE_X2)))
+    rs1 = map(or_, b1.translate(HIGH_BIT), b2.translate(LOW_NIBBLE_X2))
+    rs2 = map(or_, b2.translate(HIGH_NIBBLE), b3.translate(LOW_BIT_X16))
+    none = repeat(None)
+
+    if layout == 'R':
+        records = zip(opcodes, rd, rs1, rs2, none, none)
+    elif layout == 'I':
+        immediates = map(and_, map(add, map(I_IMMEDIATE_HIGH.__getitem__, b3), b2.translate(HIGH_NIBBLE)),
+                         map(IMMEDIATE_MASKS.__getitem__, keys))
+        records = zip(opcodes, rd, rs1, none, immediates, none)
+    elif layout == 'S':
+        immediates = map(add, map(S_IMMEDIATE_HIGH.__getitem__, b3), rd)
+        records = zip(opcodes, none, rs1, rs2, immediates, none)
+    elif layout == 'U':
+        immediates = map(add, map(add, map(UPPER_B3.__getitem__, b3), map(UPPER_B2.__getitem__, b2)),
+                         map(UPPER_B1.__getitem__, b1))
+        records = zip(opcodes, rd, none, none, immediates, none)
+    elif layout == 'B':
+        offsets = map(add, map(add, map(BRANCH_B3.__getitem__, b3), map(BRANCH_B0.__getitem__, b0)),
+                      b1.translate(LOW_NIBBLE_X2))
+        labels, targets = resolve_branches(indexes, offsets, opcodes, base_address, instruction_count,
+                                           targets_found, layout)
+        records = zip(opcodes, none, rs1, rs2, labels, targets)
+    else:  # J
+        offsets = map(add, map(add, map(JAL_B3.__getitem__, b3), map(JAL_B2.__getitem__, b2)),
+                      map(JAL_B1.__getitem__, b1))
+        labels, targets = resolve_branches(indexes, offsets, opcodes, base_address, instruction_count,
+                                           targets_found, layout)
+        records = zip(opcodes, rd, none, none, labels, targets)
+
+    records = list(records)
+    if None in opcodes:
+        for position in compress(range(len(records)), map(is_, opcodes, none)):
+            records[position] = None
+    return records
+
+def decode_system(opcode_ids, words):
+    # SYSTEM and MISC-MEM words, which are matched on the whole word
+    def record(opcode):
+        return (opcode_ids[opcode], None, None, None, None, None)
+    exact = {0x00000073: record('ECALL'), 0x00100073: record('EBREAK'),
+             FENCE_TSO_WORD: record('FENCE.TSO'), PAUSE_WORD: record('PAUSE')}
+    fence = record('FENCE')
+    # Any other MISC-MEM word with funct3 0 is a FENCE
+    return [exact.get(word, fence if word & 0x707F == 0x000F else None) for word in words]
+
+def resolve_branches(indexes, offsets, opcodes, base_address, instruction_count, targets_found, layout):
+    # resolve_branch() for a column of branches: (labels, targets). The
+    # valid ones with a target are kept in targets_found[layout].
+    offsets = list(offsets)
+    addresses = list(map(add, map(mul, indexes, repeat(4)), map(add, offsets, repeat(base_address))))
+    labels = list(map('L_%08X'.__mod__, addresses))
+    targets = list(map(add, indexes, map(floordiv, offsets, repeat(4))))
+    in_program = range(instruction_count + 1).__contains__
+    # Branch offsets are even; the ones that are not a multiple of 4 have bit 1 set
+    for position in compress(range(len(targets)), map(or_, map(and_, offsets, repeat(2)),
+                                                        map(not_, map(in_program, targets)))):
+        targets[position] = None
+    found = list(map(and_, map(is_not, targets, repeat(None)), map(is_not, opcodes, repeat(None))))
+    targets_found[layout] = (list(compress(indexes, found)), list(compress(labels, found)),
+                             list(compress(addresses, found)))
+    return labels, targets
+
+def target_labels(targets_found):
+    # {label: address} in the order the branches and JALs appear
+    indexes, labels, addresses = [], [], []
+    for found_indexes, found_labels, found_addresses in targets_found.values():
+        indexes += found_indexes
+        labels += found_labels
+        addresses += found_addresses
+    order = sorted(range(len(indexes)), key=indexes.__getitem__)  # two sorted runs: a merge
+    return dict(zip(map(labels.__getitem__, order), map(addresses.__getitem__, order)))
+
+def read_binary_file(file_path):
+    with open(file_path, 'rb') as file:
+        return file.read()
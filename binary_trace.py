@@ -0,0 +1,206 @@
+import gzip
+import queue
+import struct
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from closure_engine import MASK32
+
+# Binary execution trace.
+#
+# Every executed instruction becomes one fixed-size record:
+#
+#     pc (u32) | opcode id (u16) | rd (u8) | flags (u8) | rd value (u32)
+#     | store address (u32) | store value (u32)
+#
+# flags says which halves are valid: FLAG_REGISTER for a register write,
+# FLAG_MEMORY for a store, with the store size (1, 2 or 4 bytes) in
+# STORE_SIZE_MASK. Step n is simply record n, so no step number is stored.
+# The file starts with a header naming the opcode ids, so a trace can be
+# read without the simulator that wrote it (see trace_reader.py).
+#
+# The simulator only packs records into an in-memory chunk. Full chunks go
+# through a bounded queue to a writer thread, which does the file I/O and
+# the compression: gzip for *.gz paths and zstd for *.zst paths (this one
+# needs the optional 'zstandard' package).
+
+TRACE_MAGIC = b'RVTRACE\x01'
+TRACE_VERSION = 1
+# version, record size, code base, pc stride, length of the opcode table
+HEADER = struct.Struct('<HHIII')
+RECORD = struct.Struct('<IHBBIII')
+
+FLAG_REGISTER = 0x1
+FLAG_MEMORY = 0x2
+STORE_SIZE_SHIFT = 2
+STORE_SIZE_MASK = 0xC  # log2 of the store size
+STORE_SIZE_FLAGS = {1: 0x0, 2: 0x4, 4: 0x8}
+
+RECORDS_PER_CHUNK = 16384
+QUEUE_CHUNKS = 8  # chunks that may wait for the writer thread
+GZIP_LEVEL = 1    # fastest; records are very regular and still shrink about 7x
+
+STORE_SIZES = {'SB': 1, 'SH': 2, 'SW': 4}
+NO_REGISTER_WRITE = ('BEQ', 'BNE', 'BLT', 'BGE', 'BLTU', 'BGEU', 'SB', 'SH', 'SW',
+                     'ECALL', 'EBREAK', 'FENCE', 'FENCE.TSO', 'PAUSE')
+
+def open_trace_file(path, mode):
+    # mode is 'wb' or 'rb'; the compression follows the file extension
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, compresslevel=GZIP_LEVEL) if mode == 'wb' else gzip.open(path, mode)
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise ValueError("zstd-compressed traces need the 'zstandard' package (pip install zstandard)")
+        file = open(path, mode)
+        if mode == 'wb':
+            return zstandard.ZstdCompressor().stream_writer(file)
+        return zstandard.ZstdDecompressor().stream_reader(file)
+    return open(path, mode)
+
+def store_flags(size):
+    return FLAG_MEMORY | STORE_SIZE_FLAGS[size]
+
+def store_size(flags):
+    return 1 << ((flags & STORE_SIZE_MASK) >> STORE_SIZE_SHIFT)
+
+class TraceWriter:
+    def __init__(self, path, opcodes, code_base=0, pc_stride=1, records_per_chunk=RECORDS_PER_CHUNK):
+        self.stream = open_trace_file(path, 'wb')
+        opcode_table = '\n'.join(opcodes).encode('ascii')
+        self.stream.write(TRACE_MAGIC + HEADER.pack(TRACE_VERSION, RECORD.size, code_base, pc_stride,
+                                                    len(opcode_table)) + opcode_table)
+        self.chunk_bytes = records_per_chunk * RECORD.size
+        self.buffer = bytearray()
+        self.records = 0
+        self.error = None
+        self.chunks = queue.Queue(QUEUE_CHUNKS)
+        self.thread = threading.Thread(target=self.write_chunks, name='trace-writer', daemon=True)
+        self.thread.start()
+
+    def write_chunks(self):
+        # Writer thread: drain the queue until the None sentinel
+        while True:
+            chunk = self.chunks.get()
+            if chunk is None:
+                return
+            if self.error is None:
+                try:
+                    self.stream.write(chunk)
+                except Exception as e:  # Reported by close()
+                    self.error = e
+
+    def write(self, pc, op_id, rd=0, flags=0, value=0, address=0, stored=0):
+        self.buffer += RECORD.pack(pc, op_id, rd, flags, value, address, stored)
+        self.records += 1
+        if len(self.buffer) >= self.chunk_bytes:
+            self.flush()
+
+    def write_step(self, pc, op_id, registers, written_registers, memory, written_addresses):
+        # Record one interpreter step from the handlers' write set
+        rd = value = address = stored = 0
+        flags = 0
+        for register in written_registers:
+            if register:
+                rd, value, flags = register, registers[register] & MASK32, FLAG_REGISTER
+        if written_addresses:
+            address, size = written_addresses[0], len(written_addresses)
+            stored = int.from_bytes(memory.load_bytes(address, size), 'little') & MASK32
+            address &= MASK32  # As trace_store records it
+            flags |= store_flags(size)
+        self.write(pc, op_id, rd, flags, value, address, stored)
+
+    def flush(self):
+        if self.buffer:
+            self.chunks.put(bytes(self.buffer))
+            self.buffer = bytearray()
+
+    def close(self):
+        self.flush()
+        self.chunks.put(None)
+        self.thread.join()
+        self.stream.close()
+        if self.error is not None:
+            raise self.error
+
+def trace_closures(code, decoded_program, opcodes, registers, writer, code_base=0, pc_stride=1):
+    # Wrap every closure of a closure-compiled program so it also writes its
+    # trace record; the program then runs unchanged on either engine
+    write = writer.write
+    for index, decoded in enumerate(decoded_program):
+        if decoded is None:
+            continue
+        op = code[index]
+        op_id, rd, rs1, rs2, imm, _ = decoded
+        opcode = opcodes[op_id]
+        pc = code_base + index * pc_stride
+        if opcode in STORE_SIZES:
+            size = STORE_SIZES[opcode]
+            code[index] = trace_store(op, write, registers, pc, op_id, rs1, rs2, imm,
+                                      (1 << (8 * size)) - 1, store_flags(size))
+        elif opcode not in NO_REGISTER_WRITE and rd:
+            code[index] = trace_register_write(op, write, registers, pc, op_id, rd)
+        else:
+            code[index] = trace_plain(op, write, pc, op_id)
+
+def trace_store(op, write, registers, pc, op_id, rs1, rs2, imm, mask, flags):
+    def traced():
+        address = (registers[rs1] + imm) & MASK32
+        next_pc = op()
+        write(pc, op_id, 0, flags, 0, address, registers[rs2] & mask)
+        return next_pc
+    return traced
+
+def trace_register_write(op, write, registers, pc, op_id, rd):
+    def traced():
+        next_pc = op()
+        write(pc, op_id, rd, FLAG_REGISTER, registers[rd])
+        return next_pc
+    return traced
+
+def trace_plain(op, write, pc, op_id):
+    # Written before running, so halting instructions are recorded too
+    def traced():
+        write(pc, op_id)
+        return op()
+    return traced
+
+class TraceReader:
+    def __init__(self, path):
+        self.stream = open_trace_file(path, 'rb')
+        if read_exactly(self.stream, len(TRACE_MAGIC)) != TRACE_MAGIC:
+            self.stream.close()
+            raise ValueError(f"'{path}' is not a binary trace")
+        version, record_size, self.code_base, self.pc_stride, table_size = HEADER.unpack(
+            read_exactly(self.stream, HEADER.size))
+        if version != TRACE_VERSION or record_size != RECORD.size:
+            self.stream.close()
+            raise ValueError(f"unsupported trace version {version} (record size {record_size})")
+        self.opcodes = read_exactly(self.stream, table_size).decode('ascii').split('\n')
+
+    def __iter__(self):
+        # Yields (pc, opcode id, rd, flags, rd value, store address, store value)
+        chunk_size = RECORDS_PER_CHUNK * RECORD.size
+        pending = b''
+        while True:
+            data = self.stream.read(chunk_size)
+            if not data:
+                break
+            data = pending + data
+            usable = len(data) - len(data) % RECORD.size
+            yield from RECORD.iter_unpack(data[:usable])
+            pending = data[usable:]
+        if pending:
+            raise ValueError("trace ends in the middle of a record")
+
+    def close(self):
+        self.stream.close()
+
+def read_exactly(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise ValueError("truncated trace header")
+    return data
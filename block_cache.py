@@ -0,0 +1,141 @@
+import time
+
+from closure_engine import Halt
+
+# Basic-block cache on top of the closure engine.
+#
+# A basic block is a straight-line run of instructions ending at a branch,
+# jal, jalr or a halting instruction. Each block is built once, the first
+# time execution reaches its start, and kept in a dict keyed by its start
+# index. When a block exits, the block it went to is linked into its
+# `successors` dict, so following a taken or not-taken edge the next time
+# needs no cache lookup at all.
+#
+# With a compiler (see jit.py), a block that has run hot_threshold times is
+# compiled to a single Python function that replaces its closures.
+#
+# Stores into the code range (machine-code programs, see
+# memory_model.WatchedMemory) go through invalidate(), which drops every
+# block covering the rewritten instruction along with all successor links.
+
+# Blocks between clock reads when a run has a wall-clock deadline
+DEADLINE_CHECK_BLOCKS = 256
+
+BLOCK_TERMINATORS = frozenset(['BEQ', 'BNE', 'BLT', 'BGE', 'BLTU', 'BGEU', 'JAL', 'JALR', 'ECALL', 'EBREAK'])
+
+class BasicBlock:
+    __slots__ = ('start', 'end', 'body', 'exit', 'length', 'successors', 'runs')
+
+    def __init__(self, start, end, ops):
+        self.start = start       # index of the first instruction
+        self.end = end           # index just past the last instruction
+        self.body = tuple(ops[:-1])
+        self.exit = ops[-1]      # returns the index of the next instruction
+        self.length = len(ops)
+        self.successors = {}     # next index -> BasicBlock
+        self.runs = 0
+
+class BlockCache:
+    def __init__(self, code, decoded_program, opcodes, compiler=None, hot_threshold=None):
+        self.code = code
+        self.compiler = compiler
+        self.hot_threshold = hot_threshold if compiler else None
+        self.terminators = [decoded is not None and opcodes[decoded[0]] in BLOCK_TERMINATORS
+                            for decoded in decoded_program]
+        self.blocks = {}  # start index -> BasicBlock
+        self.hits = 0
+        self.misses = 0
+        self.chained = 0
+        self.invalidations = 0
+        self.compiled = 0
+
+    def build(self, start):
+        end = start
+        while end < len(self.code) - 1 and not self.terminators[end]:
+            end += 1
+        return BasicBlock(start, end + 1, self.code[start:end + 1])
+
+    def lookup(self, pc):
+        block = self.blocks.get(pc)
+        if block is None:
+            self.misses += 1
+            block = self.blocks[pc] = self.build(pc)
+        else:
+            self.hits += 1
+        return block
+
+    def invalidate(self, index, is_terminator):
+        # The instruction at index was rewritten: forget every block that
+        # covers it and every link, since links may point at those blocks
+        self.terminators[index] = is_terminator
+        stale = [start for start, block in self.blocks.items() if block.start <= index < block.end]
+        for start in stale:
+            del self.blocks[start]
+        for block in self.blocks.values():
+            block.successors.clear()
+        self.invalidations += 1
+
+    def run(self, pc, max_steps=None, deadline=None):
+        # Returns (final pc, executed steps, halting opcode or None), like
+        # closure_engine.run_program(), budgets included. Budgets are checked
+        # once per block; a block that would overrun max_steps is finished
+        # one closure at a time, so the step count is exact, and the clock is
+        # read every DEADLINE_CHECK_BLOCKS blocks.
+        instruction_count = len(self.code)
+        steps = 0
+        chained = 0
+        if not 0 <= pc < instruction_count:
+            return pc, steps, None
+        hot_threshold = self.hot_threshold
+        budgeted = max_steps is not None or deadline is not None
+        limit = max_steps if max_steps is not None else float('inf')
+        blocks_until_check = DEADLINE_CHECK_BLOCKS
+        block = self.lookup(pc)
+        try:
+            while True:
+                if budgeted:
+                    if steps + block.length > limit:
+                        pc = block.start
+                        while steps < limit and 0 <= pc < instruction_count:
+                            steps += 1
+                            pc = self.code[pc]()
+                        break
+                    if deadline is not None:
+                        blocks_until_check -= 1
+                        if not blocks_until_check:
+                            blocks_until_check = DEADLINE_CHECK_BLOCKS
+                            if time.perf_counter() >= deadline:
+                                pc = block.start
+                                break
+                if hot_threshold:
+                    block.runs += 1
+                    if block.runs == hot_threshold:
+                        self.compile(block)
+                steps += block.length
+                for op in block.body:
+                    op()
+                pc = block.exit()
+                next_block = block.successors.get(pc)
+                if next_block is None:
+                    if not 0 <= pc < instruction_count:
+                        break
+                    next_block = block.successors[pc] = self.lookup(pc)
+                else:
+                    chained += 1
+                block = next_block
+        except Halt as halt:
+            return halt.pc, steps, halt.opcode
+        finally:
+            self.chained += chained
+        return pc, steps, None
+
+    def compile(self, block):
+        function = self.compiler.compile(block)
+        if function is not None:
+            block.body = ()
+            block.exit = function
+            self.compiled += 1
+
+    def statistics(self):
+        return (f"Block cache: {len(self.blocks)} blocks, {self.hits} hits, {self.misses} misses, "
+                f"{self.chained} chained, {self.invalidations} invalidations, {self.compiled} compiled")
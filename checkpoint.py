@@ -0,0 +1,174 @@
+import json
+import struct
+import zlib
+
+from memory_model import PAGE_SHIFT, PAGE_SIZE
+
+# Simulator checkpoints.
+#
+# A Checkpoint holds everything needed to carry on a run later or branch
+# several runs from one point: registers, PC, step count, halt state, the
+# loaded program (labels, listing, decoded records and layout) and the
+# memory contents as returned by the backend's checkpoint(). Taking and
+# restoring one in memory copies no page data (see memory_model.py), so
+#
+#     saved = sim.checkpoint()
+#     for experiment in experiments:
+#         sim.restore(saved)
+#         ...
+#
+# costs milliseconds even for large memories.
+#
+# save()/load() store a checkpoint in a compact binary file: CHECKPOINT_MAGIC
+# followed by a zlib stream of
+#
+#     HEADER | 32 registers (u32) | metadata (JSON) | memory pages
+#
+# where memory pages are PAGE_ENTRY headers, each followed by the page data
+# and its written flags. Image-backed memories save the image path with
+# their stored-to pages and then the pages of their overlay.
+
+CHECKPOINT_MAGIC = b'RVCKPT\x01\x00'
+# pc, code base, pc stride, steps, metadata length
+HEADER = struct.Struct('<IIIQI')
+REGISTERS = struct.Struct('<32I')
+# page number (signed: stores below address 0 land on negative pages), data
+# length (a full page, or less for the edges of an image)
+PAGE_ENTRY = struct.Struct('<iI')
+PAGE_COUNT = struct.Struct('<I')
+COMPRESSION_LEVEL = 1
+
+class Checkpoint:
+    __slots__ = ('registers', 'program_counter', 'steps', 'halted', 'halted_by', 'stop_reason',
+                 'code_base', 'pc_stride', 'labels', 'executable_instructions', 'decoded_program',
+                 'memory_backend', 'memory')
+
+    def __init__(self, registers, program_counter, steps, halted, halted_by, stop_reason,
+                 code_base, pc_stride, labels, executable_instructions, decoded_program,
+                 memory_backend, memory):
+        self.registers = tuple(registers)
+        self.program_counter = program_counter
+        self.steps = steps
+        self.halted = halted
+        self.halted_by = halted_by
+        self.stop_reason = stop_reason
+        self.code_base = code_base
+        self.pc_stride = pc_stride
+        self.labels = dict(labels)
+        self.executable_instructions = executable_instructions
+        self.decoded_program = decoded_program  # shared with the simulator, never modified
+        self.memory_backend = memory_backend
+        self.memory = memory                    # memory_model checkpoint() state
+
+def pack_pages(pages, written):
+    # pages/written: {page number: bytes}; page data may be shorter than a page
+    parts = [PAGE_COUNT.pack(len(pages))]
+    for page_number in sorted(pages):
+        data = pages[page_number]
+        parts += [PAGE_ENTRY.pack(page_number, len(data)), bytes(data),
+                  bytes(written.get(page_number, bytes(PAGE_SIZE)))]
+    return parts
+
+def unpack_pages(payload, offset):
+    # Returns ({page number: data}, {page number: written flags}, offset after them)
+    pages, written = {}, {}
+    (count,) = PAGE_COUNT.unpack_from(payload, offset)
+    offset += PAGE_COUNT.size
+    for _ in range(count):
+        page_number, size = PAGE_ENTRY.unpack_from(payload, offset)
+        offset += PAGE_ENTRY.size
+        pages[page_number] = bytes(payload[offset:offset + size])
+        written[page_number] = bytes(payload[offset + size:offset + size + PAGE_SIZE])
+        offset += size + PAGE_SIZE
+    return pages, written, offset
+
+def dict_pages(data):
+    # DictMemory contents ({address: byte}) as pages
+    pages, written = {}, {}
+    for address, value in data.items():
+        page_number = address >> PAGE_SHIFT
+        if page_number not in pages:
+            pages[page_number] = bytearray(PAGE_SIZE)
+            written[page_number] = bytearray(PAGE_SIZE)
+        pages[page_number][address & (PAGE_SIZE - 1)] = value
+        written[page_number][address & (PAGE_SIZE - 1)] = 1
+    return pages, written
+
+def pages_dict(pages, written):
+    data = {}
+    for page_number in sorted(pages):
+        base = page_number << PAGE_SHIFT
+        flags = written[page_number]
+        offset = flags.find(1)
+        while offset != -1:
+            data[base + offset] = pages[page_number][offset]
+            offset = flags.find(1, offset + 1)
+    return data
+
+def pack_memory(state, description):
+    # Appends the memory description to `description` and returns the page parts
+    kind = state[0]
+    description['kind'] = kind
+    if kind == 'paged':
+        return pack_pages(state[1], state[2])
+    if kind == 'dict':
+        return pack_pages(*dict_pages(state[1]))
+    _, path, base, mode, size, dirty, written, overlay = state
+    description.update(path=path, base=base, mode=mode, size=size, overlay={})
+    # Image pages carry only the flags of the bytes inside the image
+    return pack_pages(dirty, written) + pack_memory(overlay, description['overlay'])
+
+def unpack_memory(payload, offset, description):
+    # Returns (memory state, offset after it)
+    kind = description['kind']
+    pages, written, offset = unpack_pages(payload, offset)
+    if kind == 'paged':
+        return ('paged', pages, written), offset
+    if kind == 'dict':
+        return ('dict', pages_dict(pages, written)), offset
+    overlay, offset = unpack_memory(payload, offset, description['overlay'])
+    return ('mmap', description['path'], description['base'], description['mode'], description['size'],
+            pages, written, overlay), offset
+
+def save(saved, path):
+    # Everything is packed before the file is opened, so a checkpoint that
+    # cannot be saved leaves no partial file behind
+    try:
+        memory = {}
+        memory_parts = pack_memory(saved.memory, memory)
+        metadata = json.dumps({
+            'halted': saved.halted, 'halted_by': saved.halted_by, 'stop_reason': saved.stop_reason,
+            'labels': saved.labels, 'instructions': list(saved.executable_instructions),
+            'decoded': saved.decoded_program, 'memory_backend': saved.memory_backend, 'memory': memory,
+        }, separators=(',', ':')).encode('utf-8')
+        parts = [HEADER.pack(saved.program_counter, saved.code_base, saved.pc_stride, saved.steps, len(metadata)),
+                 REGISTERS.pack(*saved.registers), metadata] + memory_parts
+    except (struct.error, TypeError, ValueError) as e:
+        raise ValueError(f"cannot save checkpoint '{path}': {e}")
+    compressor = zlib.compressobj(COMPRESSION_LEVEL)
+    with open(path, 'wb') as file:
+        file.write(CHECKPOINT_MAGIC)
+        for part in parts:
+            file.write(compressor.compress(part))
+        file.write(compressor.flush())
+
+def load(path):
+    with open(path, 'rb') as file:
+        data = file.read()
+    if not data.startswith(CHECKPOINT_MAGIC):
+        raise ValueError(f"'{path}' is not a simulator checkpoint")
+    try:
+        payload = zlib.decompress(memoryview(data)[len(CHECKPOINT_MAGIC):])
+        program_counter, code_base, pc_stride, steps, metadata_size = HEADER.unpack_from(payload)
+        offset = HEADER.size
+        registers = REGISTERS.unpack_from(payload, offset)
+        offset += REGISTERS.size
+        metadata = json.loads(payload[offset:offset + metadata_size])
+        offset += metadata_size
+        memory, _ = unpack_memory(payload, offset, metadata['memory'])
+    except (zlib.error, struct.error, ValueError, KeyError) as e:
+        raise ValueError(f"corrupt checkpoint '{path}': {e}")
+    decoded_program = [tuple(decoded) if decoded is not None else None for decoded in metadata['decoded']]
+    return Checkpoint(registers, program_counter, steps, metadata['halted'], metadata['halted_by'],
+                      metadata['stop_reason'], code_base, pc_stride, metadata['labels'],
+                      metadata['instructions'], decoded_program, metadata['memory_backend'], memory)
@@ -0,0 +1,403 @@
+import sys
+import time
+
+# Closure-compiled execution engine.
+#
+# Every decoded instruction (see decode_program() in assembler.py) is turned
+# into a small Python closure with its operands, fall-through index and
+# resolved label target already bound. Running the program is then just
+#
+#     pc = code[pc]()
+#
+# with no opcode lookups or list-membership tests on the hot path. The
+# closures reproduce the register and memory results of the handlers in
+# store_load.py exactly, but do not print per-instruction messages.
+
+MASK32 = 0xFFFFFFFF
+
+# Steps between clock reads when a run has a wall-clock deadline
+DEADLINE_CHECK_INTERVAL = 4096
+
+class Halt(Exception):
+    # Raised by ECALL/EBREAK to stop the run loop at the halting instruction
+    def __init__(self, pc, opcode):
+        super().__init__(f"{opcode} - Halting")
+        self.pc = pc
+        self.opcode = opcode
+
+def to_signed32(val):
+    # Convert 32-bit unsigned integer to signed integer
+    if val & 0x80000000:
+        return val - 0x100000000
+    return val
+
+# Arithmetic and Logical Instructions
+def make_add(regs, rd, rs1, rs2, next_pc):
+    def op():
+        regs[rd] = (regs[rs1] + regs[rs2]) & MASK32
+        return next_pc
+    return op
+
+def make_sub(regs, rd, rs1, rs2, next_pc):
+    def op():
+        regs[rd] = (regs[rs1] - regs[rs2]) & MASK32
+        return next_pc
+    return op
+
+def make_slt(regs, rd, rs1, rs2, next_pc):
+    def op():
+        regs[rd] = 1 if to_signed32(regs[rs1]) < to_signed32(regs[rs2]) else 0
+        return next_pc
+    return op
+
+def make_sltu(regs, rd, rs1, rs2, next_pc):
+    def op():
+        regs[rd] = 1 if (regs[rs1] & MASK32) < (regs[rs2] & MASK32) else 0
+        return next_pc
+    return op
+
+def make_xor(regs, rd, rs1, rs2, next_pc):
+    def op():
+        regs[rd] = (regs[rs1] ^ regs[rs2]) & MASK32
+        return next_pc
+    return op
+
+def make_or(regs, rd, rs1, rs2, next_pc):
+    def op():
+        regs[rd] = (regs[rs1] | regs[rs2]) & MASK32
+        return next_pc
+    return op
+
+def make_and(regs, rd, rs1, rs2, next_pc):
+    def op():
+        regs[rd] = (regs[rs1] & regs[rs2]) & MASK32
+        return next_pc
+    return op
+
+def make_sll(regs, rd, rs1, rs2, next_pc):
+    def op():
+        regs[rd] = (regs[rs1] << (regs[rs2] & 0x1F)) & MASK32
+        return next_pc
+    return op
+
+def make_srl(regs, rd, rs1, rs2, next_pc):
+    def op():
+        regs[rd] = (regs[rs1] & MASK32) >> (regs[rs2] & 0x1F)
+        return next_pc
+    return op
+
+def make_sra(regs, rd, rs1, rs2, next_pc):
+    def op():
+        regs[rd] = (to_signed32(regs[rs1]) >> (regs[rs2] & 0x1F)) & MASK32
+        return next_pc
+    return op
+
+# Immediate Arithmetic and Shift Instructions
+def make_addi(regs, rd, rs1, imm, next_pc):
+    def op():
+        regs[rd] = (regs[rs1] + imm) & MASK32
+        return next_pc
+    return op
+
+def make_andi(regs, rd, rs1, imm, next_pc):
+    def op():
+        regs[rd] = (regs[rs1] & imm) & MASK32
+        return next_pc
+    return op
+
+def make_ori(regs, rd, rs1, imm, next_pc):
+    def op():
+        regs[rd] = (regs[rs1] | imm) & MASK32
+        return next_pc
+    return op
+
+def make_xori(regs, rd, rs1, imm, next_pc):
+    def op():
+        regs[rd] = (regs[rs1] ^ imm) & MASK32
+        return next_pc
+    return op
+
+def make_slti(regs, rd, rs1, imm, next_pc):
+    def op():
+        regs[rd] = 1 if to_signed32(regs[rs1]) < imm else 0
+        return next_pc
+    return op
+
+def make_sltiu(regs, rd, rs1, imm, next_pc):
+    imm_val = imm & MASK32
+    def op():
+        regs[rd] = 1 if (regs[rs1] & MASK32) < imm_val else 0
+        return next_pc
+    return op
+
+def make_slli(regs, rd, rs1, imm, next_pc):
+    shift_amount = imm & 0x1F
+    def op():
+        regs[rd] = (regs[rs1] << shift_amount) & MASK32
+        return next_pc
+    return op
+
+def make_srli(regs, rd, rs1, imm, next_pc):
+    shift_amount = imm & 0x1F
+    def op():
+        regs[rd] = (regs[rs1] & MASK32) >> shift_amount
+        return next_pc
+    return op
+
+def make_srai(regs, rd, rs1, imm, next_pc):
+    shift_amount = imm & 0x1F
+    def op():
+        regs[rd] = (to_signed32(regs[rs1]) >> shift_amount) & MASK32
+        return next_pc
+    return op
+
+# Branch Instructions (target is the resolved label index, None if unknown)
+def make_beq(regs, rs1, rs2, target, next_pc):
+    if target is None:
+        target = next_pc
+    def op():
+        return target if regs[rs1] == regs[rs2] else next_pc
+    return op
+
+def make_bne(regs, rs1, rs2, target, next_pc):
+    if target is None:
+        target = next_pc
+    def op():
+        return target if regs[rs1] != regs[rs2] else next_pc
+    return op
+
+def make_blt(regs, rs1, rs2, target, next_pc):
+    if target is None:
+        target = next_pc
+    def op():
+        return target if to_signed32(regs[rs1]) < to_signed32(regs[rs2]) else next_pc
+    return op
+
+def make_bge(regs, rs1, rs2, target, next_pc):
+    if target is None:
+        target = next_pc
+    def op():
+        return target if to_signed32(regs[rs1]) >= to_signed32(regs[rs2]) else next_pc
+    return op
+
+def make_bltu(regs, rs1, rs2, target, next_pc):
+    if target is None:
+        target = next_pc
+    def op():
+        return target if (regs[rs1] & MASK32) < (regs[rs2] & MASK32) else next_pc
+    return op
+
+def make_bgeu(regs, rs1, rs2, target, next_pc):
+    if target is None:
+        target = next_pc
+    def op():
+        return target if (regs[rs1] & MASK32) >= (regs[rs2] & MASK32) else next_pc
+    return op
+
+# Load and Store Instructions (memory is a memory_model backend)
+def make_lw(regs, memory, rd, rs1, offset, next_pc):
+    load_word = memory.load_word
+    def op():
+        regs[rd] = load_word(regs[rs1] + offset)
+        return next_pc
+    return op
+
+def make_lh(regs, memory, rd, rs1, offset, next_pc):
+    load_halfword = memory.load_halfword
+    def op():
+        regs[rd] = load_halfword(regs[rs1] + offset)
+        return next_pc
+    return op
+
+def make_lhu(regs, memory, rd, rs1, offset, next_pc):
+    load_halfword_unsigned = memory.load_halfword_unsigned
+    def op():
+        regs[rd] = load_halfword_unsigned(regs[rs1] + offset)
+        return next_pc
+    return op
+
+def make_lb(regs, memory, rd, rs1, offset, next_pc):
+    load_byte = memory.load_byte
+    def op():
+        byte = load_byte(regs[rs1] + offset)
+        if byte & 0x80:
+            byte |= 0xFFFFFF00  # Sign-extend to 32 bits
+        regs[rd] = byte
+        return next_pc
+    return op
+
+def make_lbu(regs, memory, rd, rs1, offset, next_pc):
+    load_byte = memory.load_byte
+    def op():
+        regs[rd] = load_byte(regs[rs1] + offset)
+        return next_pc
+    return op
+
+def make_sw(regs, memory, rs2, rs1, offset, next_pc):
+    store_word = memory.store_word
+    def op():
+        store_word(regs[rs1] + offset, regs[rs2])
+        return next_pc
+    return op
+
+def make_sh(regs, memory, rs2, rs1, offset, next_pc):
+    store_halfword = memory.store_halfword
+    def op():
+        store_halfword(regs[rs1] + offset, regs[rs2])
+        return next_pc
+    return op
+
+def make_sb(regs, memory, rs2, rs1, offset, next_pc):
+    store_byte = memory.store_byte
+    def op():
+        store_byte(regs[rs1] + offset, regs[rs2])
+        return next_pc
+    return op
+
+# Jump and Link Instructions
+def make_jal(regs, rd, label, target, return_address):
+    if target is None:
+        def op():
+            if rd != 0:
+                regs[rd] = return_address
+            print(f"Error: Label '{label}' not found.")
+            sys.exit(1)
+        return op
+    if rd == 0:
+        return lambda: target
+    def op():
+        regs[rd] = return_address
+        return target
+    return op
+
+def make_jalr(regs, rd, rs1, imm, return_address, instruction_index, target_mask):
+    def op():
+        # rs1 is read before the link register is written, as in jalr()
+        target_address = (regs[rs1] + imm) & target_mask
+        if rd != 0:
+            regs[rd] = return_address
+        index = instruction_index.get(target_address)
+        if index is not None:
+            return index
+        print(f"Error: Invalid jump address '{target_address}'.")
+        sys.exit(1)
+    return op
+
+# Upper Immediate Instructions
+def make_lui(regs, rd, imm, next_pc):
+    value = imm & 0xFFFFF000  # Clear the lower 12 bits
+    def op():
+        regs[rd] = value
+        return next_pc
+    return op
+
+def make_auipc(regs, rd, address, imm, next_pc):
+    value = (address + imm) & MASK32
+    def op():
+        regs[rd] = value
+        return next_pc
+    return op
+
+# System Instructions
+def make_halt(pc, opcode):
+    def op():
+        raise Halt(pc, opcode)
+    return op
+
+def make_nop(next_pc):
+    return lambda: next_pc
+
+R_TYPE = {
+    'ADD': make_add, 'SUB': make_sub, 'SLT': make_slt, 'SLTU': make_sltu,
+    'XOR': make_xor, 'OR': make_or, 'AND': make_and,
+    'SLL': make_sll, 'SRL': make_srl, 'SRA': make_sra
+}
+I_TYPE = {
+    'ADDI': make_addi, 'ANDI': make_andi, 'ORI': make_ori, 'XORI': make_xori,
+    'SLTI': make_slti, 'SLTIU': make_sltiu,
+    'SLLI': make_slli, 'SRLI': make_srli, 'SRAI': make_srai
+}
+BRANCHES = {
+    'BEQ': make_beq, 'BNE': make_bne, 'BLT': make_blt, 'BGE': make_bge,
+    'BLTU': make_bltu, 'BGEU': make_bgeu
+}
+LOADS = {'LW': make_lw, 'LH': make_lh, 'LHU': make_lhu, 'LB': make_lb, 'LBU': make_lbu}
+STORES = {'SW': make_sw, 'SH': make_sh, 'SB': make_sb}
+
+def compile_instruction(opcode, decoded, pc, registers, memory, instruction_index, code_base, pc_stride):
+    # Build the closure for the decoded instruction at index pc. Closures
+    # return the index of the next instruction; values the program can see
+    # (return addresses, auipc) use the address code_base + index * pc_stride.
+    _, rd, rs1, rs2, imm, target = decoded
+    next_pc = pc + 1
+    address = code_base + pc * pc_stride
+
+    if opcode in R_TYPE:
+        if rd == 0:
+            return make_nop(next_pc)
+        return R_TYPE[opcode](registers, rd, rs1, rs2, next_pc)
+    if opcode in I_TYPE:
+        if rd == 0:
+            return make_nop(next_pc)
+        return I_TYPE[opcode](registers, rd, rs1, imm, next_pc)
+    if opcode in BRANCHES:
+        return BRANCHES[opcode](registers, rs1, rs2, target, next_pc)
+    if opcode in LOADS:
+        if rd == 0:
+            return make_nop(next_pc)
+        return LOADS[opcode](registers, memory, rd, rs1, imm, next_pc)
+    if opcode in STORES:
+        return STORES[opcode](registers, memory, rs2, rs1, imm, next_pc)
+    if opcode == 'JAL':
+        return make_jal(registers, rd, imm, target, address + pc_stride)
+    if opcode == 'JALR':
+        # Byte addresses clear the lowest bit of the target, instruction indexes don't
+        target_mask = MASK32 if pc_stride == 1 else MASK32 & ~1
+        return make_jalr(registers, rd, rs1, imm, address + pc_stride, instruction_index, target_mask)
+    if opcode == 'LUI':
+        return make_nop(next_pc) if rd == 0 else make_lui(registers, rd, imm, next_pc)
+    if opcode == 'AUIPC':
+        return make_nop(next_pc) if rd == 0 else make_auipc(registers, rd, address, imm, next_pc)
+    if opcode in ['ECALL', 'EBREAK']:
+        return make_halt(pc, opcode)
+    # FENCE, FENCE.TSO and PAUSE only print in the interpreter
+    return make_nop(next_pc)
+
+def compile_program(decoded_program, opcodes, registers, memory, code_base=0, pc_stride=1):
+    # Compile a decoded program into a list of closures, one per instruction.
+    # Lines that failed to decode become no-ops, matching the interpreter.
+    instruction_index = {code_base + i * pc_stride: i for i in range(len(decoded_program))}
+    code = []
+    for pc, decoded in enumerate(decoded_program):
+        if decoded is None:
+            code.append(make_nop(pc + 1))
+        else:
+            code.append(compile_instruction(opcodes[decoded[0]], decoded, pc, registers, memory,
+                                            instruction_index, code_base, pc_stride))
+    return code
+
+def run_program(code, pc, max_steps=None, deadline=None):
+    # Tight dispatch loop. Returns (final pc, executed steps, halting opcode
+    # or None). With max_steps the run also stops after that many steps, and
+    # with deadline (a time.perf_counter() value) once the clock passes it.
+    # The clock is only read every DEADLINE_CHECK_INTERVAL steps. A run cut
+    # short by either budget ends with pc still inside the program.
+    instruction_count = len(code)
+    steps = 0
+    try:
+        if max_steps is None and deadline is None:
+            while 0 <= pc < instruction_count:
+                pc = code[pc]()
+                steps += 1
+        else:
+            limit = max_steps if max_steps is not None else float('inf')
+            while 0 <= pc < instruction_count and steps < limit:
+                chunk_end = limit if deadline is None else min(limit, steps + DEADLINE_CHECK_INTERVAL)
+                while 0 <= pc < instruction_count and steps < chunk_end:
+                    pc = code[pc]()
+                    steps += 1
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+    except Halt as halt:
+        return halt.pc, steps + 1, halt.opcode
+    return pc, steps, None
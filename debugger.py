@@ -0,0 +1,266 @@
+import operator
+import re
+
+import expected_state
+import memory_model
+from memory_model import PAGE_SHIFT
+
+# Breakpoints, watchpoints and register conditions for the interpreter loop
+# (store_load.py --break/--watch/--stop-when/--debug).
+#
+# The loop only asks the debugger about an instruction when its byte in
+# stop_map is set:
+#
+#     if stop_map is not None and stop_map[instruction_index[program_counter]]:
+#         reason = debugger.check(index, registers)
+#
+# stop_map is a bytearray over the decoded program with a 1 at every
+# breakpoint, rebuilt in place whenever the stop points change. Register
+# conditions and single stepping may stop anywhere, so they set every byte.
+# Without a debugger the loop keeps stop_map at None and pays nothing else.
+#
+# Watchpoints add no check of their own to the loop either: the memory is
+# switched to a watching class for the pages they cover (see
+# memory_model.watch_memory), and an access that really hits one sets every
+# byte of stop_map, so the next check() reports it right after the
+# instruction that made it.
+#
+# Breakpoints, watchpoints and conditions share one numbering, as in gdb.
+
+CONDITION = re.compile(r'^\s*x(\d+)\s*(==|!=|<=|>=|<|>)\s*(\S+)\s*$')
+COMPARISONS = {'==': operator.eq, '!=': operator.ne, '<': operator.lt,
+               '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+ACCESS_NAMES = {'w': 'store', 'r': 'load', 'rw': 'access'}
+
+def parse_condition(text):
+    # 'xN OP VALUE' -> (register, operator text, value). A negative value
+    # compares the register as signed, anything else as unsigned.
+    match = CONDITION.match(text)
+    if match is None or int(match.group(1)) > 31:
+        raise ValueError(f"invalid condition '{text}' (expected e.g. 'x5 == 10')")
+    register, comparison, value = match.groups()
+    try:
+        value = int(value, 0)
+    except ValueError:
+        raise ValueError(f"invalid value '{value}' in condition '{text}'")
+    return int(register), comparison, value
+
+def condition_text(condition):
+    register, comparison, value = condition
+    return f"x{register} {comparison} {value}"
+
+def parse_watch_range(text):
+    # START:END, START+SIZE or a single byte address
+    if ':' in text or '+' in text:
+        start, end = expected_state.parse_memory_range(text)
+    else:
+        start = int(text, 0)
+        end = start + 1
+    if end <= start:
+        raise ValueError(f"watch range '{text}' is empty")
+    return start, end
+
+def split_breakpoint(text):
+    # 'LOCATION' or 'LOCATION if CONDITION'
+    location, _, condition = text.partition(' if ')
+    return location.strip(), condition.strip() or None
+
+class Debugger:
+    def __init__(self, labels, instruction_index, pc_stride, instruction_count):
+        self.labels = labels
+        self.instruction_index = instruction_index
+        self.pc_stride = pc_stride
+        self.stop_map = bytearray(instruction_count)
+        self.all_set = b'\x01' * instruction_count
+        self.memory = None
+        self.next_number = 1
+        self.breakpoints = {}     # number -> (pc, condition or None)
+        self.watchpoints = {}     # number -> (start, end, access 'r'/'w'/'rw')
+        self.conditions = {}      # number -> condition, checked before every instruction
+        self.condition_held = {}  # number -> value at the last check (conditions stop on becoming true)
+        self.hits = []            # (number, kind, address, size, bytes before) since the last check
+        self.pending = []         # stop reasons not tied to an instruction (interrupts)
+        self.steps_left = None
+        self.resume_index = None
+
+    def attach(self, memory):
+        self.memory = memory
+        self.update_watch()
+
+    def resolve(self, location):
+        # Label name or PC value (an instruction index for index PCs) -> PC
+        if location in self.labels:
+            pc = self.labels[location]
+        else:
+            try:
+                pc = int(location, 0)
+            except ValueError:
+                raise ValueError(f"unknown label or address '{location}'")
+        if pc not in self.instruction_index:
+            raise ValueError(f"no instruction at {location}")
+        return pc
+
+    def take_number(self):
+        number = self.next_number
+        self.next_number += 1
+        return number
+
+    def add_breakpoint(self, location, condition=None):
+        pc = self.resolve(location)
+        parsed = parse_condition(condition) if condition is not None else None
+        number = self.take_number()
+        self.breakpoints[number] = (pc, parsed)
+        self.rebuild()
+        return number
+
+    def add_watchpoint(self, start, end, access='w'):
+        number = self.take_number()
+        self.watchpoints[number] = (start, end, access)
+        self.update_watch()
+        return number
+
+    def add_condition(self, text):
+        parsed = parse_condition(text)
+        number = self.take_number()
+        self.conditions[number] = parsed
+        self.condition_held[number] = False
+        self.rebuild()
+        return number
+
+    def delete(self, number):
+        if number in self.breakpoints:
+            del self.breakpoints[number]
+        elif number in self.watchpoints:
+            del self.watchpoints[number]
+            self.update_watch()
+        elif number in self.conditions:
+            del self.conditions[number]
+            del self.condition_held[number]
+        else:
+            raise ValueError(f"no breakpoint, watchpoint or condition {number}")
+        self.rebuild()
+
+    def cont(self):
+        # Run to the next stop point
+        if self.steps_left is not None:
+            self.steps_left = None
+            self.rebuild()
+
+    def step(self, count=1):
+        # Stop again after `count` more instructions
+        self.steps_left = count
+        self.rebuild()
+
+    def interrupt(self, reason):
+        # Stop before the next instruction whatever it is
+        self.pending.append(reason)
+        self.stop_map[:] = self.all_set
+
+    def resume(self, index):
+        # Run the instruction the loop stopped at without stopping there again
+        self.resume_index = index if index is not None and self.stop_map[index] else None
+
+    def rebuild(self):
+        if self.conditions or self.steps_left is not None or self.hits or self.pending:
+            self.stop_map[:] = self.all_set
+            return
+        self.stop_map[:] = bytes(len(self.stop_map))
+        for pc, _ in self.breakpoints.values():
+            self.stop_map[self.instruction_index[pc]] = 1
+
+    def update_watch(self):
+        if self.memory is None:
+            return
+        pages = set()
+        for start, end, _ in self.watchpoints.values():
+            pages.update(range(start >> PAGE_SHIFT, ((end - 1) >> PAGE_SHIFT) + 1))
+        if pages:
+            memory_model.watch_memory(self.memory, pages, self.on_access)
+        else:
+            memory_model.unwatch_memory(self.memory)
+
+    def on_access(self, kind, address, size):
+        # Called by the watched memory before a load/store on a watched page
+        for number, (start, end, access) in self.watchpoints.items():
+            if kind in access and start < address + size and address < end:
+                if all(hit[0] != number for hit in self.hits):
+                    self.hits.append((number, kind, address, size, self.memory.load_bytes(address, size)))
+                    self.stop_map[:] = self.all_set
+
+    def holds(self, condition, registers):
+        register, comparison, value = condition
+        current = registers[register]
+        if value < 0 and current & 0x80000000:
+            current -= 0x100000000
+        return COMPARISONS[comparison](current, value)
+
+    def check(self, index, registers):
+        # Called before instruction `index` runs when its stop_map byte is
+        # set; returns why to stop there, or None to run it
+        reasons = self.pending + [self.describe_hit(hit) for hit in self.hits]
+        changed = bool(reasons)
+        self.pending = []
+        self.hits = []
+        if index == self.resume_index:
+            self.resume_index = None
+        else:
+            if self.steps_left is not None:
+                self.steps_left -= 1
+                if self.steps_left <= 0:
+                    self.steps_left = None
+                    changed = True
+                    reasons.append("Step")
+            for number, (pc, condition) in self.breakpoints.items():
+                if self.instruction_index[pc] == index and (condition is None or self.holds(condition, registers)):
+                    reasons.append(f"Breakpoint {number}")
+        for number, condition in self.conditions.items():
+            held = self.holds(condition, registers)
+            if held and not self.condition_held[number]:
+                reasons.append(f"Condition {number} ({condition_text(condition)}) is true")
+            self.condition_held[number] = held
+        if reasons and self.steps_left is not None:
+            # Any other stop ends a step count early
+            self.steps_left = None
+            changed = True
+        if changed:
+            self.rebuild()
+        return '; '.join(reasons) or None
+
+    def describe_hit(self, hit):
+        number, kind, address, size, before = hit
+        old = int.from_bytes(before, 'little')
+        if kind == 'r':
+            return f"Watchpoint {number}: load of {size} bytes at 0x{address:08X} (0x{old:0{2 * size}X})"
+        new = int.from_bytes(self.memory.load_bytes(address, size), 'little')
+        return (f"Watchpoint {number}: store of {size} bytes at 0x{address:08X} "
+                f"(0x{old:0{2 * size}X} -> 0x{new:0{2 * size}X})")
+
+    def location(self, pc):
+        # 'label+offset' for the nearest label at or before pc (symbols are
+        # added after the synthesized branch-target labels, so they win ties)
+        best = None
+        for name, address in self.labels.items():
+            if address <= pc and (best is None or address >= self.labels[best]):
+                best = name
+        if best is None:
+            return None
+        offset = pc - self.labels[best]
+        return best if offset == 0 else f"{best}+{offset}"
+
+    def describe(self):
+        lines = []
+        for number in sorted(self.breakpoints.keys() | self.watchpoints.keys() | self.conditions.keys()):
+            if number in self.breakpoints:
+                pc, condition = self.breakpoints[number]
+                where = pc if self.pc_stride == 1 else f"0x{pc:08X}"
+                label = self.location(pc)
+                text = f"{number}: breakpoint at {where}" + (f" <{label}>" if label else "")
+                if condition is not None:
+                    text += f" if {condition_text(condition)}"
+            elif number in self.watchpoints:
+                start, end, access = self.watchpoints[number]
+                text = f"{number}: watch {ACCESS_NAMES[access]} 0x{start:08X}:0x{end:08X}"
+            else:
+                text = f"{number}: stop when {condition_text(self.conditions[number])}"
+            lines.append(text)
+        return lines
@@ -0,0 +1,80 @@
+import sys
+
+# Delta-only state trace.
+#
+# Instead of dumping all 32 registers and the whole memory map after every
+# instruction, each step is written as one compact line holding only the
+# registers and memory bytes the instruction wrote:
+#
+#        7 pc=5      -> 6      SW x1, 100(x2)                 | [0x000000D2]=0x64 [0x000000D3]=0x00
+#
+# A full-state CHECKPOINT line is written at step 0 and then every N steps,
+# so the state at any step can be rebuilt with replay_trace() by starting at
+# the nearest checkpoint and applying the deltas that follow it.
+
+DEFAULT_CHECKPOINT_INTERVAL = 10000
+
+def format_changes(registers, written_registers, memory, written_addresses):
+    changes = [f"x{rd}=0x{registers[rd]:08X}" for rd in sorted(set(written_registers)) if rd != 0]
+    changes += [f"[0x{address:08X}]=0x{memory[address]:02X}" for address in sorted(set(written_addresses))]
+    return ' '.join(changes)
+
+class DeltaTrace:
+    def __init__(self, output, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL):
+        self.output = output
+        self.checkpoint_interval = checkpoint_interval
+
+    def write_step(self, step, pc, instruction, registers, written_registers, memory, written_addresses, next_pc):
+        changes = format_changes(registers, written_registers, memory, written_addresses)
+        self.output.write(f"{step:>8} pc={pc:<6} -> {next_pc:<6} {instruction:<30} | {changes}\n")
+        if self.checkpoint_interval and step % self.checkpoint_interval == 0:
+            self.write_checkpoint(step, next_pc, registers, memory)
+
+    def write_checkpoint(self, step, pc, registers, memory):
+        register_dump = ' '.join(f"x{i}=0x{registers[i]:08X}" for i in range(32))
+        memory_dump = ' '.join(f"[0x{address:08X}]=0x{value:02X}" for address, value in memory.items_in_range())
+        self.output.write(f"CHECKPOINT step={step} pc={pc} | {register_dump} | {memory_dump}\n")
+
+    def close(self):
+        if self.output is sys.stdout:
+            self.output.flush()
+        else:
+            self.output.close()
+
+def apply_changes(fields, registers, memory):
+    for change in fields.split():
+        name, value = change.split('=')
+        if name.startswith('x'):
+            registers[int(name[1:])] = int(value, 16)
+        else:
+            memory[int(name[1:-1], 16)] = int(value, 16)
+
+def replay_trace(lines, stop_step=None):
+    # Rebuild (step, pc, registers, memory) after stop_step (default: the
+    # last step in the trace) from checkpoint and delta lines
+    step, pc = 0, 0
+    registers = [0] * 32
+    memory = {}
+    for line in lines:
+        line = line.rstrip('\n')
+        if line.startswith('CHECKPOINT'):
+            header, register_dump, memory_dump = line.split(' | ')
+            checkpoint_step = int(header.split()[1].split('=')[1])
+            if stop_step is not None and checkpoint_step > stop_step:
+                break
+            step = checkpoint_step
+            pc = int(header.split()[2].split('=')[1])
+            registers = [0] * 32
+            memory = {}
+            apply_changes(register_dump, registers, memory)
+            apply_changes(memory_dump, registers, memory)
+        elif line.strip():
+            header, changes = line.rsplit(' | ', 1)
+            fields = header.split()
+            line_step = int(fields[0])
+            if stop_step is not None and line_step > stop_step:
+                break
+            step = line_step
+            pc = int(fields[3])
+            apply_changes(changes, registers, memory)
+    return step, pc, registers, memory
@@ -0,0 +1,110 @@
+import struct
+
+# Loader for ELF32 little-endian RISC-V executables, standard library only.
+#
+# Only what the simulator needs is read: the PT_LOAD segments (mapped into
+# simulated memory at p_vaddr), the entry point, and the names and values
+# of the symbols in .symtab (used as labels in the trace).
+
+ELF_MAGIC = b'\x7fELF'
+ELFCLASS32 = 1
+ELFDATA2LSB = 1
+ET_EXEC = 2
+ET_DYN = 3
+EM_RISCV = 243
+
+PT_LOAD = 1
+PF_X = 0x1
+
+SHT_SYMTAB = 2
+SHN_UNDEF = 0
+LABEL_SYMBOL_TYPES = (0, 1, 2)  # STT_NOTYPE, STT_OBJECT, STT_FUNC
+
+# e_ident, e_type, e_machine, e_version, e_entry, e_phoff, e_shoff, e_flags,
+# e_ehsize, e_phentsize, e_phnum, e_shentsize, e_shnum, e_shstrndx
+ELF_HEADER = struct.Struct('<16sHHIIIIIHHHHHH')
+# p_type, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_flags, p_align
+PROGRAM_HEADER = struct.Struct('<IIIIIIII')
+# sh_name, sh_type, sh_flags, sh_addr, sh_offset, sh_size, sh_link, sh_info, sh_addralign, sh_entsize
+SECTION_HEADER = struct.Struct('<IIIIIIIIII')
+# st_name, st_value, st_size, st_info, st_other, st_shndx
+SYMBOL = struct.Struct('<IIIBBH')
+
+class ElfProgram:
+    def __init__(self, entry, segments, symbols):
+        self.entry = entry          # e_entry
+        self.segments = segments    # [(vaddr, file bytes, memsz, flags)] for every PT_LOAD
+        self.symbols = symbols      # symbol name -> address
+
+    def code_image(self):
+        # (base address, bytes) spanning every executable segment, so the
+        # whole text can be decoded as one program. Gaps are zero-filled.
+        code = [segment for segment in self.segments if segment[3] & PF_X]
+        if not code:
+            raise ValueError("ELF file has no executable PT_LOAD segment")
+        base = min(vaddr for vaddr, _, _, _ in code)
+        end = max(vaddr + len(data) for vaddr, data, _, _ in code)
+        image = bytearray(end - base)
+        for vaddr, data, _, _ in code:
+            image[vaddr - base:vaddr - base + len(data)] = data
+        return base, bytes(image)
+
+def is_elf_file(path):
+    try:
+        with open(path, 'rb') as file:
+            return file.read(4) == ELF_MAGIC
+    except OSError:
+        return False
+
+def read_string(data, offset):
+    end = data.find(b'\x00', offset)
+    return data[offset:end if end != -1 else len(data)].decode('utf-8', 'replace')
+
+def read_symbols(data, shoff, shentsize, shnum):
+    symbols = {}
+    if not shoff or not shnum:
+        return symbols
+    sections = [SECTION_HEADER.unpack_from(data, shoff + i * shentsize) for i in range(shnum)]
+    for _, sh_type, _, _, sh_offset, sh_size, sh_link, _, _, sh_entsize in sections:
+        if sh_type != SHT_SYMTAB or sh_link >= shnum:
+            continue
+        string_table = sections[sh_link][4]
+        for offset in range(sh_offset, sh_offset + sh_size, sh_entsize or SYMBOL.size):
+            st_name, st_value, _, st_info, _, st_shndx = SYMBOL.unpack_from(data, offset)
+            if not st_name or st_shndx == SHN_UNDEF or (st_info & 0xF) not in LABEL_SYMBOL_TYPES:
+                continue
+            name = read_string(data, string_table + st_name)
+            # Skip assembler mapping symbols such as $x and $d
+            if name and not name.startswith('$'):
+                symbols[name] = st_value
+    return symbols
+
+def parse_elf(data):
+    if len(data) < ELF_HEADER.size or data[:4] != ELF_MAGIC:
+        raise ValueError("not an ELF file")
+    (ident, e_type, e_machine, _, e_entry, e_phoff, e_shoff, _,
+     _, e_phentsize, e_phnum, e_shentsize, e_shnum, _) = ELF_HEADER.unpack_from(data)
+    if ident[4] != ELFCLASS32 or ident[5] != ELFDATA2LSB:
+        raise ValueError("only ELF32 little-endian files are supported")
+    if e_machine != EM_RISCV:
+        raise ValueError(f"ELF machine {e_machine} is not RISC-V")
+    if e_type not in (ET_EXEC, ET_DYN):
+        raise ValueError("ELF file is not an executable (was it linked?)")
+
+    segments = []
+    try:
+        for i in range(e_phnum):
+            (p_type, p_offset, p_vaddr, _, p_filesz, p_memsz,
+             p_flags, _) = PROGRAM_HEADER.unpack_from(data, e_phoff + i * e_phentsize)
+            if p_type == PT_LOAD and p_memsz:
+                if p_offset + p_filesz > len(data):
+                    raise ValueError(f"PT_LOAD segment at 0x{p_vaddr:08X} runs past the end of the file")
+                segments.append((p_vaddr, bytes(data[p_offset:p_offset + p_filesz]), p_memsz, p_flags))
+        symbols = read_symbols(data, e_shoff, e_shentsize, e_shnum)
+    except struct.error:
+        raise ValueError("truncated ELF file")
+    return ElfProgram(e_entry, segments, symbols)
+
+def read_elf_file(file_path):
+    with open(file_path, 'rb') as file:
+        return parse_elf(file.read())
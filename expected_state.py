@@ -0,0 +1,133 @@
+import json
+
+# Golden files: the expected final state of a test program, kept next to
+# it as <program>.expected.json:
+#
+#     {
+#       "pc": 6,
+#       "halted": "ECALL",
+#       "registers": {"x1": "0x0000000A", "x2": 5},
+#       "memory": {"0x00000100": "0a000000ff"}
+#     }
+#
+# Every key is optional and only what is listed is checked, so a
+# hand-written golden can name just the registers a test is about.
+# "memory" maps a start address to the hex bytes expected from there on;
+# bytes never written compare as 0. Numbers may be integers or strings in
+# any base int(value, 0) accepts.
+#
+# check_simulator() compares a golden with a live Simulator directly
+# (registers list, program counter, memory.load_bytes), and
+# golden_from_simulator() writes one from a reference run.
+
+EXPECTED_SUFFIX = '.expected.json'
+
+def parse_value(value):
+    return int(value, 0) if isinstance(value, str) else value
+
+def parse_register(name):
+    number = int(name[1:]) if name[:1] in 'xX' else -1
+    if not 0 <= number < 32:
+        raise ValueError(f"invalid register '{name}' in expected state")
+    return number
+
+def parse_memory_range(text):
+    # 'START:END' (end exclusive) or 'START+SIZE', e.g. 0x100:0x140
+    if '+' in text:
+        start, size = text.split('+', 1)
+        return int(start, 0), int(start, 0) + int(size, 0)
+    start, end = text.split(':', 1)
+    if int(end, 0) < int(start, 0):
+        raise ValueError(f"memory range '{text}' ends before it starts")
+    return int(start, 0), int(end, 0)
+
+def written_ranges(addresses):
+    # Coalesce sorted written addresses into [start, end) runs
+    ranges = []
+    for address in addresses:
+        if ranges and ranges[-1][1] == address:
+            ranges[-1][1] = address + 1
+        else:
+            ranges.append([address, address + 1])
+    return [tuple(run) for run in ranges]
+
+class ExpectedState:
+    __slots__ = ('pc', 'halted', 'registers', 'memory')
+
+    def __init__(self, pc=None, halted=None, registers=(), memory=()):
+        self.pc = pc                     # final PC or None
+        self.halted = halted             # halting opcode or None
+        self.registers = list(registers) # [(register number, value)]
+        self.memory = list(memory)       # [(start address, bytes)]
+
+    @classmethod
+    def from_json(cls, data):
+        try:
+            return cls(parse_value(data['pc']) if 'pc' in data else None,
+                       data.get('halted'),
+                       [(parse_register(name), parse_value(value) & 0xFFFFFFFF)
+                        for name, value in data.get('registers', {}).items()],
+                       [(parse_value(address), bytes.fromhex(data_hex))
+                        for address, data_hex in data.get('memory', {}).items()])
+        except (TypeError, ValueError, AttributeError) as e:
+            raise ValueError(f"invalid expected state: {e}")
+
+    def to_json(self):
+        data = {}
+        if self.pc is not None:
+            data['pc'] = self.pc
+        if self.halted is not None:
+            data['halted'] = self.halted
+        data['registers'] = {f"x{number}": f"0x{value:08X}" for number, value in self.registers}
+        if self.memory:
+            data['memory'] = {f"0x{address:08X}": data_bytes.hex() for address, data_bytes in self.memory}
+        return data
+
+    def check(self, pc, halted, registers, load_bytes):
+        # Returns a list of mismatch descriptions, empty when everything matches
+        mismatches = []
+        if self.pc is not None and pc != self.pc:
+            mismatches.append(f"pc: expected 0x{self.pc:08X}, got 0x{pc:08X}")
+        if self.halted is not None and halted != self.halted:
+            mismatches.append(f"halted: expected {self.halted}, got {halted}")
+        for number, value in self.registers:
+            if registers[number] != value:
+                mismatches.append(f"x{number}: expected 0x{value:08X}, got 0x{registers[number]:08X}")
+        for address, expected in self.memory:
+            actual = load_bytes(address, len(expected))
+            if actual != expected:
+                offset = next(i for i in range(len(expected)) if actual[i] != expected[i])
+                mismatches.append(f"memory 0x{address + offset:08X}: expected 0x{expected[offset]:02X}, "
+                                  f"got 0x{actual[offset]:02X} (range 0x{address:08X}+{len(expected)})")
+        return mismatches
+
+def load_expected(path):
+    with open(path, 'r') as file:
+        return ExpectedState.from_json(json.load(file))
+
+def save_expected(path, expected):
+    with open(path, 'w') as file:
+        json.dump(expected.to_json(), file, indent=1)
+        file.write('\n')
+
+def check_simulator(simulator, expected):
+    return expected.check(simulator.program_counter, simulator.halted_by,
+                          simulator.registers, simulator.memory.load_bytes)
+
+def check_state(state, expected):
+    # Same check against a Simulator.snapshot()
+    memory = state['memory']
+    def load_bytes(address, size):
+        return bytes(memory.get(byte_address, 0) for byte_address in range(address, address + size))
+    return expected.check(state['pc'], state['halted'], state['registers'], load_bytes)
+
+def golden_from_simulator(simulator, memory_ranges=None):
+    # Golden for a reference run: every register, the final PC and halting
+    # opcode, and either the given [start, end) memory ranges or every run
+    # of bytes the program wrote
+    if memory_ranges is None:
+        memory_ranges = written_ranges(simulator.memory.keys())
+    return ExpectedState(simulator.program_counter, simulator.halted_by,
+                         list(enumerate(simulator.registers))[1:],
+                         [(start, simulator.memory.load_bytes(start, end - start))
+                          for start, end in memory_ranges if end > start])
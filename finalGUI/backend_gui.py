@@ -1,11 +1,35 @@
+import contextlib
+import io
+import os
 import sys
+import time
+
+# Shared simulator modules live in the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import assembler
+import memory_model
+from assembler import OPCODES
 
 # Global Variables
 registers = [0] * 32
 program_counter = 0
-memory = {}
+memory = memory_model.create_memory()
 labels = {}
 executable_instructions = []
+base_address = 0  # PC of the first instruction
+
+# Trace levels, from quietest to most verbose (see store_load.py)
+TRACE_LEVELS = ['none', 'final', 'delta', 'full']
+
+# Run budgets, so a program that never ends cannot freeze the Tk main loop
+GUI_MAX_STEPS = 100000
+GUI_TIME_LIMIT = 10.0  # seconds
+DEADLINE_CHECK_INTERVAL = 1024  # steps between clock reads
+PROGRESS_INTERVAL = 256  # steps between progress() calls
+
+# Memory addresses written by the current instruction (only kept for delta traces)
+track_writes = False
+written_addresses = []
 
 def to_signed32(val):
     #Convert 32-bit unsigned integer to signed integer
@@ -14,44 +38,42 @@ def to_signed32(val):
     else:
         return val
 
-# Memory Handling Helper Functions
+# Memory Handling Helper Functions (the storage itself lives in memory_model)
 def store_byte(address, value):
-    memory[address] = value & 0xFF
+    memory.store_byte(address, value)
+    if track_writes:
+        written_addresses.append(address)
 
 def store_halfword(address, value):
-    store_byte(address, value & 0xFF)
-    store_byte(address + 1, (value >> 8) & 0xFF)
+    memory.store_halfword(address, value)
+    if track_writes:
+        written_addresses.extend(range(address, address + 2))
 
 def store_word(address, value):
-    store_byte(address, value & 0xFF)
-    store_byte(address + 1, (value >> 8) & 0xFF)
-    store_byte(address + 2, (value >> 16) & 0xFF)
-    store_byte(address + 3, (value >> 24) & 0xFF)
+    memory.store_word(address, value)
+    if track_writes:
+        written_addresses.extend(range(address, address + 4))
+
+def warn_uninitialized(address, size):
+    for byte_address in range(address, address + size):
+        if byte_address not in memory:
+            output_to_gui_global(f"Warning: Loading from uninitialized memory address {byte_address}. Returning 0.")
 
 def load_byte(address):
-    if address not in memory:
-        output_to_gui_global(f"Warning: Loading from uninitialized memory address {address}. Returning 0.")
-    return memory.get(address, 0)
+    warn_uninitialized(address, 1)
+    return memory.load_byte(address)
 
 def load_halfword(address):
-    byte1 = load_byte(address)
-    byte2 = load_byte(address + 1)
-    value = (byte2 << 8) | byte1
-    if value & 0x8000:
-        value |= 0xFFFF0000  # Sign-extend to 32 bits
-    return value
+    warn_uninitialized(address, 2)
+    return memory.load_halfword(address)
 
 def load_halfword_unsigned(address):
-    byte1 = load_byte(address)
-    byte2 = load_byte(address + 1)
-    return (byte2 << 8) | byte1
+    warn_uninitialized(address, 2)
+    return memory.load_halfword_unsigned(address)
 
 def load_word(address):
-    byte1 = load_byte(address)
-    byte2 = load_byte(address + 1)
-    byte3 = load_byte(address + 2)
-    byte4 = load_byte(address + 3)
-    return (byte4 << 24) | (byte3 << 16) | (byte2 << 8) | byte1
+    warn_uninitialized(address, 4)
+    return memory.load_word(address)
 
 # Arithmetic and Logical Instructions
 def add(rd, rs1, rs2):
@@ -184,15 +206,15 @@ def and_(rd, rs1, rs2):
         output_to_gui_global(f"AND: x{rd} = x{rs1} & x{rs2} -> {registers[rd]}")
 
 # Branch Instructions 
-def beq(rs1, rs2, target_label):
+def beq(rs1, rs2, target_label, target):
     global program_counter
     if rs1 is None or rs2 is None:
         output_to_gui_global(f"Error: BEQ instruction missing operands rs1={rs1}, rs2={rs2}")
         return False
 
     if registers[rs1] == registers[rs2]:
-        if target_label in labels:
-            program_counter = labels[target_label]
+        if target is not None:
+            program_counter = base_address + target
             output_to_gui_global(f"BEQ: Branch taken to label '{target_label}'")
             return True
         else:
@@ -202,15 +224,15 @@ def beq(rs1, rs2, target_label):
         output_to_gui_global(f"BEQ: Branch not taken, x{rs1}={registers[rs1]}, x{rs2}={registers[rs2]}")
     return False
 
-def bne(rs1, rs2, target_label):
+def bne(rs1, rs2, target_label, target):
     global program_counter
     if rs1 is None or rs2 is None:
         output_to_gui_global(f"Error: BNE instruction missing operands rs1={rs1}, rs2={rs2}")
         return False
 
     if registers[rs1] != registers[rs2]:
-        if target_label in labels:
-            program_counter = labels[target_label]
+        if target is not None:
+            program_counter = base_address + target
             output_to_gui_global(f"BNE: Branch taken to label '{target_label}'")
             return True
         else:
@@ -220,15 +242,15 @@ def bne(rs1, rs2, target_label):
         output_to_gui_global(f"BNE: Branch not taken, x{rs1}={registers[rs1]}, x{rs2}={registers[rs2]}")
     return False
 
-def blt(rs1, rs2, target_label):
+def blt(rs1, rs2, target_label, target):
     global program_counter
     if rs1 is None or rs2 is None:
         output_to_gui_global(f"Error: BLT instruction missing operands rs1={rs1}, rs2={rs2}")
         return False
 
     if registers[rs1] < registers[rs2]:
-        if target_label in labels:
-            program_counter = labels[target_label]
+        if target is not None:
+            program_counter = base_address + target
             output_to_gui_global(f"BLT: Branch taken to label '{target_label}'")
             return True
         else:
@@ -238,15 +260,15 @@ def blt(rs1, rs2, target_label):
         output_to_gui_global(f"BLT: Branch not taken, x{rs1}={registers[rs1]}, x{rs2}={registers[rs2]}")
     return False
 
-def bge(rs1, rs2, target_label):
+def bge(rs1, rs2, target_label, target):
     global program_counter
     if rs1 is None or rs2 is None:
         output_to_gui_global(f"Error: BGE instruction missing operands rs1={rs1}, rs2={rs2}")
         return False
 
     if registers[rs1] >= registers[rs2]:
-        if target_label in labels:
-            program_counter = labels[target_label]
+        if target is not None:
+            program_counter = base_address + target
             output_to_gui_global(f"BGE: Branch taken to label '{target_label}'")
             return True
         else:
@@ -256,15 +278,15 @@ def bge(rs1, rs2, target_label):
         output_to_gui_global(f"BGE: Branch not taken, x{rs1}={registers[rs1]}, x{rs2}={registers[rs2]}")
     return False
 
-def bltu(rs1, rs2, target_label):
+def bltu(rs1, rs2, target_label, target):
     global program_counter
     if rs1 is None or rs2 is None:
         output_to_gui_global(f"Error: BLTU instruction missing operands rs1={rs1}, rs2={rs2}")
         return False
 
     if (registers[rs1] & 0xFFFFFFFF) < (registers[rs2] & 0xFFFFFFFF):
-        if target_label in labels:
-            program_counter = labels[target_label]
+        if target is not None:
+            program_counter = base_address + target
             output_to_gui_global(f"BLTU: Branch taken to label '{target_label}'")
             return True
         else:
@@ -274,15 +296,15 @@ def bltu(rs1, rs2, target_label):
         output_to_gui_global(f"BLTU: Branch not taken, x{rs1}={registers[rs1]}, x{rs2}={registers[rs2]}")
     return False
 
-def bgeu(rs1, rs2, target_label):
+def bgeu(rs1, rs2, target_label, target):
     global program_counter
     if rs1 is None or rs2 is None:
         output_to_gui_global(f"Error: BGEU instruction missing operands rs1={rs1}, rs2={rs2}")
         return False
 
     if (registers[rs1] & 0xFFFFFFFF) >= (registers[rs2] & 0xFFFFFFFF):
-        if target_label in labels:
-            program_counter = labels[target_label]
+        if target is not None:
+            program_counter = base_address + target
             output_to_gui_global(f"BGEU: Branch taken to label '{target_label}'")
             return True
         else:
@@ -387,29 +409,29 @@ def sh(rs2, offset, rs1):
     output_to_gui_global(f"SH: Stored halfword {value_to_store} from x{rs2} to memory address {address}")
 
 # Jump and Link Instructions
-def jal(rd, target_label):
+def jal(rd, target_label, target):
     global program_counter
     if rd != 0:
         registers[rd] = program_counter + 1  # Store return address
         output_to_gui_global(f"JAL: Set x{rd} to {registers[rd]}")
-    if target_label in labels:
-        program_counter = labels[target_label]  # Jump to label
-        output_to_gui_global(f"JAL: Jumping to label '{target_label}' at instruction index {labels[target_label]}")
+    if target is not None:
+        program_counter = base_address + target  # Jump to label
+        output_to_gui_global(f"JAL: Jumping to label '{target_label}' at instruction index {program_counter}")
     else:
         raise ValueError(f"Label '{target_label}' not found.")
 
 def jalr(rd, rs1, imm):
     global program_counter
+    # Read rs1 before the link register is written, so jalr x1, x1, imm works
+    target_address = (registers[rs1] + imm) & 0xFFFFFFFF
     if rd != 0:
         registers[rd] = program_counter + 1  # Store return address
         output_to_gui_global(f"JALR: Set x{rd} to {registers[rd]}")
-    target_address = (registers[rs1] + imm) & 0xFFFFFFFF
     if 0 <= target_address < len(executable_instructions):
         program_counter = target_address  # Jump to target address
         output_to_gui_global(f"JALR: Jumping to instruction index {target_address}")
     else:
-        output_to_gui_global(f"Error: Invalid jump address '{target_address}'.")
-        sys.exit(1)
+        raise ValueError(f"Invalid jump address '{target_address}'.")
 
 # Upper Immediate Instructions
 def lui(rd, imm):
@@ -456,140 +478,7 @@ def read_instructions_from_file(file_path):
         with open(file_path, 'r') as file:
             return file.readlines()
     except FileNotFoundError:
-        output_to_gui_global(f"Error: File '{file_path}' not found.")
-        sys.exit(1)
-
-def parse_register(reg):
-    reg = reg.strip()
-    if reg.lower().startswith('x') and reg[1:].isdigit():
-        reg_num = int(reg[1:])
-        if 0 <= reg_num < 32:
-            return reg_num
-    output_to_gui_global(f"Error: Invalid register {reg}")
-    return None
-
-def parse_immediate(value):
-    try:
-        return int(value, 0)
-    except ValueError:
-        output_to_gui_global(f"Error: Invalid immediate value '{value}'")
-        return None
-
-def instruction_splitting(line):
-    line = line.strip()
-    if '#' in line:
-        line = line.split('#')[0].strip()
-
-    if not line:
-        return None, None, None, None, None, None
-
-    parts = line.replace(',', ' ').split()
-    opcode = parts[0].upper()
-
-    # Handling Load and Store Instructions with Offset Notation
-    if opcode in ['SW', 'SB', 'SH', 'LW', 'LH', 'LHU', 'LB', 'LBU']:
-        if len(parts) != 3:
-            output_to_gui_global(f"Error: {opcode} instruction missing operands. line='{line}'")
-            return None, None, None, None, None, None
-        reg1 = parse_register(parts[1])
-        try:
-            offset_str, base_register = parts[2].split('(')
-            offset = parse_immediate(offset_str)
-            reg2 = parse_register(base_register[:-1])
-        except ValueError:
-            output_to_gui_global(f"Error: Invalid offset notation. line='{line}'")
-            return None, None, None, None, None, None
-        if opcode in ['SW', 'SB', 'SH']:
-            return opcode, None, reg2, reg1, offset, None  # rs2, offset, rs1
-        else:
-            return opcode, reg1, reg2, None, offset, None  # rd, rs1, offset
-
-
-    # Handling JALR Instruction
-    elif opcode == 'JALR':
-        if len(parts) == 2:
-            # Format: jalr rd
-            rd = parse_register(parts[1])
-            return opcode, rd, None, None, 0, None
-        elif len(parts) == 3:
-            # Format: jalr rd, rs1
-            rd = parse_register(parts[1])
-            rs1 = parse_register(parts[2])
-            return opcode, rd, rs1, None, 0, None
-        elif len(parts) == 4:
-            # Format: jalr rd, rs1, imm
-            rd = parse_register(parts[1])
-            rs1 = parse_register(parts[2])
-            imm = parse_immediate(parts[3])
-            return opcode, rd, rs1, None, imm, None
-        else:
-            output_to_gui_global(f"Error: JALR instruction missing operands. line='{line}'")
-            return None, None, None, None, None, None
-
-    # Immediate Arithmetic and Logical Instructions
-    elif opcode in ['ADDI', 'ANDI', 'ORI', 'XORI', 'SLTI', 'SLTIU',
-                    'SLLI', 'SRLI', 'SRAI']:
-        if len(parts) != 4:
-            output_to_gui_global(f"Error: {opcode} instruction missing operands. line='{line}'")
-            return None, None, None, None, None, None
-        rd = parse_register(parts[1])
-        rs1 = parse_register(parts[2])
-        imm = parse_immediate(parts[3])
-        return opcode, rd, rs1, None, imm, None
-
-    # R-type instructions 
-    elif opcode in ['ADD', 'SUB', 'SLT', 'SLTU', 'XOR', 'OR', 'AND',
-                    'SLL', 'SRL', 'SRA']:
-        if len(parts) != 4:
-            output_to_gui_global(f"Error: {opcode} instruction missing operands. line='{line}'")
-            return None, None, None, None, None, None
-        rd = parse_register(parts[1])
-        rs1 = parse_register(parts[2])
-        rs2 = parse_register(parts[3])
-        return opcode, rd, rs1, rs2, None, None
-
-    # Branch Instructions
-    elif opcode in ['BEQ', 'BNE', 'BLT', 'BGE', 'BLTU', 'BGEU']:
-        if len(parts) != 4:
-            output_to_gui_global(f"Error: {opcode} instruction missing operands. line='{line}'")
-            return None, None, None, None, None, None
-        rs1 = parse_register(parts[1])
-        rs2 = parse_register(parts[2])
-        label = parts[3]
-        return opcode, None, rs1, rs2, label, None
-
-    # Upper Immediate Instructions
-    elif opcode in ['LUI', 'AUIPC']:
-        if len(parts) != 3:
-            output_to_gui_global(f"Error: {opcode} instruction missing operands. line='{line}'")
-            return None, None, None, None, None, None
-        rd = parse_register(parts[1])
-        imm = parse_immediate(parts[2])
-        return opcode, rd, None, None, imm, None
-
-    # Jump Instructions
-    elif opcode == 'JAL':
-        if len(parts) == 2:
-            # Format: jal label
-            rd = 1  # Default return register x1
-            label = parts[1]
-            return opcode, rd, None, None, label, None
-        elif len(parts) == 3:
-            # Format: jal rd, label
-            rd = parse_register(parts[1])
-            label = parts[2]
-            return opcode, rd, None, None, label, None
-        else:
-            output_to_gui_global(f"Error: JAL instruction missing operands. line='{line}'")
-            return None, None, None, None, None, None
-
-    # System instructions (ECALL, EBREAK, FENCE, FENCE.TSO, PAUSE)
-    elif opcode in ['ECALL', 'EBREAK', 'FENCE', 'FENCE.TSO', 'PAUSE']:
-        return opcode, None, None, None, None, None
-
-    else:
-        output_to_gui_global(f"Error: Unrecognized instruction format. line='{line}'")
-        return None, None, None, None, None, None
+        raise ValueError(f"File '{file_path}' not found.")
 
 def output_to_gui_globalRegisters(instruction=None):
     """output_to_gui_globals the state of the program."""
@@ -647,6 +536,21 @@ def output_to_gui_globalRegisters(instruction=None):
     else:
         output_to_gui_global("\nNo labels found.\n")
 
+def output_state_delta(output, pc, instruction, registers_before):
+    # One line per instruction: registers and memory bytes it changed
+    changes = [f"x{i}=0x{registers[i]:08X}" for i in range(1, 32) if registers[i] != registers_before[i]]
+    for address in sorted(set(written_addresses)):
+        changes.append(f"[0x{address:08X}]=0x{memory[address]:02X}")
+    output(f"PC {pc:>5}: {instruction:<30} {' '.join(changes) if changes else '-'}")
+
+def errors_only(output):
+    # Output sink for the quieter trace levels: drop handler messages, keep errors
+    def output_errors(*args):
+        text = " ".join(str(arg) for arg in args)
+        if text.lstrip().startswith('Error'):
+            output(text)
+    return output_errors
+
 # Function to load memory from a text input
 def load_memory_from_text(memory_text):
     global memory
@@ -654,36 +558,36 @@ def load_memory_from_text(memory_text):
         lines = memory_text.splitlines()
         for line in lines:
             line = line.strip()
-            if line and not line.startswith('#'):
-                address_str, value_str = line.split(',')
-                address = int(address_str.strip(), 0)
-                value = value_str.strip()
-                if value.startswith('"') and value.endswith('"'):
-                    # Handle string values
-                    string_value = value[1:-1]
-                    for i, char in enumerate(string_value):
-                        store_byte(address + i, ord(char))
-                elif value.startswith("'") and value.endswith("'"):
-                    # Handle character values
-                    store_byte(address, ord(value[1]))
-                else:
-                    # Handle numeric values
-                    store_word(address, int(value, 0))
+            if line.startswith('@image'):
+                # '@image <path>[, <base>]' maps a raw binary image (copy-on-write)
+                image_path, base = memory_model.parse_image_directive(line)
+                memory = memory_model.MmapMemory(image_path, base, 'c', overlay=memory)
+            elif line and not line.startswith('#'):
+                assembler.apply_memory_line(line, store_byte, store_word)
 
 # Function to parse and read instructions from text input
 def read_instructions_from_text(instructions_text):
     return instructions_text.splitlines()
 
 # Main Function with text input modification
-def main(instructions_text, memory_text, output_to_gui, starting_pc):
+# control (see sim_driver.SimulationControl) lets another thread pause or
+# stop the run between instructions; progress(steps) is called every
+# PROGRESS_INTERVAL steps, before pausing and once at the end. With
+# state_dump=False the register/memory dumps are left out of the output
+# (the GUI shows them in its own panels): the full trace then prints one
+# line per instruction ahead of its handler messages.
+def main(instructions_text, memory_text, output_to_gui, starting_pc, trace_level='full',
+         max_steps=GUI_MAX_STEPS, time_limit=GUI_TIME_LIMIT, control=None, progress=None, state_dump=True):
     global program_counter
     global labels
     global output_to_gui_global
     global executable_instructions
-    output_to_gui_global = output_to_gui
-    global registers, memory, labels, csr_registers, stop_simulation
+    global track_writes
+    output_to_gui_global = output_to_gui if trace_level == 'full' else errors_only(output_to_gui)
+    track_writes = trace_level == 'delta'
+    global registers, memory, labels, csr_registers, stop_simulation, base_address
     registers = [0] * 32
-    memory = {}
+    memory = memory_model.create_memory()
     labels = {}
     csr_registers = {}
     stop_simulation = False
@@ -693,28 +597,19 @@ def main(instructions_text, memory_text, output_to_gui, starting_pc):
     # Step 2: Read instructions
     instruction_lines = read_instructions_from_text(instructions_text)
     base_address = starting_pc
-    # Step 3: First pass to register labels
-    labels = {}
-    executable_instructions = []
-    for line_number, line in enumerate(instruction_lines):
-        stripped_line = line.strip()
-
-        # Remove comments
-        if '#' in stripped_line:
-            stripped_line = stripped_line.split('#')[0].strip()
-
-        # Skip empty lines
-        if not stripped_line:
-            continue
-
-        # Check for labels
-        if stripped_line.endswith(':'):
-            label_name = stripped_line[:-1].strip()
-            # Map label to the instruction address
-            labels[label_name] = base_address + len(executable_instructions)
-        else:
-            # Append the executable instruction
-            executable_instructions.append(stripped_line)
+    # Step 3: Register labels and decode every instruction once. The shared
+    # assembler prints its parse errors; they are passed on to the GUI here.
+    parse_errors = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(parse_errors):
+            executable_instructions, labels = assembler.collect_labels(instruction_lines, base_address)
+            decoded_program = assembler.decode_program(executable_instructions, labels, base_address)
+    except ValueError as e:
+        output_to_gui_global(f"Error: {e}")
+        return
+    finally:
+        for line in parse_errors.getvalue().splitlines():
+            output_to_gui_global(line)
 
     # Step 4: Execute instructions
     instruction_count = len(executable_instructions)
@@ -726,36 +621,65 @@ def main(instructions_text, memory_text, output_to_gui, starting_pc):
         output_to_gui_global(f"Error: Starting PC {program_counter} is out of valid instruction address range.")
         return
 
+    steps = 0
+    deadline = time.perf_counter() + time_limit if time_limit is not None else None
     while not stop_simulation and running and 0 <= (program_counter - base_address) < instruction_count:
+        if control is not None:
+            if control.stopped:
+                output_to_gui(f"Simulation stopped after {steps} instructions.")
+                break
+            if control.paused():
+                if progress is not None:
+                    progress(steps)
+                paused = control.wait_if_paused()
+                if deadline is not None:
+                    deadline += paused  # Paused time does not count against the limit
+                continue
+        if progress is not None and steps and not steps % PROGRESS_INTERVAL:
+            progress(steps)
+        if max_steps is not None and steps >= max_steps:
+            output_to_gui(f"Budget exhausted: step limit of {max_steps} instructions reached.")
+            break
+        if (deadline is not None and steps and not steps % DEADLINE_CHECK_INTERVAL
+                and time.perf_counter() >= deadline):
+            output_to_gui(f"Budget exhausted: time limit of {time_limit}s reached after {steps} instructions.")
+            break
+        steps += 1
         # Calculate the index in the executable_instructions list
         index = program_counter - base_address
 
-        # Fetch the current instruction
+        # Fetch the current decoded instruction
         try:
-            line = executable_instructions[index].strip()
+            decoded = decoded_program[index]
         except IndexError:
             output_to_gui_global(f"Error: Program counter {program_counter} out of bounds.")
             break
 
-        original_line = line  # Preserve the original line for debugging
+        original_line = executable_instructions[index]  # Preserve the original line for debugging
+        pc_before = program_counter
+        if track_writes:
+            registers_before = registers[:]
+            written_addresses.clear()
+        if trace_level == 'full' and not state_dump:
+            output_to_gui(f"PC {pc_before:>5}: {original_line}")  # Handler messages follow
 
-        # Parse the instruction
-        opcode, rd, rs1, rs2, imm_or_label, offset = instruction_splitting(line)
-        if not opcode:
-            # If parsing failed, skip to the next instruction
+        if decoded is None:
+            # If parsing failed at load time, skip to the next instruction
             program_counter += 1
             continue
+        op_id, rd, rs1, rs2, imm_or_label, target = decoded
+        opcode = OPCODES[op_id]
 
         # Execute the instruction based on its opcode
         if opcode in instructions:
             # Branch Instructions
             if opcode in ['BEQ', 'BNE', 'BLT', 'BGE', 'BLTU', 'BGEU']:
-                branch_taken = instructions[opcode](rs1, rs2, imm_or_label)
+                branch_taken = instructions[opcode](rs1, rs2, imm_or_label, target)
                 if not branch_taken:
                     program_counter += 1
             # Jump Instructions
             elif opcode == 'JAL':
-                instructions[opcode](rd, imm_or_label)
+                instructions[opcode](rd, imm_or_label, target)
             elif opcode == 'JALR':
                 instructions[opcode](rd, rs1, imm_or_label)
             # Immediate Arithmetic and Shift Instructions
@@ -794,11 +718,22 @@ def main(instructions_text, memory_text, output_to_gui, starting_pc):
             program_counter += 1
 
         # output_to_gui_global the register states after execution
-        output_to_gui_globalRegisters(instruction=original_line)
+        if trace_level == 'full' and state_dump:
+            output_to_gui_globalRegisters(instruction=original_line)
+        elif trace_level == 'delta':
+            output_state_delta(output_to_gui, pc_before, original_line, registers_before)
 
         # Ensure x0 remains zero
         registers[0] = 0
 
+    if progress is not None:
+        progress(steps)
+
+    # The quieter levels only show the final architectural state
+    if trace_level in ['final', 'delta'] and state_dump:
+        output_to_gui_global = output_to_gui
+        output_to_gui_globalRegisters()
+
 
 
 
@@ -0,0 +1,152 @@
+import queue
+import threading
+import time
+
+import backend_gui
+
+# Background simulation driver for the GUI.
+#
+# backend_gui.main() runs on a worker thread, so the Tk main loop never
+# blocks on a simulation. The worker does not touch any widget: its output
+# lines are collected into batches and put on a queue together with state
+# deltas (the registers changed since the previous batch), and the GUI
+# drains the queue from an after() timer at a fixed frame rate:
+#
+#     worker = SimulationWorker(instructions_text, memory_text, starting_pc, trace_level)
+#     worker.start()
+#     ...every frame: for kind, payload in worker.drain(): ...
+#
+# Queue messages are (kind, payload) pairs:
+#     ('output', [line, ...])
+#     ('state',  (steps, pc, {register: value, ...}))
+#     ('done',   None)  or  ('error', message)
+#
+# pause(), resume() and stop() are safe to call from the GUI thread; the
+# backend checks them between instructions. Time spent paused does not
+# count against the run's time limit.
+
+FRAME_RATE = 30                    # GUI refreshes per second
+BATCH_LINES = 2000                 # output lines per batch at most
+BATCH_INTERVAL = 1.0 / FRAME_RATE  # seconds a line may wait before its batch is sent
+MAX_MESSAGES_PER_FRAME = 64        # the rest waits for the next frame
+QUEUE_MESSAGES = 256               # a worker this far ahead of the GUI waits for it
+
+def read_memory(address, size):
+    # Bytes for the GUI's memory view (None for bytes never written). Safe
+    # to call from the GUI thread while the worker runs: every backend read
+    # is a single dict or bytearray access, which the GIL keeps atomic.
+    memory = backend_gui.memory
+    data = memory.load_bytes(address, size)
+    return [value if address + i in memory else None for i, value in enumerate(data)]
+
+class SimulationControl:
+    # Shared between the GUI (pause/resume/stop) and the backend loop
+    def __init__(self):
+        self.running = threading.Event()
+        self.running.set()
+        self.stopped = False
+        self.paused_seconds = 0.0
+
+    def pause(self):
+        self.running.clear()
+
+    def resume(self):
+        self.running.set()
+
+    def stop(self):
+        self.stopped = True
+        self.running.set()  # Wake a paused worker so it can stop
+
+    def paused(self):
+        return not self.running.is_set()
+
+    def wait_if_paused(self):
+        # Called by the backend between instructions; returns the seconds paused
+        if self.running.is_set():
+            return 0.0
+        start = time.perf_counter()
+        self.running.wait()
+        paused = time.perf_counter() - start
+        self.paused_seconds += paused
+        return paused
+
+class SimulationWorker:
+    def __init__(self, instructions_text, memory_text, starting_pc, trace_level='full',
+                 max_steps=backend_gui.GUI_MAX_STEPS, time_limit=backend_gui.GUI_TIME_LIMIT, state_dump=True):
+        self.arguments = (instructions_text, memory_text, starting_pc, trace_level, max_steps, time_limit,
+                          state_dump)
+        self.control = SimulationControl()
+        self.messages = queue.Queue(QUEUE_MESSAGES)
+        self.lines = []
+        self.last_flush = time.perf_counter()
+        self.last_registers = [0] * 32
+        self.steps = 0
+        self.thread = threading.Thread(target=self.run, name='simulation', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        instructions_text, memory_text, starting_pc, trace_level, max_steps, time_limit, state_dump = self.arguments
+        try:
+            backend_gui.main(instructions_text, memory_text, self.output, starting_pc, trace_level,
+                             max_steps, time_limit, self.control, self.progress, state_dump)
+            self.flush()
+            self.send(('done', None))
+        except Exception as e:
+            self.flush()
+            self.send(('error', str(e)))
+
+    def send(self, message):
+        # Blocks while the GUI is behind; once stopped, nobody may be reading
+        while True:
+            try:
+                self.messages.put(message, timeout=0.1)
+                return
+            except queue.Full:
+                if self.control.stopped:
+                    return
+
+    def output(self, *args):
+        # Output function handed to the backend
+        self.lines.append(" ".join(str(arg) for arg in args))
+        if len(self.lines) >= BATCH_LINES or time.perf_counter() - self.last_flush >= BATCH_INTERVAL:
+            self.flush()
+
+    def progress(self, steps):
+        # Called by the backend every few instructions, before pausing and at the end
+        self.steps = steps
+        if self.control.paused() or time.perf_counter() - self.last_flush >= BATCH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        if self.lines:
+            self.send(('output', self.lines))
+            self.lines = []
+        registers = backend_gui.registers
+        changed = {i: registers[i] for i in range(32) if registers[i] != self.last_registers[i]}
+        self.last_registers = registers[:]
+        self.send(('state', (self.steps, backend_gui.program_counter, changed)))
+        self.last_flush = time.perf_counter()
+
+    def drain(self):
+        # Messages waiting for the GUI, at most MAX_MESSAGES_PER_FRAME of them
+        messages = []
+        while len(messages) < MAX_MESSAGES_PER_FRAME:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                break
+        return messages
+
+    def pause(self):
+        self.control.pause()
+
+    def resume(self):
+        self.control.resume()
+
+    def stop(self):
+        self.control.stop()
+
+    def alive(self):
+        return self.thread.is_alive()
@@ -0,0 +1,140 @@
+from tkinter import *
+from tkinter import ttk
+
+# Register and memory panels for the simulation results window.
+#
+# Both are ttk.Treeview tables with a fixed number of rows, created once
+# and updated in place, so a refresh costs the same whatever the program
+# length or memory footprint. The memory panel is a hex view of one
+# window of the 32-bit address space: paging, the scrollbar, the mouse
+# wheel and the address box only move the window start, and only the
+# visible bytes are ever read (through the read_memory callback).
+#
+# Each refresh highlights what changed since the previous one: register
+# rows, and memory rows with the changed bytes marked by a '*'. A refresh
+# with nothing new keeps the highlights, so they stay visible while a run
+# is paused or finished.
+
+ADDRESS_SPACE = 1 << 32
+BYTES_PER_ROW = 16
+MEMORY_ROWS = 24
+CHANGED_COLOR = "#fff2a8"
+UNWRITTEN = ".."  # Bytes never written (they still read as 0)
+
+class RegisterPanel(Frame):
+    def __init__(self, master, **options):
+        Frame.__init__(self, master, **options)
+        Label(self, text="Registers", font=("Helvetica", 12, "bold")).pack(anchor="w")
+        self.tree = ttk.Treeview(self, columns=("decimal", "hex"), height=33, selectmode="none")
+        self.tree.heading("#0", text="Reg")
+        self.tree.heading("decimal", text="Decimal")
+        self.tree.heading("hex", text="Hexadecimal")
+        self.tree.column("#0", width=50, stretch=False)
+        self.tree.column("decimal", width=100, anchor="e")
+        self.tree.column("hex", width=100, anchor="e")
+        self.tree.tag_configure("changed", background=CHANGED_COLOR)
+        self.tree.pack(fill="both", expand=True)
+        self.tree.insert("", END, iid="pc", text="pc", values=("", ""))
+        for i in range(32):
+            self.tree.insert("", END, iid=f"x{i}", text=f"x{i}", values=(0, "0x00000000"))
+        self.shown = [0] * 32
+        self.shown_pc = None
+
+    def refresh(self, registers, pc):
+        changed = [i for i in range(32) if registers[i] != self.shown[i]]
+        if not changed and pc == self.shown_pc:
+            return
+        for i in range(32):
+            if i in changed:
+                value = registers[i]
+                decimal = value - 0x100000000 if value & 0x80000000 else value
+                self.tree.item(f"x{i}", values=(decimal, f"0x{value:08X}"), tags=("changed",))
+            elif self.tree.item(f"x{i}", "tags"):
+                self.tree.item(f"x{i}", tags=())
+        self.tree.item("pc", values=(pc, f"0x{pc:08X}"))
+        self.shown = list(registers)
+        self.shown_pc = pc
+
+class MemoryPanel(Frame):
+    def __init__(self, master, read_memory, **options):
+        # read_memory(address, size) -> list of byte values, None for unwritten bytes
+        Frame.__init__(self, master, **options)
+        self.read_memory = read_memory
+        self.start = 0
+        self.shown = None  # bytes of the visible window at the last refresh
+
+        navigation = Frame(self)
+        navigation.pack(fill="x")
+        Label(navigation, text="Memory", font=("Helvetica", 12, "bold")).pack(side="left")
+        Button(navigation, text="Next", command=lambda: self.scroll(MEMORY_ROWS)).pack(side="right")
+        Button(navigation, text="Prev", command=lambda: self.scroll(-MEMORY_ROWS)).pack(side="right")
+        Button(navigation, text="Go", command=self.go).pack(side="right", padx=(0, 5))
+        self.address = StringVar(value="0x00000000")
+        address_entry = Entry(navigation, textvariable=self.address, font=("Courier", 10), width=12)
+        address_entry.pack(side="right")
+        address_entry.bind("<Return>", lambda event: self.go())
+
+        table = Frame(self)
+        table.pack(fill="both", expand=True)
+        columns = [f"{offset:X}" for offset in range(BYTES_PER_ROW)] + ["ascii"]
+        self.tree = ttk.Treeview(table, columns=columns, height=MEMORY_ROWS, selectmode="none")
+        self.tree.heading("#0", text="Address")
+        self.tree.column("#0", width=90, stretch=False)
+        for column in columns[:-1]:
+            self.tree.heading(column, text=column)
+            self.tree.column(column, width=30, anchor="center", stretch=False)
+        self.tree.heading("ascii", text="ASCII")
+        self.tree.column("ascii", width=140)
+        self.tree.tag_configure("changed", background=CHANGED_COLOR)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar = Scrollbar(table, orient="vertical", command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        for row in range(MEMORY_ROWS):
+            self.tree.insert("", END, iid=str(row), text="")
+        self.tree.bind("<MouseWheel>", lambda event: self.scroll(-1 if event.delta > 0 else 1))
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-1))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(1))
+
+    def window_size(self):
+        return MEMORY_ROWS * BYTES_PER_ROW
+
+    def move_to(self, address):
+        last_start = ADDRESS_SPACE - self.window_size()
+        self.start = min(max(address - address % BYTES_PER_ROW, 0), last_start)
+        self.address.set(f"0x{self.start:08X}")
+        self.shown = None  # A new window has nothing to compare against
+        self.refresh()
+
+    def scroll(self, rows):
+        self.move_to(self.start + rows * BYTES_PER_ROW)
+
+    def go(self):
+        try:
+            self.move_to(int(self.address.get().strip(), 0))
+        except ValueError:
+            self.address.set(f"0x{self.start:08X}")
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.move_to(int(float(amount) * ADDRESS_SPACE))
+        elif action == "scroll":
+            self.scroll(int(amount) * (MEMORY_ROWS if unit == "pages" else 1))
+
+    def refresh(self):
+        data = self.read_memory(self.start, self.window_size())
+        if data == self.shown:
+            return
+        for row in range(MEMORY_ROWS):
+            offset = row * BYTES_PER_ROW
+            values = data[offset:offset + BYTES_PER_ROW]
+            old = self.shown[offset:offset + BYTES_PER_ROW] if self.shown is not None else values
+            cells = []
+            for value, old_value in zip(values, old):
+                cell = UNWRITTEN if value is None else f"{value:02X}"
+                cells.append(cell + "*" if value != old_value else cell)
+            text = ''.join(chr(value) if value is not None and 32 <= value < 127 else '.' for value in values)
+            self.tree.item(str(row), text=f"{self.start + offset:08X}", values=cells + [text],
+                           tags=("changed",) if values != old else ())
+        self.shown = data
+        first = self.start / ADDRESS_SPACE
+        self.scrollbar.set(first, first + self.window_size() / ADDRESS_SPACE)
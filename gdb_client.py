@@ -0,0 +1,236 @@
+import argparse
+import asyncio
+import sys
+
+import memory_model
+from gdb_stub import PACKET_SIZE, PC_REGISTER, REGISTER, GdbStub, checksum, frame
+from simulator import PC_MODELS, Simulator
+
+# Scripted GDB remote client for gdb_stub.py.
+#
+#     python gdb_client.py program.txt --pc-model byte
+#
+# starts a stub for the program on a free localhost port and drives one
+# session through it over TCP: target description, registers, a software
+# breakpoint and continue, single steps, bulk memory reads and writes,
+# register writes, running to the end (or a Ctrl-C interrupt for programs
+# that do not end) and detach. Every answer is checked against a second
+# Simulator stepped alongside the stub; one line is printed per check and
+# the first mismatch exits with status 1.
+#
+# GdbClient works on its own against any running stub:
+#
+#     client = GdbClient()
+#     await client.connect('127.0.0.1', 1234)
+#     registers = await client.read_registers()
+
+INTERRUPT_AFTER = 0.5  # seconds a continue may run before the script sends a Ctrl-C
+MEMORY_BLOCK = 0x1000  # bytes per bulk read
+
+class GdbClient:
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.buffer = bytearray()
+
+    async def connect(self, host, port):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    async def read_packet(self):
+        # The next packet's payload; acks ('+') before it are skipped
+        while True:
+            start = self.buffer.find(b'$')
+            end = self.buffer.find(b'#', start)
+            if start != -1 and end != -1 and len(self.buffer) >= end + 3:
+                data = bytes(self.buffer[start + 1:end])
+                if self.buffer[end + 1:end + 3].decode() != f"{checksum(data):02x}":
+                    raise ValueError(f"bad checksum in reply {bytes(self.buffer[start:end + 3])!r}")
+                del self.buffer[:end + 3]
+                self.writer.write(b'+')
+                return unescape(data).decode('latin-1')
+            data = await self.reader.read(PACKET_SIZE)
+            if not data:
+                raise ConnectionError("stub closed the connection")
+            self.buffer += data
+
+    async def command(self, payload):
+        self.writer.write(frame(payload))
+        await self.writer.drain()
+        return await self.read_packet()
+
+    async def interrupt(self):
+        self.writer.write(b'\x03')
+        await self.writer.drain()
+
+    async def read_registers(self):
+        # x0-x31 and pc
+        reply = await self.command('g')
+        return [REGISTER.unpack(bytes.fromhex(reply[8 * i:8 * i + 8]))[0] for i in range(PC_REGISTER + 1)]
+
+    async def write_register(self, number, value):
+        return await self.command(f"P{number:x}={REGISTER.pack(value).hex()}")
+
+    async def read_register(self, number):
+        return REGISTER.unpack(bytes.fromhex(await self.command(f"p{number:x}")))[0]
+
+    async def read_memory(self, address, length):
+        return bytes.fromhex(await self.command(f"m{address:x},{length:x}"))
+
+    async def write_memory(self, address, data):
+        return await self.command(f"M{address:x},{len(data):x}:{data.hex()}")
+
+    async def read_target_xml(self):
+        xml = ''
+        while True:
+            reply = await self.command(f"qXfer:features:read:target.xml:{len(xml):x},400")
+            xml += reply[1:]
+            if reply[:1] != 'm':
+                return xml
+
+def unescape(data):
+    result = bytearray()
+    escaped = False
+    for value in data:
+        if escaped:
+            result.append(value ^ 0x20)
+            escaped = False
+        elif value == 0x7D:
+            escaped = True
+        else:
+            result.append(value)
+    return bytes(result)
+
+class Session:
+    # The scripted session: the reference simulator and the client talking
+    # to the stub under test
+    def __init__(self, reference, client):
+        self.reference = reference
+        self.client = client
+        self.checks = 0
+
+    def check(self, name, expected, actual):
+        if expected != actual:
+            print(f"Error: {name}: expected {expected!r}, got {actual!r}")
+            sys.exit(1)
+        self.checks += 1
+        print(f"ok  {name}")
+
+    def reference_registers(self):
+        return list(self.reference.registers) + [self.reference.program_counter]
+
+    async def check_registers(self, name):
+        self.check(name, self.reference_registers(), await self.client.read_registers())
+
+    def reference_run_to(self, pc):
+        # Step the reference like a continue to a breakpoint at pc; returns
+        # the stop reply the stub should send
+        if self.reference.program_counter == pc and not self.reference.step():
+            return "W00"
+        while self.reference.program_counter != pc:
+            if not self.reference.step():
+                return "W00"
+        return "T05swbreak:;"
+
+    async def run(self, breakpoint_pc, data_address):
+        client = self.client
+        self.check("qSupported advertises software breakpoints", True,
+                   'swbreak+' in await client.command('qSupported:swbreak+;xmlRegisters=riscv'))
+        self.check("QStartNoAckMode", "OK", await client.command('QStartNoAckMode'))
+        xml = await client.read_target_xml()
+        self.check("target description lists 33 registers", 33, xml.count('<reg '))
+        self.check("stop reason", "S05", await client.command('?'))
+        await self.check_registers("registers at the entry point")
+
+        self.check(f"Z0 at 0x{breakpoint_pc:x}", "OK", await client.command(f"Z0,{breakpoint_pc:x},4"))
+        expected = self.reference_run_to(breakpoint_pc)
+        self.check("continue to the breakpoint", expected, await client.command('c'))
+        await self.check_registers("registers at the breakpoint")
+        for i in range(3):
+            reply = await client.command('s')
+            self.check(f"single step {i + 1}", "S05" if self.reference.step() else "W00", reply)
+            await self.check_registers(f"registers after step {i + 1}")
+
+        data = await client.read_memory(data_address, MEMORY_BLOCK)
+        self.check(f"m of {MEMORY_BLOCK} bytes at 0x{data_address:x}",
+                   self.reference.memory.load_bytes(data_address, MEMORY_BLOCK), data)
+        pattern = bytes(range(0x40, 0x60))
+        self.check("M of 32 bytes", "OK", await client.write_memory(data_address + 0x100, pattern))
+        self.reference.memory.store_bytes(data_address + 0x100, pattern)
+        self.check("m reads the M back", pattern, await client.read_memory(data_address + 0x100, len(pattern)))
+        self.check("P x31", "OK", await client.write_register(31, 0x12345678))
+        self.reference.registers[31] = 0x12345678
+        self.check("p x31", 0x12345678, await client.read_register(31))
+
+        self.check(f"z0 at 0x{breakpoint_pc:x}", "OK", await client.command(f"z0,{breakpoint_pc:x},4"))
+        client.writer.write(frame('c'))
+        await client.writer.drain()
+        try:
+            reply = await asyncio.wait_for(client.read_packet(), INTERRUPT_AFTER)
+            self.reference.run()
+            self.check("continue to the end", "W00", reply)
+            await self.check_registers("registers at the end")
+            self.check("final memory", self.reference.memory.load_bytes(data_address, MEMORY_BLOCK),
+                       await client.read_memory(data_address, MEMORY_BLOCK))
+        except asyncio.TimeoutError:
+            await client.interrupt()
+            self.check("Ctrl-C stops a long continue", "S02", await client.read_packet())
+            self.check("the interrupted PC is inside the program", True,
+                       (await client.read_register(PC_REGISTER)) in self.reference.instruction_index)
+        self.check("detach", "OK", await client.command('D'))
+
+def load_simulator(args):
+    sim = Simulator(args.memory_backend)
+    sim.load(args.program, args.memory, args.start, args.pc_model, args.load_address)
+    return sim
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Scripted GDB remote session against gdb_stub.py")
+    parser.add_argument('program', help="instruction file, .bin machine code or ELF executable")
+    parser.add_argument('--memory', default=None, help="memory initialization file or image")
+    parser.add_argument('--start', type=int, default=None, help="starting instruction index")
+    parser.add_argument('--pc-model', choices=list(PC_MODELS), default=None)
+    parser.add_argument('--load-address', type=lambda value: int(value, 0), default=0)
+    parser.add_argument('--memory-backend', choices=list(memory_model.MEMORY_BACKENDS), default='paged')
+    parser.add_argument('--break', dest='breakpoint', default=None,
+                        help="label or PC for the breakpoint (default: the third instruction run)")
+    parser.add_argument('--data-address', type=lambda value: int(value, 0), default=0,
+                        help="memory the session reads and writes")
+    return parser.parse_args(argv)
+
+async def run_session(args):
+    stub = GdbStub(load_simulator(args))
+    reference = load_simulator(args)
+    if args.breakpoint is None:
+        breakpoint_pc = reference.program_counter + 2 * reference.pc_stride
+    elif args.breakpoint in reference.labels:
+        breakpoint_pc = reference.labels[args.breakpoint]
+    else:
+        breakpoint_pc = int(args.breakpoint, 0)
+    server = await stub.start('127.0.0.1', 0)
+    client = GdbClient()
+    await client.connect(*server.sockets[0].getsockname()[:2])
+    session = Session(reference, client)
+    try:
+        await session.run(breakpoint_pc, args.data_address)
+    finally:
+        await client.close()
+        server.close()
+        await server.wait_closed()
+        stub.sim.close()
+        reference.close()
+    print(f"Session passed: {session.checks} checks")
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    try:
+        asyncio.run(run_session(args))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
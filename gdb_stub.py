@@ -0,0 +1,353 @@
+import argparse
+import asyncio
+import struct
+import sys
+
+import closure_engine
+import memory_model
+import simulator as simulator_module
+from simulator import PC_MODELS, Simulator
+
+# GDB remote serial protocol (RSP) server in front of a Simulator.
+#
+#     python gdb_stub.py program.elf --port 1234
+#     (gdb) target remote localhost:1234
+#
+# Supported packets: ? g G p P m M s c Z0/z0 (software breakpoints), D, k,
+# qSupported, qXfer:features:read (a riscv:rv32 target description with
+# x0-x31 and pc), QStartNoAckMode and the thread queries gdb sends on
+# connect. Anything else gets the empty "not supported" reply.
+#
+# The server is one asyncio task per connection. A continue runs the
+# closure engine in bursts of BURST_STEPS instructions and yields to the
+# event loop between bursts, so a Ctrl-C from gdb (0x03) is seen within a
+# burst. Breakpoints cost nothing while running: the burst runs a copy of
+# the compiled program in which the closure of each breakpoint instruction
+# is replaced by a trap that ends the burst before the instruction runs.
+#
+# m/M are served straight from the memory backend's bulk load_bytes()/
+# store_bytes(), one slice per page for paged memory. Registers and PC are
+# the simulator's own: with an index PC model (text listings by default)
+# gdb sees instruction indexes as addresses, so listings are best loaded
+# with --pc-model byte.
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 1234
+BURST_STEPS = 20000  # instructions between two polls of the socket
+PACKET_SIZE = 0x4000
+SIGINT = 2
+SIGTRAP = 5
+TRAPPED = -1  # index a breakpoint trap returns to end the burst
+REGISTER = struct.Struct('<I')
+PC_REGISTER = 32
+
+REGISTER_NAMES = ['zero', 'ra', 'sp', 'gp', 'tp', 't0', 't1', 't2', 'fp', 's1',
+                  'a0', 'a1', 'a2', 'a3', 'a4', 'a5', 'a6', 'a7',
+                  's2', 's3', 's4', 's5', 's6', 's7', 's8', 's9', 's10', 's11',
+                  't3', 't4', 't5', 't6']
+TARGET_XML = ('<?xml version="1.0"?><!DOCTYPE target SYSTEM "gdb-target.dtd">'
+              '<target version="1.0"><architecture>riscv:rv32</architecture>'
+              '<feature name="org.gnu.gdb.riscv.cpu">'
+              + ''.join(f'<reg name="{name}" bitsize="32" type="{"data_ptr" if name == "sp" else "int"}"/>'
+                        for name in REGISTER_NAMES)
+              + '<reg name="pc" bitsize="32" type="code_ptr"/></feature></target>')
+
+def checksum(data):
+    return sum(data) & 0xFF
+
+def frame(payload):
+    # '$payload#checksum', with the RSP special characters escaped
+    data = bytearray()
+    for value in payload.encode('latin-1'):
+        if value in b'#$}*':
+            data += bytes((0x7D, value ^ 0x20))
+        else:
+            data.append(value)
+    return b'$' + bytes(data) + b'#' + f"{checksum(data):02x}".encode()
+
+def parse_address_length(text):
+    address, length = text.split(',')
+    return int(address, 16), int(length, 16)
+
+class GdbStub:
+    def __init__(self, sim):
+        self.sim = sim
+        self.breakpoints = set()  # PCs with a software breakpoint
+        self.code = None          # sim.code with the breakpoint traps patched in
+        self.code_source = None   # the sim.code list self.code was made from
+        self.trapped = None       # index of the breakpoint that ended the last burst
+        self.interrupted = False
+        self.no_ack = False
+        self.lock = asyncio.Lock()  # one gdb at a time
+
+    # Execution
+    def trap_code(self):
+        sim = self.sim
+        if sim.code is None:
+            sim.compile()
+        if self.code is None or self.code_source is not sim.code:
+            code = list(sim.code)
+            for pc in self.breakpoints:
+                index = sim.instruction_index.get(pc)
+                if index is not None:
+                    code[index] = self.make_trap(index)
+            self.code = code
+            self.code_source = sim.code
+        return self.code
+
+    def make_trap(self, index):
+        def trap():
+            self.trapped = index
+            return TRAPPED
+        return trap
+
+    def burst(self):
+        # Run up to BURST_STEPS instructions; returns a stop reply, or None
+        # when the burst ran out with the program still running
+        sim = self.sim
+        code = self.trap_code()
+        index = sim.instruction_index.get(sim.program_counter)
+        if index is None:
+            sim.stop_reason = simulator_module.STOP_FINISHED
+            return self.exit_reply()
+        self.trapped = None
+        index, steps, halted_by = closure_engine.run_program(code, index, BURST_STEPS)
+        if self.trapped is not None:
+            index = self.trapped
+            steps -= 1  # The trap itself
+        sim.steps += steps
+        sim.program_counter = sim.code_base + index * sim.pc_stride
+        if halted_by:
+            sim.halted = True
+            sim.halted_by = halted_by
+            sim.stop_reason = simulator_module.STOP_HALTED
+            return self.exit_reply()
+        if self.trapped is not None:
+            return f"T{SIGTRAP:02x}swbreak:;"
+        if not 0 <= index < len(code):
+            sim.stop_reason = simulator_module.STOP_FINISHED
+            return self.exit_reply()
+        return None
+
+    def exit_reply(self):
+        return "W00"
+
+    async def resume(self, step):
+        sim = self.sim
+        self.interrupted = False
+        if not sim.running():
+            return self.exit_reply()
+        if step or sim.program_counter in self.breakpoints:
+            # A single step, or the instruction under a breakpoint before continuing
+            if not sim.step():
+                return self.exit_reply()
+            if step:
+                return f"S{SIGTRAP:02x}"
+        while True:
+            reply = self.burst()
+            if reply is not None:
+                return reply
+            await asyncio.sleep(0)  # Let the connection's reader see a Ctrl-C
+            if self.interrupted:
+                return f"S{SIGINT:02x}"
+
+    # Registers and memory
+    def read_registers(self):
+        sim = self.sim
+        return ''.join(REGISTER.pack(value).hex() for value in sim.registers + [sim.program_counter])
+
+    def write_register(self, number, value):
+        if number == PC_REGISTER:
+            self.sim.program_counter = value
+        elif number != 0:
+            self.sim.registers[number] = value  # In place: the closures hold this list
+
+    def read_memory(self, address, length):
+        length = min(length, PACKET_SIZE // 2)
+        return self.sim.memory.load_bytes(address, length).hex()
+
+    def write_memory(self, address, data):
+        self.sim.memory.store_bytes(address, data)
+
+    def set_breakpoint(self, address, insert):
+        if insert:
+            self.breakpoints.add(address)
+        else:
+            self.breakpoints.discard(address)
+        self.code = None  # Patched again before the next burst
+
+    # Packets
+    async def handle(self, packet):
+        # Returns the reply payload, or None when the connection should close
+        command, body = packet[:1], packet[1:]
+        try:
+            if command == '?':
+                return f"S{SIGTRAP:02x}"
+            if command == 'g':
+                return self.read_registers()
+            if command == 'G':
+                for number in range(PC_REGISTER + 1):
+                    self.write_register(number, REGISTER.unpack(bytes.fromhex(body[8 * number:8 * number + 8]))[0])
+                return "OK"
+            if command == 'p':
+                number = int(body, 16)
+                if number > PC_REGISTER:
+                    return "E00"
+                value = self.sim.program_counter if number == PC_REGISTER else self.sim.registers[number]
+                return REGISTER.pack(value).hex()
+            if command == 'P':
+                number, value = body.split('=')
+                if int(number, 16) > PC_REGISTER:
+                    return "E00"
+                self.write_register(int(number, 16), REGISTER.unpack(bytes.fromhex(value))[0])
+                return "OK"
+            if command == 'm':
+                return self.read_memory(*parse_address_length(body))
+            if command == 'M':
+                location, data = body.split(':')
+                address, length = parse_address_length(location)
+                data = bytes.fromhex(data)
+                if len(data) != length:
+                    return "E00"
+                self.write_memory(address, data)
+                return "OK"
+            if command in ['c', 's']:
+                if body:
+                    self.sim.program_counter = int(body, 16)
+                return await self.resume(command == 's')
+            if command in ['Z', 'z'] and body.startswith('0,'):
+                self.set_breakpoint(int(body.split(',')[1], 16), command == 'Z')
+                return "OK"
+            if command == 'D':
+                return "OK"
+            if command == 'k':
+                return None
+            if command == 'H':
+                return "OK"
+            if command == 'q':
+                return self.query(packet)
+            if packet == 'QStartNoAckMode':
+                return "OK"
+        except (ValueError, IndexError, struct.error):
+            return "E01"
+        except PermissionError:
+            return "E0e"  # Store into a read-only memory image
+        return ""
+
+    def query(self, packet):
+        if packet.startswith('qSupported'):
+            return f"PacketSize={PACKET_SIZE:x};swbreak+;qXfer:features:read+;QStartNoAckMode+"
+        if packet.startswith('qXfer:features:read:target.xml:'):
+            offset, length = parse_address_length(packet.rsplit(':', 1)[1])
+            chunk = TARGET_XML[offset:offset + length]
+            return ('l' if offset + length >= len(TARGET_XML) else 'm') + chunk
+        if packet == 'qAttached':
+            return "1"
+        if packet == 'qC':
+            return "QC1"
+        if packet == 'qfThreadInfo':
+            return "m1"
+        if packet == 'qsThreadInfo':
+            return "l"
+        return ""
+
+    # Connection
+    async def read_packets(self, reader, writer, packets):
+        # Split the byte stream into packets; acks are sent here and a
+        # Ctrl-C sets `interrupted` even while a continue is running
+        buffer = bytearray()
+        while True:
+            data = await reader.read(PACKET_SIZE)
+            if not data:
+                await packets.put(None)
+                return
+            buffer += data
+            while buffer:
+                if buffer[0] == 0x03:
+                    self.interrupted = True
+                    del buffer[0]
+                elif buffer[0] == ord('$'):
+                    end = buffer.find(b'#')
+                    if end == -1 or len(buffer) < end + 3:
+                        break
+                    payload = bytes(buffer[1:end])
+                    valid = buffer[end + 1:end + 3].decode('latin-1').lower() == f"{checksum(payload):02x}"
+                    del buffer[:end + 3]
+                    if not self.no_ack:
+                        writer.write(b'+' if valid else b'-')
+                    if valid:
+                        await packets.put(payload.decode('latin-1'))
+                else:
+                    del buffer[0]  # Acks from gdb and noise between packets
+
+    async def serve_client(self, reader, writer):
+        async with self.lock:
+            packets = asyncio.Queue()
+            reading = asyncio.ensure_future(self.read_packets(reader, writer, packets))
+            self.no_ack = False
+            try:
+                while True:
+                    packet = await packets.get()
+                    if packet is None:
+                        break
+                    reply = await self.handle(packet)
+                    if reply is None:
+                        break
+                    writer.write(frame(reply))
+                    await writer.drain()
+                    if packet == 'QStartNoAckMode':
+                        self.no_ack = True
+                    elif packet == 'D':
+                        break
+            except ConnectionError:
+                pass
+            finally:
+                reading.cancel()
+                writer.close()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        # Returns the asyncio server (port 0 picks a free port)
+        return await asyncio.start_server(self.serve_client, host, port)
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="GDB remote stub for the RV32I simulator")
+    parser.add_argument('program', help="instruction file, .bin machine code or ELF executable to debug")
+    parser.add_argument('--memory', default=None, help="memory initialization file or image")
+    parser.add_argument('--start', type=int, default=None,
+                        help="starting instruction index (ELF files default to e_entry)")
+    parser.add_argument('--pc-model', choices=list(PC_MODELS), default=None,
+                        help="index or byte PCs for text listings (byte is what gdb expects)")
+    parser.add_argument('--load-address', type=lambda value: int(value, 0), default=0,
+                        help="address machine code or a byte-addressed listing is loaded at")
+    parser.add_argument('--memory-backend', choices=list(memory_model.MEMORY_BACKENDS), default='paged')
+    parser.add_argument('--host', default=DEFAULT_HOST, help="address to listen on (localhost by default)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="TCP port to listen on")
+    return parser.parse_args(argv)
+
+async def serve(stub, host, port):
+    server = await stub.start(host, port)
+    address, port = server.sockets[0].getsockname()[:2]
+    print(f"GDB stub listening on {address}:{port}")
+    async with server:
+        await server.serve_forever()
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    sim = Simulator(args.memory_backend)
+    try:
+        sim.load(args.program, args.memory, args.start, args.pc_model, args.load_address)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    try:
+        asyncio.run(serve(GdbStub(sim), args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        sim.close()
+
+if __name__ == "__main__":
+    main()
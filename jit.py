@@ -0,0 +1,190 @@
+from closure_engine import MASK32
+
+# Python source-generating tier for hot basic blocks.
+#
+# Once a cached block (see block_cache.py) has run HOT_BLOCK_THRESHOLD
+# times, BlockCompiler turns it into the source of a single Python function
+# and builds it with compile()/exec(). In the generated code:
+#
+#   - every register the block touches is a local variable (x5, x10, ...),
+#     loaded once on entry and written back once on exit,
+#   - x0 is the constant 0 and instructions writing x0 disappear,
+#   - add/sub/logic/left-shift results are not masked one by one; the
+#     & 0xFFFFFFFF is applied once, where a value is compared, shifted
+#     right, used as an address or stored, or on write-back. The low 32 bits
+#     of those operations only depend on the low 32 bits of their inputs, so
+#     the result is the same as masking after every instruction.
+#
+# Branches are compared inline. Any other block exit (jal, jalr, ecall,
+# ebreak) writes the registers back and calls the closure for that
+# instruction, so it behaves exactly like the closure engine. If an
+# instruction raises (e.g. a store into a read-only image), the registers
+# written so far are stored back before the exception propagates.
+
+HOT_BLOCK_THRESHOLD = 50
+
+# Operations whose result may be left unmasked (see above)
+LAZY_R_TYPE = {'ADD': '+', 'SUB': '-', 'XOR': '^', 'OR': '|', 'AND': '&'}
+LAZY_I_TYPE = {'ADDI': '+', 'XORI': '^', 'ORI': '|', 'ANDI': '&'}
+BRANCH_TESTS = {
+    'BEQ': '{a} == {b}', 'BNE': '{a} != {b}',
+    'BLT': '({a} ^ 0x80000000) < ({b} ^ 0x80000000)', 'BGE': '({a} ^ 0x80000000) >= ({b} ^ 0x80000000)',
+    'BLTU': '{a} < {b}', 'BGEU': '{a} >= {b}'
+}
+MEMORY_HELPERS = ('load_word', 'load_halfword', 'load_halfword_unsigned', 'load_byte',
+                  'store_word', 'store_halfword', 'store_byte')
+LOADS = {'LW': 'load_word', 'LH': 'load_halfword', 'LHU': 'load_halfword_unsigned',
+         'LB': 'load_byte', 'LBU': 'load_byte'}
+STORES = {'SW': 'store_word', 'SH': 'store_halfword', 'SB': 'store_byte'}
+NOPS = ('FENCE', 'FENCE.TSO', 'PAUSE')
+CLOSURE_EXITS = ('JAL', 'JALR', 'ECALL', 'EBREAK')
+
+class BlockSource:
+    # Emits the body of one block while tracking which locals still need masking
+
+    def __init__(self):
+        self.lines = []
+        self.used = set()      # registers loaded on entry
+        self.written = set()   # registers written back on exit
+        self.unmasked = set()  # locals that may hold more than 32 bits
+
+    def emit(self, line):
+        self.lines.append('        ' + line)
+
+    def raw(self, reg):
+        # The register's value, possibly unmasked
+        if reg == 0:
+            return '0'
+        self.used.add(reg)
+        return f"x{reg}"
+
+    def value(self, reg):
+        # The register's exact 32-bit value
+        name = self.raw(reg)
+        if reg in self.unmasked:
+            self.emit(f"{name} &= 0xFFFFFFFF")
+            self.unmasked.discard(reg)
+        return name
+
+    def assign(self, reg, expression, masked=True):
+        self.used.add(reg)
+        self.written.add(reg)
+        self.emit(f"x{reg} = {expression}")
+        if masked:
+            self.unmasked.discard(reg)
+        else:
+            self.unmasked.add(reg)
+
+    def address(self, reg, offset):
+        if reg == 0:
+            return f"{offset}"
+        return f"{self.value(reg)} + {offset}"
+
+    def write_back(self, indent='    ', mask_all=False):
+        return [f"{indent}regs[{reg}] = x{reg}" + (" & 0xFFFFFFFF" if mask_all or reg in self.unmasked else "")
+                for reg in sorted(self.written)]
+
+class BlockCompiler:
+    def __init__(self, decoded_program, opcodes, registers, memory, code_base=0, pc_stride=1):
+        self.decoded_program = decoded_program
+        self.opcodes = opcodes
+        self.registers = registers
+        self.memory = memory
+        self.code_base = code_base
+        self.pc_stride = pc_stride
+        self.compiled = 0
+
+    def translate(self, source, index, decoded):
+        # Emit one non-exit instruction; returns False if it cannot be translated
+        opcode = self.opcodes[decoded[0]]
+        _, rd, rs1, rs2, imm, _ = decoded
+        if opcode in NOPS:
+            return True
+        if rd == 0 and opcode not in STORES:
+            return True  # Writes to x0 are dropped, as in the closure engine
+        if opcode in LAZY_R_TYPE:
+            source.assign(rd, f"{source.raw(rs1)} {LAZY_R_TYPE[opcode]} {source.raw(rs2)}", masked=False)
+        elif opcode in LAZY_I_TYPE:
+            source.assign(rd, f"{source.raw(rs1)} {LAZY_I_TYPE[opcode]} {imm}", masked=False)
+        elif opcode == 'SLL':
+            source.assign(rd, f"{source.raw(rs1)} << ({source.raw(rs2)} & 0x1F)", masked=False)
+        elif opcode == 'SLLI':
+            source.assign(rd, f"{source.raw(rs1)} << {imm & 0x1F}", masked=False)
+        elif opcode == 'SRL':
+            a = source.value(rs1)
+            source.assign(rd, f"{a} >> ({source.raw(rs2)} & 0x1F)")
+        elif opcode == 'SRLI':
+            source.assign(rd, f"{source.value(rs1)} >> {imm & 0x1F}")
+        elif opcode == 'SRA':
+            a = source.value(rs1)
+            source.assign(rd, f"((({a} ^ 0x80000000) - 0x80000000) >> ({source.raw(rs2)} & 0x1F)) & 0xFFFFFFFF")
+        elif opcode == 'SRAI':
+            a = source.value(rs1)
+            source.assign(rd, f"((({a} ^ 0x80000000) - 0x80000000) >> {imm & 0x1F}) & 0xFFFFFFFF")
+        elif opcode == 'SLT':
+            a, b = source.value(rs1), source.value(rs2)
+            source.assign(rd, f"1 if ({a} ^ 0x80000000) < ({b} ^ 0x80000000) else 0")
+        elif opcode == 'SLTU':
+            a, b = source.value(rs1), source.value(rs2)
+            source.assign(rd, f"1 if {a} < {b} else 0")
+        elif opcode == 'SLTI':
+            source.assign(rd, f"1 if ({source.value(rs1)} ^ 0x80000000) - 0x80000000 < {imm} else 0")
+        elif opcode == 'SLTIU':
+            source.assign(rd, f"1 if {source.value(rs1)} < {imm & MASK32} else 0")
+        elif opcode in LOADS:
+            source.assign(rd, f"{LOADS[opcode]}({source.address(rs1, imm)})")
+            if opcode == 'LB':
+                source.emit(f"if x{rd} & 0x80: x{rd} |= 0xFFFFFF00")
+        elif opcode in STORES:
+            address = source.address(rs1, imm)
+            source.emit(f"{STORES[opcode]}({address}, {source.value(rs2)})")
+        elif opcode == 'LUI':
+            source.assign(rd, f"{imm & 0xFFFFF000}")
+        elif opcode == 'AUIPC':
+            source.assign(rd, f"{(self.code_base + index * self.pc_stride + imm) & MASK32}")
+        else:
+            return False
+        return True
+
+    def compile(self, block):
+        # Source-compile a cached block; returns None if it has to stay on closures
+        source = BlockSource()
+        for index in range(block.start, block.end - 1):
+            decoded = self.decoded_program[index]
+            if decoded is not None and not self.translate(source, index, decoded):
+                return None
+
+        last = block.end - 1
+        decoded = self.decoded_program[last]
+        opcode = self.opcodes[decoded[0]] if decoded is not None else None
+        if opcode in BRANCH_TESTS:
+            _, _, rs1, rs2, _, target = decoded
+            test = BRANCH_TESTS[opcode].format(a=source.value(rs1), b=source.value(rs2))
+            taken = target if target is not None else last + 1
+            exit_line = f"    return {taken} if {test} else {last + 1}"
+        elif opcode in CLOSURE_EXITS:
+            exit_line = "    return exit_op()"
+        else:
+            # The block ends at the end of the program
+            if decoded is not None and not self.translate(source, last, decoded):
+                return None
+            exit_line = f"    return {last + 1}"
+
+        lines = [f"def block_{block.start}(regs=regs, exit_op=exit_op, {', '.join(f'{name}={name}' for name in MEMORY_HELPERS)}):"]
+        lines += [f"    x{reg} = regs[{reg}]" for reg in sorted(source.used)]
+        if source.lines:
+            lines.append("    try:")
+            lines += source.lines
+            lines.append("    except BaseException:")
+            # The exception may come before a pending mask, so mask everything
+            lines += source.write_back(indent='        ', mask_all=True) or ["        pass"]
+            lines.append("        raise")
+        lines += source.write_back()
+        lines.append(exit_line)
+
+        namespace = {'regs': self.registers, 'exit_op': block.exit}
+        for name in MEMORY_HELPERS:
+            namespace[name] = getattr(self.memory, name)
+        exec(compile('\n'.join(lines) + '\n', f"<block {block.start}>", 'exec'), namespace)
+        self.compiled += 1
+        return namespace[f"block_{block.start}"]
@@ -0,0 +1,716 @@
+import bisect
+import heapq
+import mmap
+import os
+import struct
+
+# Pluggable memory subsystem.
+#
+# Every backend exposes the same byte/halfword/word helpers the simulator
+# uses (store_byte, load_word, ...) and also behaves like the original
+# {address: byte} dict for the memory dump: `address in memory`,
+# `memory[address]`, `memory.get()`, `memory.keys()` and truthiness.
+# keys() only lists locations that were actually written, so the dump keeps
+# showing "only touched locations" whatever the backend stores internally.
+#
+# checkpoint() returns the contents as a plain tuple whose first item names
+# the backend, and restore_memory() brings a memory back to it (see
+# checkpoint.py). PagedMemory checkpoints are copy-on-write: the pages are
+# frozen into bytes objects shared by the checkpoint and every memory
+# restored from it, and a page is only copied again when it is written.
+#
+# written_mask() and revert_bytes() save and put back a few bytes together
+# with their written flags, for undoing single stores (see undo_log.py).
+#
+# For dumps, items_in_range(start, end) lists the written bytes of one
+# address range in order (None leaves that side open, so by default every
+# written byte is listed, including negative addresses from stores below 0),
+# and changed_since(state) the words that differ from an earlier
+# checkpoint(). PagedMemory keeps its page numbers in a
+# sorted list updated when a page is allocated, so both only visit the
+# pages that matter instead of sorting every written address.
+#
+# watch_memory() arms watchpoints by switching a memory to a subclass of
+# its backend that checks each load/store helper's page against a set of
+# watched pages (see WatchedAccess); unwatch_memory() switches it back, so
+# memory without watchpoints runs the plain backend methods. Dict-style
+# reads never go through the load helpers, so dumps and traces do not
+# trigger watchpoints.
+
+MASK32 = 0xFFFFFFFF
+
+PAGE_SHIFT = 12
+PAGE_SIZE = 1 << PAGE_SHIFT  # 4 KiB
+PAGE_OFFSET_MASK = PAGE_SIZE - 1
+ALL_WRITTEN = {size: b'\x01' * size for size in (1, 2, 4)}  # written flags of a whole store
+ZERO_PAGE = bytes(PAGE_SIZE)
+
+HALFWORD = struct.Struct('<H')
+WORD = struct.Struct('<I')
+
+# File extensions treated as raw binary memory images by the loaders
+IMAGE_EXTENSIONS = ('.bin', '.img', '.raw')
+
+# mmap access per image mode: 'r' read-only (shareable between processes),
+# 'c' copy-on-write private copy, 'w' writes go back to the file
+IMAGE_MODES = {'r': mmap.ACCESS_READ, 'c': mmap.ACCESS_COPY, 'w': mmap.ACCESS_WRITE}
+
+def list_written(written_pages):
+    # Sorted addresses whose written flag is set, from {page number: flags}
+    addresses = []
+    for page_number in sorted(written_pages):
+        base = page_number << PAGE_SHIFT
+        written = written_pages[page_number]
+        offset = written.find(1)
+        while offset != -1:
+            addresses.append(base + offset)
+            offset = written.find(1, offset + 1)
+    return addresses
+
+def scan_written(items, base, data, data_offset, written, low, high):
+    # Append (address, value) for the written flags set in written[low:high];
+    # the page starts at address base and at data[data_offset]
+    offset = written.find(1, low, high)
+    while offset != -1:
+        items.append((base + offset, data[data_offset + offset]))
+        offset = written.find(1, offset + 1, high)
+
+def page_bounds(base, start, end):
+    # Offsets of [start, end) within the page at address base (None: open)
+    low = max(start - base, 0) if start is not None else 0
+    high = min(end - base, PAGE_SIZE) if end is not None else PAGE_SIZE
+    return low, high
+
+def changed_words(address, data, old_data, flags, old_flags):
+    # Addresses of the aligned words in which data or written flags differ
+    if data == old_data and flags == old_flags:
+        return []
+    words = []
+    for offset in range(-(address & 3), len(data), 4):
+        low, high = max(offset, 0), offset + 4
+        if data[low:high] != old_data[low:high] or flags[low:high] != old_flags[low:high]:
+            words.append(address + offset)
+    return words
+
+def mark_written(written_pages, address, size):
+    # Set the written flags for size bytes starting at address
+    for byte_address in range(address, address + size):
+        page_number = byte_address >> PAGE_SHIFT
+        written = written_pages.get(page_number)
+        if written is None:
+            written = written_pages[page_number] = bytearray(PAGE_SIZE)
+        written[byte_address & PAGE_OFFSET_MASK] = 1
+
+class DictMemory(dict):
+    # The original model: one dict entry per byte
+
+    def store_byte(self, address, value):
+        self[address] = value & 0xFF
+
+    def store_halfword(self, address, value):
+        self[address] = value & 0xFF
+        self[address + 1] = (value >> 8) & 0xFF
+
+    def store_word(self, address, value):
+        self[address] = value & 0xFF
+        self[address + 1] = (value >> 8) & 0xFF
+        self[address + 2] = (value >> 16) & 0xFF
+        self[address + 3] = (value >> 24) & 0xFF
+
+    def load_byte(self, address):
+        return self.get(address, 0)
+
+    def load_halfword_unsigned(self, address):
+        return (self.get(address + 1, 0) << 8) | self.get(address, 0)
+
+    def load_halfword(self, address):
+        value = (self.get(address + 1, 0) << 8) | self.get(address, 0)
+        if value & 0x8000:
+            value |= 0xFFFF0000  # Sign-extend to 32 bits
+        return value
+
+    def load_word(self, address):
+        return ((self.get(address + 3, 0) << 24) | (self.get(address + 2, 0) << 16)
+                | (self.get(address + 1, 0) << 8) | self.get(address, 0))
+
+    def store_bytes(self, address, data):
+        self.update(zip(range(address, address + len(data)), data))
+
+    def load_bytes(self, address, size):
+        return bytes(self.get(byte_address, 0) for byte_address in range(address, address + size))
+
+    def written_mask(self, address, size):
+        # Bit i set when address + i has been written
+        return sum(1 << i for i in range(size) if address + i in self)
+
+    def revert_bytes(self, address, data, mask):
+        for i, value in enumerate(data):
+            if mask >> i & 1:
+                self[address + i] = value
+            else:
+                self.pop(address + i, None)
+
+    def items_in_range(self, start=None, end=None):
+        # Whichever is smaller: probe every address or filter every entry
+        if start is None or end is None:
+            return sorted((address, value) for address, value in self.items()
+                          if (start is None or address >= start) and (end is None or address < end))
+        if end - start <= len(self):
+            return [(address, self[address]) for address in range(start, end) if address in self]
+        return sorted((address, value) for address, value in self.items() if start <= address < end)
+
+    def changed_since(self, state):
+        old = state[1]
+        return sorted({address & ~3 for address in self.keys() | old.keys()
+                       if self.get(address) != old.get(address)})
+
+    def checkpoint(self):
+        return ('dict', dict(self))
+
+    def restore(self, state):
+        self.clear()
+        self.update(state[1])
+
+    def close(self):
+        pass
+
+class PagedMemory:
+    # Lazily allocated 4 KiB bytearray pages indexed by page number. A second
+    # bytearray per page flags which bytes were written, so untouched
+    # locations still read as 0 and stay out of the dump.
+
+    def __init__(self):
+        self.pages = {}   # page number -> bytearray(PAGE_SIZE) of data (bytes while shared)
+        self.written = {} # page number -> bytearray(PAGE_SIZE) of 0/1 flags (bytes while shared)
+        self.page_order = []  # sorted page numbers
+
+    def page_for_write(self, page_number):
+        page = self.pages.get(page_number)
+        if page is None:
+            page = self.pages[page_number] = bytearray(PAGE_SIZE)
+            self.written[page_number] = bytearray(PAGE_SIZE)
+            bisect.insort(self.page_order, page_number)
+        elif page.__class__ is bytes:
+            # Shared with a checkpoint: copy on the first write
+            page = self.pages[page_number] = bytearray(page)
+            self.written[page_number] = bytearray(self.written[page_number])
+        return page
+
+    # Byte, halfword and word access
+    def store_byte(self, address, value):
+        page_number = address >> PAGE_SHIFT
+        offset = address & PAGE_OFFSET_MASK
+        self.page_for_write(page_number)[offset] = value & 0xFF
+        self.written[page_number][offset] = 1
+
+    def store_halfword(self, address, value):
+        offset = address & PAGE_OFFSET_MASK
+        if offset > PAGE_SIZE - 2:
+            self.store_byte(address, value)
+            self.store_byte(address + 1, value >> 8)
+            return
+        page_number = address >> PAGE_SHIFT
+        HALFWORD.pack_into(self.page_for_write(page_number), offset, value & 0xFFFF)
+        self.written[page_number][offset:offset + 2] = b'\x01\x01'
+
+    def store_word(self, address, value):
+        offset = address & PAGE_OFFSET_MASK
+        if offset > PAGE_SIZE - 4:
+            for i in range(4):
+                self.store_byte(address + i, value >> (8 * i))
+            return
+        page_number = address >> PAGE_SHIFT
+        WORD.pack_into(self.page_for_write(page_number), offset, value & MASK32)
+        self.written[page_number][offset:offset + 4] = b'\x01\x01\x01\x01'
+
+    def load_byte(self, address):
+        page = self.pages.get(address >> PAGE_SHIFT)
+        if page is None:
+            return 0
+        return page[address & PAGE_OFFSET_MASK]
+
+    def load_halfword_unsigned(self, address):
+        offset = address & PAGE_OFFSET_MASK
+        if offset > PAGE_SIZE - 2:
+            return (self.load_byte(address + 1) << 8) | self.load_byte(address)
+        page = self.pages.get(address >> PAGE_SHIFT)
+        if page is None:
+            return 0
+        return HALFWORD.unpack_from(page, offset)[0]
+
+    def load_halfword(self, address):
+        value = self.load_halfword_unsigned(address)
+        if value & 0x8000:
+            value |= 0xFFFF0000  # Sign-extend to 32 bits
+        return value
+
+    def load_word(self, address):
+        offset = address & PAGE_OFFSET_MASK
+        if offset > PAGE_SIZE - 4:
+            return ((self.load_byte(address + 3) << 24) | (self.load_byte(address + 2) << 16)
+                    | (self.load_byte(address + 1) << 8) | self.load_byte(address))
+        page = self.pages.get(address >> PAGE_SHIFT)
+        if page is None:
+            return 0
+        return WORD.unpack_from(page, offset)[0]
+
+    def store_bytes(self, address, data):
+        # Bulk copy (e.g. a program image), one slice per page
+        position = 0
+        while position < len(data):
+            page_number = (address + position) >> PAGE_SHIFT
+            offset = (address + position) & PAGE_OFFSET_MASK
+            chunk = min(PAGE_SIZE - offset, len(data) - position)
+            self.page_for_write(page_number)[offset:offset + chunk] = data[position:position + chunk]
+            self.written[page_number][offset:offset + chunk] = b'\x01' * chunk
+            position += chunk
+
+    def load_bytes(self, address, size):
+        # Bulk read, one slice per page; unallocated pages read as zeros
+        offset = address & PAGE_OFFSET_MASK
+        if offset + size <= PAGE_SIZE:
+            page = self.pages.get(address >> PAGE_SHIFT)
+            return bytes(page[offset:offset + size]) if page is not None else bytes(size)
+        data = bytearray()
+        while len(data) < size:
+            page = self.pages.get((address + len(data)) >> PAGE_SHIFT)
+            offset = (address + len(data)) & PAGE_OFFSET_MASK
+            chunk = min(PAGE_SIZE - offset, size - len(data))
+            data += page[offset:offset + chunk] if page is not None else bytes(chunk)
+        return bytes(data)
+
+    # Dict-style view of the written bytes, used by the memory dump
+    def __contains__(self, address):
+        written = self.written.get(address >> PAGE_SHIFT)
+        return written is not None and written[address & PAGE_OFFSET_MASK] == 1
+
+    def __getitem__(self, address):
+        if address not in self:
+            raise KeyError(address)
+        return self.pages[address >> PAGE_SHIFT][address & PAGE_OFFSET_MASK]
+
+    def __setitem__(self, address, value):
+        self.store_byte(address, value)
+
+    def get(self, address, default=None):
+        return self[address] if address in self else default
+
+    def keys(self):
+        return list_written(self.written)
+
+    def items(self):
+        return self.items_in_range()
+
+    def __len__(self):
+        return sum(written.count(1) for written in self.written.values())
+
+    def __bool__(self):
+        return bool(self.written)
+
+    def items_in_range(self, start=None, end=None):
+        # Written (address, value) pairs in [start, end), in address order
+        items = []
+        order = self.page_order
+        first = bisect.bisect_left(order, start >> PAGE_SHIFT) if start is not None else 0
+        last = bisect.bisect_left(order, (end + PAGE_OFFSET_MASK) >> PAGE_SHIFT) if end is not None else len(order)
+        for page_number in order[first:last]:
+            base = page_number << PAGE_SHIFT
+            scan_written(items, base, self.pages[page_number], 0, self.written[page_number],
+                         *page_bounds(base, start, end))
+        return items
+
+    def changed_since(self, state):
+        # Word addresses that differ from a checkpoint() state, in order.
+        # Pages still shared with the checkpoint are skipped uncompared.
+        _, pages, written = state
+        words = []
+        for page_number in sorted(set(self.page_order).union(pages)):
+            page = self.pages.get(page_number, ZERO_PAGE)
+            old_page = pages.get(page_number, ZERO_PAGE)
+            if page is not old_page:
+                words += changed_words(page_number << PAGE_SHIFT, page, old_page,
+                                       self.written.get(page_number, ZERO_PAGE),
+                                       written.get(page_number, ZERO_PAGE))
+        return words
+
+    def written_mask(self, address, size):
+        # Bit i set when address + i has been written
+        offset = address & PAGE_OFFSET_MASK
+        if offset + size <= PAGE_SIZE:
+            written = self.written.get(address >> PAGE_SHIFT)
+            if written is None:
+                return 0
+            flags = written[offset:offset + size]
+            if flags == ALL_WRITTEN[size]:
+                return (1 << size) - 1
+            if flags.find(1) == -1:
+                return 0
+        return sum(1 << i for i in range(size) if address + i in self)
+
+    def revert_bytes(self, address, data, mask):
+        # Put back bytes saved with load_bytes()/written_mask(); bytes that
+        # had never been written become unwritten again
+        for i, value in enumerate(data):
+            page_number = (address + i) >> PAGE_SHIFT
+            offset = (address + i) & PAGE_OFFSET_MASK
+            self.page_for_write(page_number)[offset] = value
+            written = self.written[page_number]
+            written[offset] = mask >> i & 1
+            if not mask >> i & 1 and written.find(1) == -1:
+                del self.pages[page_number], self.written[page_number]
+                self.page_order.remove(page_number)
+
+    def checkpoint(self):
+        # Freeze the pages in place so this memory and the checkpoint share them
+        for page_number, page in self.pages.items():
+            if page.__class__ is not bytes:
+                self.pages[page_number] = bytes(page)
+                self.written[page_number] = bytes(self.written[page_number])
+        return ('paged', dict(self.pages), dict(self.written))
+
+    def restore(self, state):
+        self.pages = dict(state[1])
+        self.written = dict(state[2])
+        self.page_order = sorted(self.pages)
+
+    def close(self):
+        pass
+
+class MmapMemory:
+    # Simulated RAM backed by an mmap-ed file mapped at address `base`, so a
+    # large memory image loads in constant time and, in mode 'r', is shared
+    # read-only between simulator processes through the page cache. Mode 'c'
+    # gives each run a private copy-on-write view and mode 'w' persists
+    # stores to the file. Accesses outside the image go to `overlay`, another
+    # backend (a PagedMemory by default).
+    #
+    # Every byte of the image counts as initialized, but keys() (and so the
+    # memory dump) only lists bytes stored during this run.
+
+    def __init__(self, path, base=0, mode='c', size=None, overlay=None):
+        if mode not in IMAGE_MODES:
+            raise ValueError(f"Unknown image mode '{mode}', expected one of {list(IMAGE_MODES)}")
+        if mode == 'w' and size is not None and not os.path.exists(path):
+            open(path, 'wb').close()
+        self.file = open(path, 'r+b' if mode == 'w' else 'rb')
+        file_size = os.fstat(self.file.fileno()).st_size
+        if size is None:
+            size = file_size
+        elif mode == 'w' and file_size < size:
+            self.file.truncate(size)  # Grow the backing file sparsely
+        if size == 0:
+            self.file.close()
+            raise ValueError(f"Memory image '{path}' is empty")
+        self.image = mmap.mmap(self.file.fileno(), size, access=IMAGE_MODES[mode])
+        self.path = path
+        self.mode = mode
+        self.base = base
+        self.end = base + size
+        self.written = {}  # page number -> written flags, for the dump only
+        self.overlay = overlay if overlay is not None else PagedMemory()
+
+    def check_store(self, address):
+        if self.mode == 'r':
+            raise PermissionError(f"Memory image '{self.path}' is mapped read-only; "
+                                  f"store to address {address} rejected")
+
+    # Byte, halfword and word access
+    def store_byte(self, address, value):
+        if self.base <= address < self.end:
+            self.check_store(address)
+            self.image[address - self.base] = value & 0xFF
+            mark_written(self.written, address, 1)
+        else:
+            self.overlay.store_byte(address, value)
+
+    def store_halfword(self, address, value):
+        if self.base <= address and address + 2 <= self.end:
+            self.check_store(address)
+            HALFWORD.pack_into(self.image, address - self.base, value & 0xFFFF)
+            mark_written(self.written, address, 2)
+        else:
+            self.store_byte(address, value)
+            self.store_byte(address + 1, value >> 8)
+
+    def store_word(self, address, value):
+        if self.base <= address and address + 4 <= self.end:
+            self.check_store(address)
+            WORD.pack_into(self.image, address - self.base, value & MASK32)
+            mark_written(self.written, address, 4)
+        else:
+            for i in range(4):
+                self.store_byte(address + i, value >> (8 * i))
+
+    def load_byte(self, address):
+        if self.base <= address < self.end:
+            return self.image[address - self.base]
+        return self.overlay.load_byte(address)
+
+    def load_halfword_unsigned(self, address):
+        if self.base <= address and address + 2 <= self.end:
+            return HALFWORD.unpack_from(self.image, address - self.base)[0]
+        return (self.load_byte(address + 1) << 8) | self.load_byte(address)
+
+    def load_halfword(self, address):
+        value = self.load_halfword_unsigned(address)
+        if value & 0x8000:
+            value |= 0xFFFF0000  # Sign-extend to 32 bits
+        return value
+
+    def load_word(self, address):
+        if self.base <= address and address + 4 <= self.end:
+            return WORD.unpack_from(self.image, address - self.base)[0]
+        return ((self.load_byte(address + 3) << 24) | (self.load_byte(address + 2) << 16)
+                | (self.load_byte(address + 1) << 8) | self.load_byte(address))
+
+    def store_bytes(self, address, data):
+        if self.base <= address and address + len(data) <= self.end:
+            self.check_store(address)
+            self.image[address - self.base:address - self.base + len(data)] = data
+            mark_written(self.written, address, len(data))
+        else:
+            for i, value in enumerate(data):
+                self.store_byte(address + i, value)
+
+    def load_bytes(self, address, size):
+        if self.base <= address and address + size <= self.end:
+            return self.image[address - self.base:address - self.base + size]
+        return bytes(self.load_byte(byte_address) for byte_address in range(address, address + size))
+
+    # Dict-style view, used by the memory dump
+    def __contains__(self, address):
+        return self.base <= address < self.end or address in self.overlay
+
+    def __getitem__(self, address):
+        if self.base <= address < self.end:
+            return self.image[address - self.base]
+        return self.overlay[address]
+
+    def __setitem__(self, address, value):
+        self.store_byte(address, value)
+
+    def get(self, address, default=None):
+        return self[address] if address in self else default
+
+    def keys(self):
+        return list(heapq.merge(list_written(self.written), sorted(self.overlay.keys())))
+
+    def items_in_range(self, start=None, end=None):
+        items = []
+        for page_number in sorted(self.written):
+            base = page_number << PAGE_SHIFT
+            low, high = page_bounds(base, start, end)
+            if low < high:
+                scan_written(items, base, self.image, base - self.base, self.written[page_number], low, high)
+        return list(heapq.merge(items, self.overlay.items_in_range(start, end)))
+
+    def changed_since(self, state):
+        _, _, _, _, _, dirty, written, overlay = state
+        words = []
+        for page_number, start, end in self.image_pages(sorted(set(self.written) | set(dirty) | set(written))):
+            old_data = dirty.get(page_number)
+            if old_data is None:
+                old_data = os.pread(self.file.fileno(), end - start, start - self.base)
+            low, high = start - (page_number << PAGE_SHIFT), end - (page_number << PAGE_SHIFT)
+            words += changed_words(start, self.image[start - self.base:end - self.base], old_data,
+                                   self.written.get(page_number, ZERO_PAGE)[low:high],
+                                   written.get(page_number, ZERO_PAGE)[low:high])
+        return sorted(set(heapq.merge(words, self.overlay.changed_since(overlay))))
+
+    def items(self):
+        return [(address, self.load_byte(address)) for address in self.keys()]
+
+    def __len__(self):
+        return sum(written.count(1) for written in self.written.values()) + len(self.overlay)
+
+    def __bool__(self):
+        return bool(self.written) or bool(self.overlay)
+
+    def written_mask(self, address, size):
+        mask = 0
+        for i in range(size):
+            byte_address = address + i
+            if self.base <= byte_address < self.end:
+                written = self.written.get(byte_address >> PAGE_SHIFT)
+                if written is not None and written[byte_address & PAGE_OFFSET_MASK]:
+                    mask |= 1 << i
+            elif self.overlay.written_mask(byte_address, 1):
+                mask |= 1 << i
+        return mask
+
+    def revert_bytes(self, address, data, mask):
+        for i, value in enumerate(data):
+            byte_address = address + i
+            if not self.base <= byte_address < self.end:
+                self.overlay.revert_bytes(byte_address, data[i:i + 1], mask >> i & 1)
+                continue
+            if self.mode != 'r':  # Read-only images were never stored to
+                self.image[byte_address - self.base] = value
+            if mask >> i & 1:
+                mark_written(self.written, byte_address, 1)
+            elif byte_address >> PAGE_SHIFT in self.written:
+                written = self.written[byte_address >> PAGE_SHIFT]
+                written[byte_address & PAGE_OFFSET_MASK] = 0
+                if written.find(1) == -1:
+                    del self.written[byte_address >> PAGE_SHIFT]
+
+    def image_pages(self, page_numbers):
+        # (page number, start, end) of each page's part inside the image
+        for page_number in page_numbers:
+            start = max(page_number << PAGE_SHIFT, self.base)
+            end = min((page_number + 1) << PAGE_SHIFT, self.end)
+            if start < end:
+                yield page_number, start, end
+
+    def checkpoint(self):
+        # Only the image pages stored to are saved; the rest is still the file
+        if self.mode == 'w':
+            raise ValueError("Images mapped with mode 'w' write through to their file and cannot be checkpointed")
+        dirty = {page_number: self.image[start - self.base:end - self.base]
+                 for page_number, start, end in self.image_pages(self.written)}
+        written = {page_number: bytes(flags) for page_number, flags in self.written.items()}
+        return ('mmap', self.path, self.base, self.mode, self.end - self.base, dirty, written,
+                self.overlay.checkpoint())
+
+    def restore(self, state):
+        _, _, _, _, _, dirty, written, overlay = state
+        if self.mode != 'r':
+            # Pages stored to since the checkpoint go back to the file's contents
+            for page_number, start, end in self.image_pages(set(self.written) | set(dirty)):
+                data = dirty.get(page_number)
+                if data is None:
+                    data = os.pread(self.file.fileno(), end - start, start - self.base)
+                self.image[start - self.base:end - self.base] = data
+        self.written = {page_number: bytearray(flags) for page_number, flags in written.items()}
+        self.overlay = restore_memory(self.overlay, overlay)
+
+    def close(self):
+        # Mode 'w' writes the image back to its file
+        if self.mode == 'w':
+            self.image.flush()
+        self.image.close()
+        self.file.close()
+        self.overlay.close()
+
+class WatchedMemory:
+    # Wrapper that calls on_write(address, size) after every store landing in
+    # [start, end), e.g. stores into cached code. Everything else, loads
+    # included, goes straight to the wrapped backend.
+
+    def __init__(self, memory, start, end, on_write):
+        self.memory = memory
+        self.start = start
+        self.end = end
+        self.on_write = on_write
+
+    def store_byte(self, address, value):
+        self.memory.store_byte(address, value)
+        if self.start <= address < self.end:
+            self.on_write(address, 1)
+
+    def store_halfword(self, address, value):
+        self.memory.store_halfword(address, value)
+        if self.start < address + 2 and address < self.end:
+            self.on_write(address, 2)
+
+    def store_word(self, address, value):
+        self.memory.store_word(address, value)
+        if self.start < address + 4 and address < self.end:
+            self.on_write(address, 4)
+
+    def __getattr__(self, name):
+        return getattr(self.memory, name)
+
+class WatchedAccess:
+    # Mixed in front of a backend's class while watchpoints are armed. Loads
+    # and stores through the byte/halfword/word helpers that touch a page in
+    # watch_pages call on_watch(kind, address, size), kind 'r' or 'w',
+    # before the access; the callback decides whether a watchpoint really
+    # covers the bytes. Bulk access (loaders, undo, dumps) is not watched.
+
+    def watched(self, address, size):
+        pages = self.watch_pages
+        return address >> PAGE_SHIFT in pages or (address + size - 1) >> PAGE_SHIFT in pages
+
+    def store_byte(self, address, value):
+        if address >> PAGE_SHIFT in self.watch_pages:
+            self.on_watch('w', address, 1)
+        super().store_byte(address, value)
+
+    def store_halfword(self, address, value):
+        if self.watched(address, 2):
+            self.on_watch('w', address, 2)
+        super().store_halfword(address, value)
+
+    def store_word(self, address, value):
+        if self.watched(address, 4):
+            self.on_watch('w', address, 4)
+        super().store_word(address, value)
+
+    def load_byte(self, address):
+        if address >> PAGE_SHIFT in self.watch_pages:
+            self.on_watch('r', address, 1)
+        return super().load_byte(address)
+
+    def load_halfword_unsigned(self, address):
+        if self.watched(address, 2):
+            self.on_watch('r', address, 2)
+        return super().load_halfword_unsigned(address)
+
+    def load_halfword(self, address):
+        if self.watched(address, 2):
+            self.on_watch('r', address, 2)
+        return super().load_halfword(address)
+
+    def load_word(self, address):
+        if self.watched(address, 4):
+            self.on_watch('r', address, 4)
+        return super().load_word(address)
+
+watched_classes = {}  # backend class -> its WatchedAccess subclass
+
+def watch_memory(memory, pages, on_watch):
+    # Arm (or re-arm) watchpoints on the given page numbers, in place
+    plain = getattr(memory, 'plain_class', memory.__class__)
+    watched = watched_classes.get(plain)
+    if watched is None:
+        watched = watched_classes[plain] = type('Watched' + plain.__name__, (WatchedAccess, plain),
+                                                {'plain_class': plain})
+    memory.watch_pages = pages
+    memory.on_watch = on_watch
+    memory.__class__ = watched
+
+def unwatch_memory(memory):
+    plain = getattr(memory, 'plain_class', None)
+    if plain is not None:
+        memory.__class__ = plain
+
+MEMORY_BACKENDS = {'dict': DictMemory, 'paged': PagedMemory}
+
+def is_memory_image(path):
+    return path.lower().endswith(IMAGE_EXTENSIONS)
+
+def parse_image_directive(line):
+    # '@image <path>[, <base address>]' line in a memory initialization file
+    parts = line[len('@image'):].split(',')
+    path = parts[0].strip()
+    base = int(parts[1].strip(), 0) if len(parts) > 1 else 0
+    return path, base
+
+def create_memory(backend='paged'):
+    return MEMORY_BACKENDS[backend]()
+
+def restore_memory(memory, state):
+    # Bring memory back to a checkpoint() state, in place when the backend
+    # (and, for images, the mapping) matches, so closures bound to it stay
+    # valid. Returns the memory to use from now on.
+    kind = state[0]
+    if kind == 'mmap':
+        _, path, base, mode, size = state[:5]
+        if not (isinstance(memory, MmapMemory) and (memory.path, memory.base, memory.mode, memory.end - memory.base)
+                == (path, base, mode, size)):
+            memory = MmapMemory(path, base, mode, size, overlay=PagedMemory())
+    elif not isinstance(memory, MEMORY_BACKENDS[kind]):
+        memory = MEMORY_BACKENDS[kind]()
+    memory.restore(state)
+    return memory
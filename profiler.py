@@ -0,0 +1,146 @@
+import bisect
+import time
+
+# Execution profiler for simulated programs.
+#
+# Every executed instruction is counted exactly, per static instruction.
+# Wall time is sampled: only one step in `sample_every` is timed, and the
+# sampled time is scaled back up in the report, so the profiler adds little
+# more than a counter increment to the other steps. Counts and times are
+# rolled up per opcode and per label region (the instructions from one
+# label up to the next) when the report is printed.
+#
+# A call stack is kept from the JAL/JALR call edges: a jump that writes a
+# return address (rd != 0) enters the label region of its target, and
+# `jalr x0, ra/t0, ...` returns. Each sampled step adds `sample_every` to
+# its stack in `folded`, written out in the folded-stack format read by
+# flamegraph.pl and speedscope.
+#
+# The engines hook in around each instruction:
+#
+#     start = profiler.begin(index)
+#     ...execute...
+#     profiler.end(index, next_index, start)
+#
+# or, for the closure engines, through wrap(), which does the same around
+# one closure.
+
+DEFAULT_SAMPLE_EVERY = 16
+RETURN_REGISTERS = (1, 5)  # ra and t0, as in the RISC-V return-address hints
+
+class Profiler:
+    def __init__(self, decoded_program, executable_instructions, labels, opcodes,
+                 code_base=0, pc_stride=1, sample_every=DEFAULT_SAMPLE_EVERY):
+        instruction_count = len(decoded_program)
+        self.instructions = executable_instructions
+        self.opcodes = [opcodes[decoded[0]] if decoded is not None else None for decoded in decoded_program]
+        self.code_base = code_base
+        self.pc_stride = pc_stride
+        self.sample_every = max(1, sample_every)
+        self.countdown = self.sample_every
+        self.counts = [0] * instruction_count
+        self.times = [0.0] * instruction_count  # sampled seconds
+
+        # Label region of every instruction
+        named = sorted((address, name) for name, address in labels.items())
+        addresses = [address for address, _ in named]
+        self.regions = []
+        for index in range(instruction_count):
+            position = bisect.bisect_right(addresses, code_base + index * pc_stride) - 1
+            self.regions.append(named[position][1] if position >= 0 else '<start>')
+
+        # 1: call (jal/jalr writing a return address), 2: return, 0: neither
+        self.call_kind = [0] * instruction_count
+        for index, decoded in enumerate(decoded_program):
+            if self.opcodes[index] in ('JAL', 'JALR'):
+                _, rd, rs1, _, _, _ = decoded
+                if rd != 0:
+                    self.call_kind[index] = 1
+                elif self.opcodes[index] == 'JALR' and rs1 in RETURN_REGISTERS:
+                    self.call_kind[index] = 2
+        self.stack = []
+        self.stack_key = None
+        self.folded = {}  # 'frame;frame;...' -> estimated steps
+
+    def begin(self, index):
+        # Count the step; returns the start time when this step is sampled
+        self.counts[index] += 1
+        self.countdown -= 1
+        if self.countdown:
+            return None
+        self.countdown = self.sample_every
+        return time.perf_counter()
+
+    def end(self, index, next_index, start):
+        if start is not None:
+            self.times[index] += time.perf_counter() - start
+            if self.stack_key is None:
+                self.enter(index)
+            self.folded[self.stack_key] = self.folded.get(self.stack_key, 0) + self.sample_every
+        kind = self.call_kind[index]
+        if kind and next_index is not None and 0 <= next_index < len(self.regions):
+            if self.stack_key is None:
+                self.enter(index)
+            if kind == 1:
+                self.stack.append(self.regions[next_index])
+            elif len(self.stack) > 1:
+                self.stack.pop()
+            self.stack_key = ';'.join(self.stack)
+
+    def enter(self, index):
+        # The outermost frame is the region the run started in
+        self.stack = [self.regions[index]]
+        self.stack_key = self.stack[0]
+
+    def wrap(self, index, op):
+        begin, end = self.begin, self.end
+        def profiled():
+            start = begin(index)
+            next_index = op()
+            end(index, next_index, start)
+            return next_index
+        return profiled
+
+    def location(self, index):
+        address = self.code_base + index * self.pc_stride
+        return f"{address}" if self.pc_stride == 1 else f"0x{address:08X}"
+
+    def totals(self, keys):
+        # {key: [count, estimated seconds]} summed over every instruction
+        totals = {}
+        for index, key in enumerate(keys):
+            if self.counts[index]:
+                total = totals.setdefault(key, [0, 0.0])
+                total[0] += self.counts[index]
+                total[1] += self.times[index] * self.sample_every
+        return totals
+
+    def report(self, top=20, write=print):
+        steps = sum(self.counts)
+        if not steps:
+            write("Profile: no instructions executed.")
+            return
+        estimated = sum(self.times) * self.sample_every
+        write(f"\n{'='*25} Profile {'='*25}")
+        write(f"{steps} instructions, ~{estimated:.6f}s in instructions "
+              f"(1 in {self.sample_every} steps timed)\n")
+
+        write(f"{'PC':>10} {'Count':>10} {'%':>6} {'Est. time':>11} {'Region':<16} Instruction")
+        hottest = sorted((index for index in range(len(self.counts)) if self.counts[index]),
+                         key=lambda index: self.counts[index], reverse=True)[:top]
+        for index in hottest:
+            write(f"{self.location(index):>10} {self.counts[index]:>10} {100 * self.counts[index] / steps:>5.1f}% "
+                  f"{self.times[index] * self.sample_every:>10.6f}s {self.regions[index]:<16} "
+                  f"{self.instructions[index].strip()}")
+
+        for title, keys in (('Opcode', self.opcodes), ('Region', self.regions)):
+            write(f"\n{title:<16} {'Count':>10} {'%':>6} {'Est. time':>11} {'ns/instr':>9}")
+            totals = sorted(self.totals(keys).items(), key=lambda item: item[1][1], reverse=True)
+            for key, (count, seconds) in totals[:top]:
+                write(f"{str(key):<16} {count:>10} {100 * count / steps:>5.1f}% {seconds:>10.6f}s "
+                      f"{seconds / count * 1e9:>9.0f}")
+
+    def write_folded(self, path):
+        with open(path, 'w') as file:
+            for stack, count in sorted(self.folded.items()):
+                file.write(f"{stack} {count}\n")
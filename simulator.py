@@ -0,0 +1,263 @@
+import time
+from collections import namedtuple
+
+import assembler
+import binary_loader
+import checkpoint
+import closure_engine
+import elf_loader
+import memory_model
+from assembler import OPCODES, OPCODE_IDS
+from closure_engine import Halt
+
+# Self-contained RV32I simulator.
+#
+# store_load.py keeps its state in module globals, so one process can only
+# run one program at a time. A Simulator holds all of that state itself
+# (in __slots__) and runs on the closure engine, so any number of them can
+# run side by side in one process or thread pool:
+#
+#     sim = Simulator()
+#     sim.load('Tests/Test Cases for Submission/arithmetic_test_case.txt')
+#     sim.run(max_steps=100000)
+#     state = sim.snapshot()
+#
+# Loader problems raise ValueError (or OSError for missing files) instead of
+# exiting the process.
+#
+# run() takes an instruction budget and a wall-clock limit, so a program
+# that never ends cannot hang its caller; it returns a RunResult saying why
+# the run stopped. The simulated datapath is single-cycle, so the cycle
+# count equals the number of instructions retired.
+#
+# checkpoint() captures the whole simulator (see checkpoint.py) and
+# restore() returns to it, so a program can be fast-forwarded once and many
+# experiments branched from the same point:
+#
+#     sim.run(max_steps=50000000)
+#     saved = sim.checkpoint()          # or sim.save_checkpoint('warm.ckpt')
+#     for variant in variants:
+#         sim.restore(saved)
+#         ...
+
+PC_MODELS = {'index': 1, 'byte': 4}
+
+# RunResult.stop_reason values
+STOP_HALTED = 'halted'            # ECALL/EBREAK
+STOP_FINISHED = 'finished'        # the PC left the program
+STOP_STEP_BUDGET = 'step budget'  # max_steps instructions executed
+STOP_TIME_BUDGET = 'time budget'  # time_limit seconds passed
+BUDGET_STOPS = (STOP_STEP_BUDGET, STOP_TIME_BUDGET)
+
+RunResult = namedtuple('RunResult', ['stop_reason', 'steps', 'cycles', 'elapsed'])
+
+class Simulator:
+    __slots__ = ('registers', 'program_counter', 'memory', 'memory_backend', 'labels',
+                 'executable_instructions', 'decoded_program', 'code', 'code_base', 'pc_stride',
+                 'instruction_index', 'steps', 'halted', 'halted_by', 'stop_reason')
+
+    def __init__(self, memory_backend='paged'):
+        self.memory_backend = memory_backend
+        self.reset()
+
+    def reset(self):
+        self.registers = [0] * 32
+        self.program_counter = 0
+        self.memory = memory_model.create_memory(self.memory_backend)
+        self.labels = {}
+        self.executable_instructions = []
+        self.decoded_program = []
+        self.code = None  # Closures, compiled on the first step once memory is final
+        self.code_base = 0
+        self.pc_stride = 1
+        self.instruction_index = {}
+        self.steps = 0
+        self.halted = False
+        self.halted_by = None
+        self.stop_reason = None
+
+    def set_layout(self, base, stride):
+        self.code_base = base
+        self.pc_stride = stride
+        self.instruction_index = {base + i * stride: i for i in range(len(self.decoded_program))}
+
+    def load(self, path, memory_file=None, start=None, pc_model=None, load_address=0):
+        # Load a text listing, a raw .bin image or an ELF executable, plus an
+        # optional memory initialization file or image. start is an
+        # instruction index; ELF files start at e_entry by default. Whatever
+        # was loaded or run before is dropped first (the memory backend stays).
+        self.close()
+        self.reset()
+        entry = None
+        if elf_loader.is_elf_file(path):
+            entry = self.load_elf(path)
+        elif binary_loader.is_binary_program(path):
+            with open(path, 'rb') as file:
+                self.load_machine_code(file.read(), load_address)
+        else:
+            with open(path, 'r') as file:
+                self.load_listing(file.readlines(), pc_model or 'index', load_address)
+        if memory_file:
+            self.load_memory(memory_file)
+        if start is not None:
+            if not 0 <= start < len(self.decoded_program):
+                raise ValueError(f"starting instruction index {start} is outside the program")
+            self.program_counter = self.code_base + start * self.pc_stride
+        elif entry is not None:
+            self.program_counter = entry
+        else:
+            self.program_counter = self.code_base
+
+    def load_listing(self, instruction_lines, pc_model='index', load_address=0):
+        stride = PC_MODELS[pc_model]
+        base = load_address if stride != 1 else 0
+        self.executable_instructions, self.labels = assembler.collect_labels(instruction_lines, base, stride)
+        self.decoded_program = assembler.decode_program(self.executable_instructions, self.labels, base, stride)
+        self.set_layout(base, stride)
+        self.program_counter = base
+        self.code = None
+
+    def load_machine_code(self, image, load_address=0):
+        (self.decoded_program, self.executable_instructions,
+         self.labels, _) = binary_loader.decode_image(image, OPCODE_IDS, load_address)
+        self.set_layout(load_address, PC_MODELS['byte'])
+        self.memory.store_bytes(load_address, image)
+        self.program_counter = load_address
+        self.code = None
+
+    def load_elf(self, path):
+        # Returns the entry address
+        program = elf_loader.read_elf_file(path)
+        text_base, text = program.code_image()
+        self.load_machine_code(text, text_base)
+        for vaddr, data, _, _ in program.segments:
+            self.memory.store_bytes(vaddr, data)
+        for name, address in program.symbols.items():
+            if address in self.instruction_index:
+                self.labels[name] = address
+        if program.entry not in self.instruction_index:
+            raise ValueError(f"entry point 0x{program.entry:08X} is outside the executable segments")
+        return program.entry
+
+    def load_memory(self, memory_file, image_base=0, image_mode='c'):
+        if memory_model.is_memory_image(memory_file):
+            self.map_image(memory_file, image_base, image_mode)
+            return
+        with open(memory_file, 'r') as file:
+            self.load_memory_lines(file, image_mode)
+
+    def load_memory_lines(self, lines, image_mode='c'):
+        for line in lines:
+            line = line.strip()
+            if line.startswith('@image'):
+                path, base = memory_model.parse_image_directive(line)
+                self.map_image(path, base, image_mode)
+            elif line and not line.startswith('#'):
+                assembler.apply_memory_line(line, self.memory.store_byte, self.memory.store_word)
+
+    def map_image(self, path, base=0, image_mode='c'):
+        self.memory = memory_model.MmapMemory(path, base, image_mode, overlay=self.memory)
+        self.code = None
+
+    def compile(self):
+        self.code = closure_engine.compile_program(self.decoded_program, OPCODES, self.registers,
+                                                   self.memory, self.code_base, self.pc_stride)
+
+    def step(self):
+        # Execute one instruction; returns False once the program has ended
+        index = self.instruction_index.get(self.program_counter)
+        if self.halted or index is None:
+            self.stop_reason = STOP_HALTED if self.halted else STOP_FINISHED
+            return False
+        if self.code is None:
+            self.compile()
+        self.steps += 1
+        try:
+            index = self.code[index]()
+        except Halt as halt:
+            self.halted = True
+            self.halted_by = halt.opcode
+            self.stop_reason = STOP_HALTED
+            return False
+        self.program_counter = self.code_base + index * self.pc_stride
+        return True
+
+    def run(self, max_steps=None, time_limit=None):
+        # Run until the program ends or halts, or until max_steps instructions
+        # have executed or time_limit seconds have passed. Returns a RunResult
+        # for this call; a budget stop leaves the simulator ready to resume.
+        start = time.perf_counter()
+        index = self.instruction_index.get(self.program_counter)
+        if self.halted or index is None:
+            self.stop_reason = STOP_HALTED if self.halted else STOP_FINISHED
+            return RunResult(self.stop_reason, 0, 0, 0.0)
+        if self.code is None:
+            self.compile()
+        deadline = start + time_limit if time_limit is not None else None
+        index, steps, halted_by = closure_engine.run_program(self.code, index, max_steps, deadline)
+        self.steps += steps
+        self.program_counter = self.code_base + index * self.pc_stride
+        if halted_by:
+            self.halted = True
+            self.halted_by = halted_by
+            self.stop_reason = STOP_HALTED
+        elif not 0 <= index < len(self.code):
+            self.stop_reason = STOP_FINISHED
+        elif max_steps is not None and steps >= max_steps:
+            self.stop_reason = STOP_STEP_BUDGET
+        else:
+            self.stop_reason = STOP_TIME_BUDGET
+        return RunResult(self.stop_reason, steps, steps, time.perf_counter() - start)
+
+    def running(self):
+        return not self.halted and self.program_counter in self.instruction_index
+
+    def snapshot(self):
+        # Architectural state as plain data (memory: only written bytes)
+        return {
+            'pc': self.program_counter,
+            'steps': self.steps,
+            'halted': self.halted_by,
+            'stop_reason': self.stop_reason,
+            'registers': list(self.registers),
+            'memory': dict(self.memory.items()),
+        }
+
+    def checkpoint(self):
+        return checkpoint.Checkpoint(self.registers, self.program_counter, self.steps, self.halted,
+                                     self.halted_by, self.stop_reason, self.code_base, self.pc_stride,
+                                     self.labels, self.executable_instructions, self.decoded_program,
+                                     self.memory_backend, self.memory.checkpoint())
+
+    def restore(self, saved):
+        # The closures are kept when the program and the memory object are
+        # unchanged; they read registers and memory through the same objects
+        self.registers[:] = saved.registers
+        memory = memory_model.restore_memory(self.memory, saved.memory)
+        if memory is not self.memory:
+            self.memory.close()
+            self.memory = memory
+            self.code = None
+        if saved.decoded_program is not self.decoded_program and saved.decoded_program != self.decoded_program:
+            self.decoded_program = saved.decoded_program
+            self.executable_instructions = saved.executable_instructions
+            self.code = None
+        if (saved.code_base, saved.pc_stride) != (self.code_base, self.pc_stride) or self.code is None:
+            self.set_layout(saved.code_base, saved.pc_stride)
+            self.code = None
+        self.labels = dict(saved.labels)
+        self.memory_backend = saved.memory_backend
+        self.program_counter = saved.program_counter
+        self.steps = saved.steps
+        self.halted = saved.halted
+        self.halted_by = saved.halted_by
+        self.stop_reason = saved.stop_reason
+
+    def save_checkpoint(self, path):
+        checkpoint.save(self.checkpoint(), path)
+
+    def load_checkpoint(self, path):
+        self.restore(checkpoint.load(path))
+
+    def close(self):
+        self.memory.close()
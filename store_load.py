@@ -1,12 +1,89 @@
+import argparse
 import sys
+import time
+
+import assembler
+import binary_loader
+import binary_trace
+import block_cache
+import closure_engine
+import debugger as debugger_module
+import delta_trace as delta_trace_module
+import elf_loader
+import expected_state
+import jit
+import memory_model
+import profiler as profiler_module
+import undo_log as undo_log_module
+from assembler import OPCODES, OPCODE_IDS
+from simulator import PC_MODELS
 
 # Global Variables
 registers = [0] * 32
 program_counter = 0
-memory = {}
+memory = memory_model.create_memory()
 labels = {}
 executable_instructions = []
 
+# PC model: instruction i lives at code_base + i * pc_stride, and the PC,
+# labels and return addresses all hold such addresses. Text listings keep
+# the original instruction-index PC (stride 1) unless --pc-model byte is
+# given; machine code always runs on real byte addresses (stride 4). See
+# simulator.PC_MODELS.
+code_base = 0
+pc_stride = 1
+instruction_index = {}  # address -> index into the decoded program
+
+def set_program_layout(base, stride, instruction_count):
+    global code_base
+    global pc_stride
+    global instruction_index
+    code_base = base
+    pc_stride = stride
+    instruction_index = {base + i * stride: i for i in range(instruction_count)}
+
+def pc_location(address):
+    if pc_stride == 1:
+        return f"instruction index {address}"
+    return f"address 0x{address:08X}"
+
+# Trace levels, from quietest to most verbose:
+#   none  - nothing but errors
+#   final - only the final architectural state
+#   delta - registers and memory bytes changed by each instruction
+#   full  - handler messages plus a full register/memory dump per instruction
+TRACE_LEVELS = ['none', 'final', 'delta', 'full']
+trace_level = 'full'
+
+# Write set of the current instruction (only kept for delta traces): the
+# handlers report registers through write_register() and store_byte()
+# reports memory bytes
+track_writes = False
+written_registers = []
+written_addresses = []
+delta_trace = None
+
+# Memory dump selection: only the bytes in dump_range, or with
+# --dump-dirty-since only the words changed since that step (compared with
+# a memory checkpoint taken then)
+dump_range = (None, None)  # None: no bound on that side
+dirty_since = None
+dirty_mark = None
+
+# Undo log for reverse execution (--history): the handlers record what each
+# step overwrites, so step_back()/run_back_to() rewind without re-running
+undo_log = None
+
+# Breakpoints, watchpoints and register conditions (--break/--watch/
+# --stop-when/--debug); None when none were asked for
+debugger = None
+
+def quiet(*args):
+    pass
+
+# Per-instruction handler messages; swapped for quiet() below the full trace level
+log = print
+
 def to_signed32(val):
     # Convert 32-bit unsigned integer to signed integer
     if val & 0x80000000:
@@ -14,213 +91,248 @@ def to_signed32(val):
     else:
         return val
 
-# Memory Handling Helper Functions
+def write_register(rd, value):
+    if undo_log is not None:
+        undo_log.record_register(rd, registers[rd])
+    registers[rd] = value
+    if track_writes:
+        written_registers.append(rd)
+
+# Memory Handling Helper Functions (the storage itself lives in memory_model)
 def store_byte(address, value):
-    memory[address] = value & 0xFF
+    if undo_log is not None:
+        undo_log.record_store(address, 1)
+    memory.store_byte(address, value)
+    if track_writes:
+        written_addresses.append(address)
 
 def store_halfword(address, value):
-    store_byte(address, value & 0xFF)
-    store_byte(address + 1, (value >> 8) & 0xFF)
+    if undo_log is not None:
+        undo_log.record_store(address, 2)
+    memory.store_halfword(address, value)
+    if track_writes:
+        written_addresses.extend(range(address, address + 2))
 
 def store_word(address, value):
-    store_byte(address, value & 0xFF)
-    store_byte(address + 1, (value >> 8) & 0xFF)
-    store_byte(address + 2, (value >> 16) & 0xFF)
-    store_byte(address + 3, (value >> 24) & 0xFF)
+    if undo_log is not None:
+        undo_log.record_store(address, 4)
+    memory.store_word(address, value)
+    if track_writes:
+        written_addresses.extend(range(address, address + 4))
+
+def step_back(count=1):
+    # Rewind the last `count` steps (at most back to the start of the
+    # history window); returns the number of steps undone
+    global program_counter
+    global memory
+    target = max(undo_log.steps - count, undo_log.oldest_step())
+    undone = undo_log.steps - target
+    pc = undo_log.rewind(target)
+    if pc is not None:
+        program_counter = pc
+    memory = undo_log.memory
+    return undone
+
+def run_back_to(pc):
+    # Rewind to the latest earlier step at which the PC was `pc`; returns
+    # the number of steps undone, or None if the window never reached it
+    step = undo_log.find_pc(pc)
+    if step is None:
+        return None
+    return step_back(undo_log.steps - step)
+
+def warn_uninitialized(address, size):
+    # Only checked when handler messages are shown
+    if log is quiet:
+        return
+    for byte_address in range(address, address + size):
+        if byte_address not in memory:
+            log(f"Warning: Loading from uninitialized memory address {byte_address}. Returning 0.")
 
 def load_byte(address):
-    if address not in memory:
-        print(f"Warning: Loading from uninitialized memory address {address}. Returning 0.")
-    return memory.get(address, 0)
+    warn_uninitialized(address, 1)
+    return memory.load_byte(address)
 
 def load_halfword(address):
-    byte1 = load_byte(address)
-    byte2 = load_byte(address + 1)
-    value = (byte2 << 8) | byte1
-    if value & 0x8000:
-        value |= 0xFFFF0000  # Sign-extend to 32 bits
-    return value
+    warn_uninitialized(address, 2)
+    return memory.load_halfword(address)
 
 def load_halfword_unsigned(address):
-    byte1 = load_byte(address)
-    byte2 = load_byte(address + 1)
-    return (byte2 << 8) | byte1
+    warn_uninitialized(address, 2)
+    return memory.load_halfword_unsigned(address)
 
 def load_word(address):
-    byte1 = load_byte(address)
-    byte2 = load_byte(address + 1)
-    byte3 = load_byte(address + 2)
-    byte4 = load_byte(address + 3)
-    return (byte4 << 24) | (byte3 << 16) | (byte2 << 8) | byte1
+    warn_uninitialized(address, 4)
+    return memory.load_word(address)
 
 # Arithmetic and Logical Instructions
 def add(rd, rs1, rs2):
     if rd != 0:
         result = (registers[rs1] + registers[rs2]) & 0xFFFFFFFF
-        registers[rd] = result
-        print(f"ADD: x{rd} = x{rs1} + x{rs2} -> {registers[rd]}")
+        write_register(rd, result)
+        log(f"ADD: x{rd} = x{rs1} + x{rs2} -> {registers[rd]}")
 
 def sub(rd, rs1, rs2):
     if rd != 0:
         result = (registers[rs1] - registers[rs2]) & 0xFFFFFFFF
-        registers[rd] = result
-        print(f"SUB: x{rd} = x{rs1} - x{rs2} -> {registers[rd]}")
+        write_register(rd, result)
+        log(f"SUB: x{rd} = x{rs1} - x{rs2} -> {registers[rd]}")
 
 def addi(rd, rs1, imm):
     if rd != 0:
         result = (registers[rs1] + imm) & 0xFFFFFFFF
-        registers[rd] = result
-        print(f"ADDI: x{rd} = x{rs1} + {imm} -> {registers[rd]}")
+        write_register(rd, result)
+        log(f"ADDI: x{rd} = x{rs1} + {imm} -> {registers[rd]}")
 
 def andi(rd, rs1, imm):
     if rd != 0:
         result = (registers[rs1] & imm) & 0xFFFFFFFF
-        registers[rd] = result
-        print(f"ANDI: x{rd} = x{rs1} & {imm} -> {registers[rd]}")
+        write_register(rd, result)
+        log(f"ANDI: x{rd} = x{rs1} & {imm} -> {registers[rd]}")
 
 def ori(rd, rs1, imm):
     if rd != 0:
         result = (registers[rs1] | imm) & 0xFFFFFFFF
-        registers[rd] = result
-        print(f"ORI: x{rd} = x{rs1} | {imm} -> {registers[rd]}")
+        write_register(rd, result)
+        log(f"ORI: x{rd} = x{rs1} | {imm} -> {registers[rd]}")
 
 def xori(rd, rs1, imm):
     if rd != 0:
         result = (registers[rs1] ^ imm) & 0xFFFFFFFF
-        registers[rd] = result
-        print(f"XORI: x{rd} = x{rs1} ^ {imm} -> {registers[rd]}")
+        write_register(rd, result)
+        log(f"XORI: x{rd} = x{rs1} ^ {imm} -> {registers[rd]}")
 
 def slt(rd, rs1, rs2):
     if rd != 0:
         rs1_val = to_signed32(registers[rs1])
         rs2_val = to_signed32(registers[rs2])
         result = 1 if rs1_val < rs2_val else 0
-        registers[rd] = result
-        print(f"SLT: x{rd} = ({rs1_val} < {rs2_val}) -> {result}")
+        write_register(rd, result)
+        log(f"SLT: x{rd} = ({rs1_val} < {rs2_val}) -> {result}")
 
 def slti(rd, rs1, imm):
     if rd != 0:
         rs1_val = to_signed32(registers[rs1])
         result = 1 if rs1_val < imm else 0
-        registers[rd] = result
-        print(f"SLTI: x{rd} = ({rs1_val} < {imm}) -> {result}")
+        write_register(rd, result)
+        log(f"SLTI: x{rd} = ({rs1_val} < {imm}) -> {result}")
 
 def sltiu(rd, rs1, imm):
     if rd != 0:
         rs1_val = registers[rs1] & 0xFFFFFFFF
         imm_val = imm & 0xFFFFFFFF
         result = 1 if rs1_val < imm_val else 0
-        registers[rd] = result
-        print(f"SLTIU: x{rd} = ({rs1_val} < {imm} unsigned) -> {result}")
+        write_register(rd, result)
+        log(f"SLTIU: x{rd} = ({rs1_val} < {imm} unsigned) -> {result}")
 
 def sll(rd, rs1, rs2):
     if rd != 0:
         shift_amount = registers[rs2] & 0x1F
         result = (registers[rs1] << shift_amount) & 0xFFFFFFFF
-        registers[rd] = result
-        print(f"SLL: x{rd} = x{rs1} << {shift_amount} -> {registers[rd]}")
+        write_register(rd, result)
+        log(f"SLL: x{rd} = x{rs1} << {shift_amount} -> {registers[rd]}")
 
 def srl(rd, rs1, rs2):
     if rd != 0:
         shift_amount = registers[rs2] & 0x1F
         result = (registers[rs1] & 0xFFFFFFFF) >> shift_amount
-        registers[rd] = result
-        print(f"SRL: x{rd} = x{rs1} >> {shift_amount} -> {registers[rd]}")
+        write_register(rd, result)
+        log(f"SRL: x{rd} = x{rs1} >> {shift_amount} -> {registers[rd]}")
 
 def sra(rd, rs1, rs2):
     if rd != 0:
         shift_amount = registers[rs2] & 0x1F
         value = to_signed32(registers[rs1])
         result = value >> shift_amount
-        registers[rd] = result & 0xFFFFFFFF
-        print(f"SRA: x{rd} = x{rs1} >>> {shift_amount} -> {registers[rd]}")
+        write_register(rd, result & 0xFFFFFFFF)
+        log(f"SRA: x{rd} = x{rs1} >>> {shift_amount} -> {registers[rd]}")
 
 def slli(rd, rs1, imm):
     if rd != 0:
         shift_amount = imm & 0x1F
         result = (registers[rs1] << shift_amount) & 0xFFFFFFFF
-        registers[rd] = result
-        print(f"SLLI: x{rd} = x{rs1} << {shift_amount} -> {registers[rd]}")
+        write_register(rd, result)
+        log(f"SLLI: x{rd} = x{rs1} << {shift_amount} -> {registers[rd]}")
 
 def srli(rd, rs1, imm):
     if rd != 0:
         shift_amount = imm & 0x1F
         result = (registers[rs1] & 0xFFFFFFFF) >> shift_amount
-        registers[rd] = result
-        print(f"SRLI: x{rd} = x{rs1} >> {shift_amount} -> {registers[rd]}")
+        write_register(rd, result)
+        log(f"SRLI: x{rd} = x{rs1} >> {shift_amount} -> {registers[rd]}")
 
 def srai(rd, rs1, imm):
     if rd != 0:
         shift_amount = imm & 0x1F
         value = to_signed32(registers[rs1])
         result = value >> shift_amount
-        registers[rd] = result & 0xFFFFFFFF
-        print(f"SRAI: x{rd} = x{rs1} >>> {shift_amount} -> {registers[rd]}")
+        write_register(rd, result & 0xFFFFFFFF)
+        log(f"SRAI: x{rd} = x{rs1} >>> {shift_amount} -> {registers[rd]}")
 
 def sltu(rd, rs1, rs2):
     if rd != 0:
         rs1_val = registers[rs1] & 0xFFFFFFFF
         rs2_val = registers[rs2] & 0xFFFFFFFF
         result = 1 if rs1_val < rs2_val else 0
-        registers[rd] = result
-        print(f"SLTU: x{rd} = ({rs1_val} < {rs2_val} unsigned) -> {result}")
+        write_register(rd, result)
+        log(f"SLTU: x{rd} = ({rs1_val} < {rs2_val} unsigned) -> {result}")
 
 def xor(rd, rs1, rs2):
     if rd != 0:
         result = (registers[rs1] ^ registers[rs2]) & 0xFFFFFFFF
-        registers[rd] = result
-        print(f"XOR: x{rd} = x{rs1} ^ x{rs2} -> {registers[rd]}")
+        write_register(rd, result)
+        log(f"XOR: x{rd} = x{rs1} ^ x{rs2} -> {registers[rd]}")
 
 def or_(rd, rs1, rs2):
     if rd != 0:
         result = (registers[rs1] | registers[rs2]) & 0xFFFFFFFF
-        registers[rd] = result
-        print(f"OR: x{rd} = x{rs1} | x{rs2} -> {registers[rd]}")
+        write_register(rd, result)
+        log(f"OR: x{rd} = x{rs1} | x{rs2} -> {registers[rd]}")
 
 def and_(rd, rs1, rs2):
     if rd != 0:
         result = (registers[rs1] & registers[rs2]) & 0xFFFFFFFF
-        registers[rd] = result
-        print(f"AND: x{rd} = x{rs1} & x{rs2} -> {registers[rd]}")
+        write_register(rd, result)
+        log(f"AND: x{rd} = x{rs1} & x{rs2} -> {registers[rd]}")
 
 # Branch Instructions 
-def beq(rs1, rs2, target_label):
+def beq(rs1, rs2, target_label, target):
     global program_counter
     if rs1 is None or rs2 is None:
         print(f"Error: BEQ instruction missing operands rs1={rs1}, rs2={rs2}")
         return False
 
     if registers[rs1] == registers[rs2]:
-        if target_label in labels:
-            program_counter = labels[target_label]
-            print(f"BEQ: Branch taken to label '{target_label}' at instruction index {labels[target_label]}")
+        if target is not None:
+            program_counter = code_base + target * pc_stride
+            log(f"BEQ: Branch taken to label '{target_label}' at {pc_location(program_counter)}")
             return True
         else:
             print(f"Error: Label '{target_label}' not found.")
             return False
     else:
-        print(f"BEQ: Branch not taken, x{rs1}={registers[rs1]}, x{rs2}={registers[rs2]}")
+        log(f"BEQ: Branch not taken, x{rs1}={registers[rs1]}, x{rs2}={registers[rs2]}")
     return False
 
-def bne(rs1, rs2, target_label):
+def bne(rs1, rs2, target_label, target):
     global program_counter
     if rs1 is None or rs2 is None:
         print(f"Error: BNE instruction missing operands rs1={rs1}, rs2={rs2}")
         return False
 
     if registers[rs1] != registers[rs2]:
-        if target_label in labels:
-            program_counter = labels[target_label]
-            print(f"BNE: Branch taken to label '{target_label}' at instruction index {labels[target_label]}")
+        if target is not None:
+            program_counter = code_base + target * pc_stride
+            log(f"BNE: Branch taken to label '{target_label}' at {pc_location(program_counter)}")
             return True
         else:
             print(f"Error: Label '{target_label}' not found.")
             return False
     else:
-        print(f"BNE: Branch not taken, x{rs1}={registers[rs1]}, x{rs2}={registers[rs2]}")
+        log(f"BNE: Branch not taken, x{rs1}={registers[rs1]}, x{rs2}={registers[rs2]}")
     return False
 
-def blt(rs1, rs2, target_label):
+def blt(rs1, rs2, target_label, target):
     global program_counter
     if rs1 is None or rs2 is None:
         print(f"Error: BLT instruction missing operands rs1={rs1}, rs2={rs2}")
@@ -229,18 +341,18 @@ def blt(rs1, rs2, target_label):
     rs1_val = to_signed32(registers[rs1])
     rs2_val = to_signed32(registers[rs2])
     if rs1_val < rs2_val:
-        if target_label in labels:
-            program_counter = labels[target_label]
-            print(f"BLT: Branch taken to label '{target_label}' at instruction index {labels[target_label]}")
+        if target is not None:
+            program_counter = code_base + target * pc_stride
+            log(f"BLT: Branch taken to label '{target_label}' at {pc_location(program_counter)}")
             return True
         else:
             print(f"Error: Label '{target_label}' not found.")
             return False
     else:
-        print(f"BLT: Branch not taken, x{rs1}={rs1_val}, x{rs2}={rs2_val}")
+        log(f"BLT: Branch not taken, x{rs1}={rs1_val}, x{rs2}={rs2_val}")
     return False
 
-def bge(rs1, rs2, target_label):
+def bge(rs1, rs2, target_label, target):
     global program_counter
     if rs1 is None or rs2 is None:
         print(f"Error: BGE instruction missing operands rs1={rs1}, rs2={rs2}")
@@ -249,69 +361,69 @@ def bge(rs1, rs2, target_label):
     rs1_val = to_signed32(registers[rs1])
     rs2_val = to_signed32(registers[rs2])
     if rs1_val >= rs2_val:
-        if target_label in labels:
-            program_counter = labels[target_label]
-            print(f"BGE: Branch taken to label '{target_label}' at instruction index {labels[target_label]}")
+        if target is not None:
+            program_counter = code_base + target * pc_stride
+            log(f"BGE: Branch taken to label '{target_label}' at {pc_location(program_counter)}")
             return True
         else:
             print(f"Error: Label '{target_label}' not found.")
             return False
     else:
-        print(f"BGE: Branch not taken, x{rs1}={rs1_val}, x{rs2}={rs2_val}")
+        log(f"BGE: Branch not taken, x{rs1}={rs1_val}, x{rs2}={rs2_val}")
     return False
 
-def bltu(rs1, rs2, target_label):
+def bltu(rs1, rs2, target_label, target):
     global program_counter
     if rs1 is None or rs2 is None:
         print(f"Error: BLTU instruction missing operands rs1={rs1}, rs2={rs2}")
         return False
 
     if (registers[rs1] & 0xFFFFFFFF) < (registers[rs2] & 0xFFFFFFFF):
-        if target_label in labels:
-            program_counter = labels[target_label]
-            print(f"BLTU: Branch taken to label '{target_label}' at instruction index {labels[target_label]}")
+        if target is not None:
+            program_counter = code_base + target * pc_stride
+            log(f"BLTU: Branch taken to label '{target_label}' at {pc_location(program_counter)}")
             return True
         else:
             print(f"Error: Label '{target_label}' not found.")
             return False
     else:
-        print(f"BLTU: Branch not taken, x{rs1}={registers[rs1]}, x{rs2}={registers[rs2]}")
+        log(f"BLTU: Branch not taken, x{rs1}={registers[rs1]}, x{rs2}={registers[rs2]}")
     return False
 
-def bgeu(rs1, rs2, target_label):
+def bgeu(rs1, rs2, target_label, target):
     global program_counter
     if rs1 is None or rs2 is None:
         print(f"Error: BGEU instruction missing operands rs1={rs1}, rs2={rs2}")
         return False
 
     if (registers[rs1] & 0xFFFFFFFF) >= (registers[rs2] & 0xFFFFFFFF):
-        if target_label in labels:
-            program_counter = labels[target_label]
-            print(f"BGEU: Branch taken to label '{target_label}' at instruction index {labels[target_label]}")
+        if target is not None:
+            program_counter = code_base + target * pc_stride
+            log(f"BGEU: Branch taken to label '{target_label}' at {pc_location(program_counter)}")
             return True
         else:
             print(f"Error: Label '{target_label}' not found.")
             return False
     else:
-        print(f"BGEU: Branch not taken, x{rs1}={registers[rs1]}, x{rs2}={registers[rs2]}")
+        log(f"BGEU: Branch not taken, x{rs1}={registers[rs1]}, x{rs2}={registers[rs2]}")
     return False
 
 # Load and Store Instructions
 def lw(rd, offset, rs1):
     if rd == 0:
-        print("Warning: Attempt to write to x0 ignored.")
+        log("Warning: Attempt to write to x0 ignored.")
         return
     if rd is None or rs1 is None or offset is None:
         print(f"Error: LW instruction missing operands rd={rd}, rs1={rs1}, offset={offset}")
         return
 
     address = registers[rs1] + offset
-    registers[rd] = load_word(address)
-    print(f"LW: Loaded word {registers[rd]} from address {address} into x{rd}")
+    write_register(rd, load_word(address))
+    log(f"LW: Loaded word {registers[rd]} from address {address} into x{rd}")
 
 def lb(rd, offset, rs1):
     if rd == 0:
-        print("Warning: Attempt to write to x0 ignored.")
+        log("Warning: Attempt to write to x0 ignored.")
         return
     if rd is None or rs1 is None or offset is None:
         print(f"Error: LB instruction missing operands rd={rd}, rs1={rs1}, offset={offset}")
@@ -321,44 +433,44 @@ def lb(rd, offset, rs1):
     byte = load_byte(address)
     if byte & 0x80:
         byte |= 0xFFFFFF00  # Sign-extend to 32 bits
-    registers[rd] = byte
-    print(f"LB: Loaded byte {registers[rd]} from address {address} into x{rd}")
+    write_register(rd, byte)
+    log(f"LB: Loaded byte {registers[rd]} from address {address} into x{rd}")
 
 def lbu(rd, offset, rs1):
     if rd == 0:
-        print("Warning: Attempt to write to x0 ignored.")
+        log("Warning: Attempt to write to x0 ignored.")
         return
     if rd is None or rs1 is None or offset is None:
         print(f"Error: LBU instruction missing operands rd={rd}, rs1={rs1}, offset={offset}")
         return
 
     address = registers[rs1] + offset
-    registers[rd] = load_byte(address)
-    print(f"LBU: Loaded unsigned byte {registers[rd]} from address {address} into x{rd}")
+    write_register(rd, load_byte(address))
+    log(f"LBU: Loaded unsigned byte {registers[rd]} from address {address} into x{rd}")
 
 def lh(rd, offset, rs1):
     if rd == 0:
-        print("Warning: Attempt to write to x0 ignored.")
+        log("Warning: Attempt to write to x0 ignored.")
         return
     if rd is None or rs1 is None or offset is None:
         print(f"Error: LH instruction missing operands rd={rd}, rs1={rs1}, offset={offset}")
         return
 
     address = registers[rs1] + offset
-    registers[rd] = load_halfword(address)
-    print(f"LH: Loaded halfword {registers[rd]} from address {address} into x{rd}")
+    write_register(rd, load_halfword(address))
+    log(f"LH: Loaded halfword {registers[rd]} from address {address} into x{rd}")
 
 def lhu(rd, offset, rs1):
     if rd == 0:
-        print("Warning: Attempt to write to x0 ignored.")
+        log("Warning: Attempt to write to x0 ignored.")
         return
     if rd is None or rs1 is None or offset is None:
         print(f"Error: LHU instruction missing operands rd={rd}, rs1={rs1}, offset={offset}")
         return
 
     address = registers[rs1] + offset
-    registers[rd] = load_halfword_unsigned(address)
-    print(f"LHU: Loaded unsigned halfword {registers[rd]} from address {address} into x{rd}")
+    write_register(rd, load_halfword_unsigned(address))
+    log(f"LHU: Loaded unsigned halfword {registers[rd]} from address {address} into x{rd}")
 
 def sw(rs2, offset, rs1):
     if rs1 is None or rs2 is None or offset is None:
@@ -368,7 +480,7 @@ def sw(rs2, offset, rs1):
     address = registers[rs1] + offset
     value_to_store = registers[rs2]
     store_word(address, value_to_store)
-    print(f"SW: Stored value {value_to_store} from x{rs2} to memory address {address}")
+    log(f"SW: Stored value {value_to_store} from x{rs2} to memory address {address}")
 
 def sb(rs2, offset, rs1):
     if rs1 is None or rs2 is None or offset is None:
@@ -378,7 +490,7 @@ def sb(rs2, offset, rs1):
     address = registers[rs1] + offset
     value_to_store = registers[rs2] & 0xFF
     store_byte(address, value_to_store)
-    print(f"SB: Stored byte {value_to_store} from x{rs2} to memory address {address}")
+    log(f"SB: Stored byte {value_to_store} from x{rs2} to memory address {address}")
 
 def sh(rs2, offset, rs1):
     if rs1 is None or rs2 is None or offset is None:
@@ -388,30 +500,33 @@ def sh(rs2, offset, rs1):
     address = registers[rs1] + offset
     value_to_store = registers[rs2] & 0xFFFF
     store_halfword(address, value_to_store)
-    print(f"SH: Stored halfword {value_to_store} from x{rs2} to memory address {address}")
+    log(f"SH: Stored halfword {value_to_store} from x{rs2} to memory address {address}")
 
 # Jump and Link Instructions
-def jal(rd, target_label):
+def jal(rd, target_label, target):
     global program_counter
     if rd != 0:
-        registers[rd] = program_counter + 1  # Store return address
-        print(f"JAL: Set x{rd} to {registers[rd]}")
-    if target_label in labels:
-        program_counter = labels[target_label]  # Jump to label (instruction index)
-        print(f"JAL: Jumping to label '{target_label}' at instruction index {labels[target_label]}")
+        write_register(rd, program_counter + pc_stride)  # Store return address
+        log(f"JAL: Set x{rd} to {registers[rd]}")
+    if target is not None:
+        program_counter = code_base + target * pc_stride  # Jump to the decoded target index
+        log(f"JAL: Jumping to label '{target_label}' at {pc_location(program_counter)}")
     else:
         print(f"Error: Label '{target_label}' not found.")
         sys.exit(1)
 
 def jalr(rd, rs1, imm):
     global program_counter
-    if rd != 0:
-        registers[rd] = program_counter + 1  # Store return address
-        print(f"JALR: Set x{rd} to {registers[rd]}")
+    # Read rs1 before the link register is written, so jalr x1, x1, imm works
     target_address = (registers[rs1] + imm) & 0xFFFFFFFF
-    if 0 <= target_address < len(executable_instructions):
-        program_counter = target_address  # Jump to target instruction index
-        print(f"JALR: Jumping to instruction index {target_address}")
+    if pc_stride != 1:
+        target_address &= ~1  # Byte addresses: the lowest bit is cleared
+    if rd != 0:
+        write_register(rd, program_counter + pc_stride)  # Store return address
+        log(f"JALR: Set x{rd} to {registers[rd]}")
+    if target_address in instruction_index:
+        program_counter = target_address  # Jump to target address
+        log(f"JALR: Jumping to {pc_location(target_address)}")
     else:
         print(f"Error: Invalid jump address '{target_address}'.")
         sys.exit(1)
@@ -420,37 +535,37 @@ def jalr(rd, rs1, imm):
 def lui(rd, imm):
     if rd != 0:
         result = imm & 0xFFFFF000  # Clear the lower 12 bits
-        registers[rd] = result
-        print(f"LUI: Loaded immediate {imm} into x{rd} -> {registers[rd]}")
+        write_register(rd, result)
+        log(f"LUI: Loaded immediate {imm} into x{rd} -> {registers[rd]}")
     else:
-        print("Warning: Attempt to write to x0 ignored.")
+        log("Warning: Attempt to write to x0 ignored.")
 
 def auipc(rd, imm):
     if rd != 0:
-        # Add the immediate as an instruction index offset
+        # Add the immediate to the address of this instruction
         result = (program_counter + imm) & 0xFFFFFFFF
-        registers[rd] = result
-        print(f"AUIPC: Loaded immediate {imm} into x{rd} -> {registers[rd]}")
+        write_register(rd, result)
+        log(f"AUIPC: Loaded immediate {imm} into x{rd} -> {registers[rd]}")
     else:
-        print("Warning: Attempt to write to x0 ignored.")
+        log("Warning: Attempt to write to x0 ignored.")
 
 # System Instructions which halt the program
 def ecall():
-    print("ECALL - Halting")
+    log("ECALL - Halting")
     sys.exit(0)
 
 def ebreak():
-    print("EBREAK - Halting")
+    log("EBREAK - Halting")
     sys.exit(0)
 
 def fence():
-    print("FENCE - Halting.")
+    log("FENCE - Halting.")
 
 def fence_tso():
-    print("FENCE.TSO - Halting.")
+    log("FENCE.TSO - Halting.")
 
 def pause():
-    print("PAUSE - Halting.")
+    log("PAUSE - Halting.")
 
 # Utility Functions for reading and parsing instructions
 def read_instructions_from_file(file_path):
@@ -461,137 +576,51 @@ def read_instructions_from_file(file_path):
         print(f"Error: File '{file_path}' not found.")
         sys.exit(1)
 
-def parse_register(reg):
-    reg = reg.strip()
-    if reg.lower().startswith('x') and reg[1:].isdigit():
-        reg_num = int(reg[1:])
-        if 0 <= reg_num < 32:
-            return reg_num
-    print(f"Error: Invalid register {reg}")
-    return None
-
-def parse_immediate(value):
+def load_binary_program(file_path, load_address=0):
+    # Decode a raw machine-code image; the listing stands in for the source lines
+    global labels
+    global executable_instructions
     try:
-        return int(value, 0)
-    except ValueError:
-        print(f"Error: Invalid immediate value '{value}'")
-        return None
-
-def instruction_splitting(line):
-    line = line.strip()
-    if '#' in line:
-        line = line.split('#')[0].strip()
-
-    if not line:
-        return None, None, None, None, None, None
-
-    parts = line.replace(',', ' ').split()
-    opcode = parts[0].upper()
-
-    # Handling Load and Store Instructions with Offset Notation
-    if opcode in ['SW', 'SB', 'SH', 'LW', 'LH', 'LHU', 'LB', 'LBU']:
-        if len(parts) != 3:
-            print(f"Error: {opcode} instruction missing operands. line='{line}'")
-            return None, None, None, None, None, None
-        reg1 = parse_register(parts[1])
-        try:
-            offset_str, base_register = parts[2].split('(')
-            offset = parse_immediate(offset_str)
-            reg2 = parse_register(base_register[:-1])
-        except ValueError:
-            print(f"Error: Invalid offset notation. line='{line}'")
-            return None, None, None, None, None, None
-        if opcode in ['SW', 'SB', 'SH']:
-            return opcode, None, reg2, reg1, offset, None  # rs2, offset, rs1
-        else:
-            return opcode, reg1, reg2, None, offset, None  # rd, rs1, offset
-
-
-    # Handling JALR Instruction
-    elif opcode == 'JALR':
-        if len(parts) == 2:
-            # Format: jalr rd
-            rd = parse_register(parts[1])
-            return opcode, rd, None, None, 0, None
-        elif len(parts) == 3:
-            # Format: jalr rd, rs1
-            rd = parse_register(parts[1])
-            rs1 = parse_register(parts[2])
-            return opcode, rd, rs1, None, 0, None
-        elif len(parts) == 4:
-            # Format: jalr rd, rs1, imm
-            rd = parse_register(parts[1])
-            rs1 = parse_register(parts[2])
-            imm = parse_immediate(parts[3])
-            return opcode, rd, rs1, None, imm, None
-        else:
-            print(f"Error: JALR instruction missing operands. line='{line}'")
-            return None, None, None, None, None, None
-
-    # Immediate Arithmetic and Logical Instructions
-    elif opcode in ['ADDI', 'ANDI', 'ORI', 'XORI', 'SLTI', 'SLTIU',
-                    'SLLI', 'SRLI', 'SRAI']:
-        if len(parts) != 4:
-            print(f"Error: {opcode} instruction missing operands. line='{line}'")
-            return None, None, None, None, None, None
-        rd = parse_register(parts[1])
-        rs1 = parse_register(parts[2])
-        imm = parse_immediate(parts[3])
-        return opcode, rd, rs1, None, imm, None
-
-    # R-type instructions 
-    elif opcode in ['ADD', 'SUB', 'SLT', 'SLTU', 'XOR', 'OR', 'AND',
-                    'SLL', 'SRL', 'SRA']:
-        if len(parts) != 4:
-            print(f"Error: {opcode} instruction missing operands. line='{line}'")
-            return None, None, None, None, None, None
-        rd = parse_register(parts[1])
-        rs1 = parse_register(parts[2])
-        rs2 = parse_register(parts[3])
-        return opcode, rd, rs1, rs2, None, None
-
-    # Branch Instructions
-    elif opcode in ['BEQ', 'BNE', 'BLT', 'BGE', 'BLTU', 'BGEU']:
-        if len(parts) != 4:
-            print(f"Error: {opcode} instruction missing operands. line='{line}'")
-            return None, None, None, None, None, None
-        rs1 = parse_register(parts[1])
-        rs2 = parse_register(parts[2])
-        label = parts[3]
-        return opcode, None, rs1, rs2, label, None
-
-    # Upper Immediate Instructions
-    elif opcode in ['LUI', 'AUIPC']:
-        if len(parts) != 3:
-            print(f"Error: {opcode} instruction missing operands. line='{line}'")
-            return None, None, None, None, None, None
-        rd = parse_register(parts[1])
-        imm = parse_immediate(parts[2])
-        return opcode, rd, None, None, imm, None
-
-    # Jump Instructions
-    elif opcode == 'JAL':
-        if len(parts) == 2:
-            # Format: jal label
-            rd = 1  # Default return register x1
-            label = parts[1]
-            return opcode, rd, None, None, label, None
-        elif len(parts) == 3:
-            # Format: jal rd, label
-            rd = parse_register(parts[1])
-            label = parts[2]
-            return opcode, rd, None, None, label, None
-        else:
-            print(f"Error: JAL instruction missing operands. line='{line}'")
-            return None, None, None, None, None, None
-
-    # System instructions (ECALL, EBREAK, FENCE, FENCE.TSO, PAUSE)
-    elif opcode in ['ECALL', 'EBREAK', 'FENCE', 'FENCE.TSO', 'PAUSE']:
-        return opcode, None, None, None, None, None
+        program_image = binary_loader.read_binary_file(file_path)
+    except FileNotFoundError:
+        print(f"Error: File '{file_path}' not found.")
+        sys.exit(1)
+    decoded_program, executable_instructions, labels, invalid_words = binary_loader.decode_image(
+        program_image, OPCODE_IDS, load_address)
+    set_program_layout(load_address, PC_MODELS['byte'], len(decoded_program))
+    if invalid_words:
+        print(f"Warning: {invalid_words} word(s) in '{file_path}' are not RV32I instructions and will be skipped.")
+    return program_image, decoded_program
+
+def load_elf_program(file_path):
+    # Decode the executable segments of an ELF file. Returns the PT_LOAD
+    # segments to copy into memory, the decoded program and the entry index.
+    global labels
+    global executable_instructions
+    try:
+        program = elf_loader.read_elf_file(file_path)
+        text_base, code = program.code_image()
+    except ValueError as e:
+        print(f"Error: '{file_path}': {e}.")
+        sys.exit(1)
+    decoded_program, executable_instructions, labels, invalid_words = binary_loader.decode_image(
+        code, OPCODE_IDS, text_base)
+    set_program_layout(text_base, PC_MODELS['byte'], len(decoded_program))
+    if invalid_words:
+        print(f"Warning: {invalid_words} word(s) in '{file_path}' are not RV32I instructions and will be skipped.")
+    # Symbols inside the code become labels on top of the synthesized branch targets
+    for name, address in program.symbols.items():
+        if address in instruction_index:
+            labels[name] = address
+    if program.entry not in instruction_index:
+        print(f"Error: '{file_path}': entry point 0x{program.entry:08X} is outside the executable segments.")
+        sys.exit(1)
+    segments = [(vaddr, data) for vaddr, data, _, _ in program.segments]
+    return segments, decoded_program, instruction_index[program.entry]
 
-    else:
-        print(f"Error: Unrecognized instruction format. line='{line}'")
-        return None, None, None, None, None, None
+def decode_program(instruction_list):
+    # Decode with the labels and code layout of the loaded program
+    return assembler.decode_program(instruction_list, labels, code_base, pc_stride)
 
 def printRegisters(instruction=None):
     global program_counter
@@ -599,7 +628,7 @@ def printRegisters(instruction=None):
     if instruction:
         print(f"\n=== Executing Instruction ===\nInstruction: {instruction}\n")
 
-    display_pc = program_counter
+    display_pc = program_counter if pc_stride == 1 else f"0x{program_counter:08X}"
 
     print(f"{'='*60}")
     print(f"Program Counter (PC): {display_pc}")
@@ -623,13 +652,14 @@ def printRegisters(instruction=None):
     print('\n')
 
     # Print Memory Contents
-    print(f"{'='*22} Memory Contents {'='*22}\n")
-    if memory:
+    if dirty_since is not None:
+        print_changed_words()
+    elif memory:
+        print(f"{'='*22} Memory Contents {'='*22}\n")
         headers = ['Address (Hex)', 'Address (Dec)', 'Decimal', 'Hexadecimal', 'Binary']
         print(f"{headers[0]:<15} {headers[1]:>15} {headers[2]:>12} {headers[3]:>15} {headers[4]:>35}")
         print('-' * 100)
-        for address in sorted(memory.keys()):
-            value = memory[address]
+        for address, value in memory.items_in_range(*dump_range):
             # Convert to signed decimal for bytes
             if value & 0x80:
                 decimal_value = value - 0x100
@@ -639,178 +669,670 @@ def printRegisters(instruction=None):
             bin_value = f"0b{value:08b}"
             print(f"0x{address:08X} {address:>15} {decimal_value:>12} {hex_value:>15} {bin_value:>35}")
     else:
+        print(f"{'='*22} Memory Contents {'='*22}\n")
         print("Memory is empty.\n")
 
     # Print Labels Dictionary if available
     if labels:
         print(f"{'='*25} Labels {'='*25}\n")
         for label, addr in labels.items():
-            print(f"Label '{label}': Instruction Index {addr}")
+            if pc_stride == 1:
+                print(f"Label '{label}': Instruction Index {addr}")
+            else:
+                print(f"Label '{label}': Address 0x{addr:08X}")
     else:
         print("\nNo labels found.\n")
 
 
+def take_dirty_mark():
+    try:
+        return memory.checkpoint()
+    except ValueError as e:
+        print(f"Error: --dump-dirty-since: {e}")
+        sys.exit(1)
+
+def print_changed_words():
+    print(f"{'='*16} Memory Words Changed Since Step {dirty_since} {'='*16}\n")
+    if dirty_mark is None:
+        print(f"Step {dirty_since} has not been reached yet.\n")
+        return
+    start, end = dump_range
+    words = [address for address in memory.changed_since(dirty_mark)
+             if (start is None or start <= address + 3) and (end is None or address < end)]
+    if not words:
+        print("No memory words changed.\n")
+        return
+    headers = ['Address (Hex)', 'Address (Dec)', 'Decimal', 'Hexadecimal']
+    print(f"{headers[0]:<15} {headers[1]:>15} {headers[2]:>12} {headers[3]:>15}")
+    print('-' * 60)
+    for address in words:
+        value = int.from_bytes(memory.load_bytes(address, 4), 'little')  # Not a program load (watchpoints)
+        print(f"0x{address:08X} {address:>15} {to_signed32(value):>12} {f'0x{value:08X}':>15}")
+
 def user_input():
     file_path = input("Enter the instruction file path: ").strip()
     return file_path
 
+# Execution engines selectable from the command line
+ENGINES = ['interp', 'closure', 'block']
+
+def parse_arguments(argv=None):
+    # Any argument left out falls back to the interactive prompts
+    parser = argparse.ArgumentParser(description="RISC-V RV32I simulator")
+    parser.add_argument('program', nargs='?',
+                        help="instruction file, .bin machine code or ELF executable to run (prompted for if omitted)")
+    parser.add_argument('--start', type=int, default=None,
+                        help="starting instruction index (ELF files default to e_entry)")
+    parser.add_argument('--load-address', type=lambda value: int(value, 0), default=0,
+                        help="address a machine-code program (.bin/.img/.raw) or byte-addressed listing is loaded at")
+    parser.add_argument('--pc-model', choices=list(PC_MODELS), default=None,
+                        help="index: PC counts instructions (default for text listings), "
+                             "byte: PC is a byte address advancing by 4 (always used for machine code)")
+    parser.add_argument('--memory', default=None, help="memory initialization file")
+    parser.add_argument('--memory-backend', choices=list(memory_model.MEMORY_BACKENDS), default='paged',
+                        help="paged: 4 KiB bytearray pages, dict: one dict entry per byte")
+    parser.add_argument('--image-base', type=lambda value: int(value, 0), default=0,
+                        help="address a raw binary memory image (.bin/.img/.raw) is mapped at")
+    parser.add_argument('--image-mode', choices=list(memory_model.IMAGE_MODES), default='c',
+                        help="memory image mapping: r read-only/shared, c copy-on-write, w persist stores")
+    parser.add_argument('--engine', choices=ENGINES, default='interp',
+                        help="interp: step-by-step interpreter, "
+                             "closure: closure-compiled engine, "
+                             "block: closure engine with a basic-block cache and a JIT for hot blocks")
+    parser.add_argument('--no-jit', action='store_true',
+                        help="block engine: keep every block on closures (for debugging)")
+    parser.add_argument('--jit-threshold', type=int, default=jit.HOT_BLOCK_THRESHOLD,
+                        help="block engine: runs after which a block is compiled to Python source")
+    parser.add_argument('--trace', choices=TRACE_LEVELS, default=None,
+                        help="output per run (default: full when interactive, final for batch runs)")
+    parser.add_argument('--trace-file', default=None,
+                        help="write the delta trace to this file instead of the console")
+    parser.add_argument('--checkpoint-every', type=int, default=delta_trace_module.DEFAULT_CHECKPOINT_INTERVAL,
+                        help="steps between full-state checkpoints in the delta trace (0: initial state only)")
+    parser.add_argument('--binary-trace', default=None,
+                        help="write a binary trace record per instruction to this file "
+                             "(.gz: gzip, .zst: zstd; read it with trace_reader.py)")
+    parser.add_argument('--max-steps', type=int, default=None,
+                        help="stop after this many instructions (budget exhausted, exit status 2)")
+    parser.add_argument('--time-limit', type=float, default=None,
+                        help="stop after this many seconds of execution (budget exhausted, exit status 2)")
+    parser.add_argument('--dump-range', type=expected_state.parse_memory_range, default=None,
+                        help="only dump memory in this range, START:END (end exclusive) or START+SIZE")
+    parser.add_argument('--dump-dirty-since', type=int, default=None,
+                        help="dump only the memory words changed since this step (interp engine)")
+    parser.add_argument('--history', type=int, default=None,
+                        help="keep an undo log of this many steps for reverse execution "
+                             f"(default {undo_log_module.DEFAULT_HISTORY} with --step-back/--run-back-to)")
+    parser.add_argument('--history-checkpoint-every', type=int, default=undo_log_module.DEFAULT_CHECKPOINT_EVERY,
+                        help="undo log: steps between full-state checkpoints (0: undo entries only)")
+    parser.add_argument('--step-back', type=int, default=None,
+                        help="after the run, rewind this many steps and report the state there")
+    parser.add_argument('--run-back-to', type=lambda value: int(value, 0), default=None,
+                        help="after the run, rewind to the last time the PC held this address")
+    parser.add_argument('--break', dest='breakpoints', action='append', default=[], metavar='LOCATION',
+                        help="stop before the instruction at this label or PC, "
+                             "optionally only when a register condition holds ('loop if x5 == 3')")
+    parser.add_argument('--watch', action='append', default=[], type=debugger_module.parse_watch_range,
+                        metavar='RANGE', help="stop after a store into START:END, START+SIZE or one byte address")
+    parser.add_argument('--rwatch', action='append', default=[], type=debugger_module.parse_watch_range,
+                        metavar='RANGE', help="stop after a load from this memory range")
+    parser.add_argument('--awatch', action='append', default=[], type=debugger_module.parse_watch_range,
+                        metavar='RANGE', help="stop after a load from or store into this memory range")
+    parser.add_argument('--stop-when', action='append', default=[], metavar='CONDITION',
+                        help="stop when a register condition becomes true, e.g. 'x10 == 0' or 'x5 < -1'")
+    parser.add_argument('--debug', action='store_true',
+                        help="prompt for debugger commands at the start and at every stop "
+                             "(without it a stop ends the run)")
+    parser.add_argument('--profile', action='store_true',
+                        help="print a hot-spot table per instruction, opcode and label region after the run")
+    parser.add_argument('--profile-sample', type=int, default=profiler_module.DEFAULT_SAMPLE_EVERY,
+                        help="profiler: time one step in this many (1 times every step)")
+    parser.add_argument('--profile-top', type=int, default=20, help="profiler: rows per hot-spot table")
+    parser.add_argument('--profile-folded', default=None,
+                        help="profiler: write folded call stacks (from jal/jalr edges) for flamegraph.pl")
+    args = parser.parse_args(argv)
+    if args.trace is None:
+        args.trace = 'full' if args.program is None else 'final'
+    if args.engine != 'interp' and args.trace in ['delta', 'full']:
+        parser.error(f"--trace {args.trace} needs the step-by-step interpreter (--engine interp)")
+    if args.profile_folded:
+        args.profile = True
+    if args.history is None and (args.step_back is not None or args.run_back_to is not None):
+        args.history = undo_log_module.DEFAULT_HISTORY
+    if args.engine != 'interp' and args.dump_dirty_since is not None:
+        parser.error("--dump-dirty-since needs the step-by-step interpreter (--engine interp)")
+    if args.engine != 'interp' and args.history:
+        parser.error("--history, --step-back and --run-back-to need the step-by-step interpreter (--engine interp)")
+    if args.engine != 'interp' and (args.breakpoints or args.watch or args.rwatch or args.awatch
+                                    or args.stop_when or args.debug):
+        parser.error("--break, --watch, --rwatch, --awatch, --stop-when and --debug need the "
+                     "step-by-step interpreter (--engine interp)")
+    return args
+
+# mmap access mode for raw binary memory images (see memory_model.IMAGE_MODES)
+image_mode = 'c'
+
+def load_memory_image(image_path, base=0):
+    # Map a raw binary image as simulated RAM. Whatever was loaded before
+    # stays reachable outside the image's address range.
+    global memory
+    try:
+        memory = memory_model.MmapMemory(image_path, base, image_mode, overlay=memory)
+    except FileNotFoundError:
+        print(f"Error: Memory image '{image_path}' not found.")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
 # Function to load memory from a file (initialize memory)
-def load_memory_from_file(memory_file):
+def load_memory_from_file(memory_file, image_base=0):
     global memory
+    if memory_model.is_memory_image(memory_file):
+        load_memory_image(memory_file, image_base)
+        return
     try:
         with open(memory_file, 'r') as file:
             for line in file:
                 line = line.strip()
-                if line and not line.startswith('#'):
-                    parts = line.split(',')
-                    if len(parts) != 2:
-                        print(f"Error: Invalid memory initialization line '{line}'. Expected format 'address,value'.")
-                        continue
-                    address_str, value_str = parts
-                    address = int(address_str.strip(), 0)
-                    value = value_str.strip()
-                    if value.startswith('"') and value.endswith('"'):
-                        # Handle string values
-                        string_value = value[1:-1]
-                        for i, char in enumerate(string_value):
-                            store_byte(address + i, ord(char))
-                    elif value.startswith("'") and value.endswith("'"):
-                        # Handle character values
-                        if len(value) != 3:
-                            print(f"Error: Invalid character value '{value}'.")
-                            continue
-                        store_byte(address, ord(value[1]))
-                    else:
-                        # Handle numeric values
-                        store_word(address, int(value, 0))
+                if line.startswith('@image'):
+                    # '@image <path>[, <base>]' maps a raw binary image
+                    load_memory_image(*memory_model.parse_image_directive(line))
+                elif line and not line.startswith('#'):
+                    assembler.apply_memory_line(line, store_byte, store_word)
     except FileNotFoundError:
         print(f"Error: Memory file '{memory_file}' not found.")
         sys.exit(1)
 
-def main():
+def print_run_statistics(engine, steps, elapsed):
+    rate = steps / elapsed if elapsed > 0 else 0.0
+    print(f"Engine '{engine}': executed {steps} instructions in {elapsed:.6f}s ({rate:,.0f} instructions/s)")
+
+def make_code_rewriter(decoded_program, code, cache, engine_memory):
+    # Machine code lives in simulated memory too. A store into it re-decodes
+    # the words it touched, recompiles them and drops the cached blocks that
+    # contain them; the change is seen from the next block dispatch.
+    instruction_count = len(code)
+    def rewrite(address, size):
+        first = max(address - code_base, 0) // pc_stride
+        last = min(address + size - 1 - code_base, instruction_count * pc_stride - 1) // pc_stride
+        for index in range(first, last + 1):
+            word = memory.load_word(code_base + index * pc_stride)
+            decoded, executable_instructions[index] = binary_loader.decode_instruction(
+                word, OPCODE_IDS, index, code_base, instruction_count)
+            decoded_program[index] = decoded
+            if decoded is None:
+                code[index] = closure_engine.make_nop(index + 1)
+            else:
+                code[index] = closure_engine.compile_instruction(
+                    OPCODES[decoded[0]], decoded, index, registers, engine_memory,
+                    instruction_index, code_base, pc_stride)
+            opcode = OPCODES[decoded[0]] if decoded else None
+            cache.invalidate(index, opcode in block_cache.BLOCK_TERMINATORS)
+    return rewrite
+
+def set_trace_level(level):
+    global trace_level, log, track_writes
+    trace_level = level
+    log = print if level == 'full' else quiet
+    track_writes = level == 'delta'
+
+def report_final_state(engine, steps, elapsed):
+    # End-of-run output for the levels that do not dump state on every step
+    if trace_level == 'none':
+        return
+    if trace_level != 'full':
+        printRegisters()
+    print_run_statistics(engine, steps, elapsed)
+
+def report_budget(steps, elapsed, args):
+    # Runs stopped by --max-steps/--time-limit still report their final state
+    if args.max_steps is not None and steps >= args.max_steps:
+        print(f"Budget exhausted: step limit of {args.max_steps} instructions reached.")
+    else:
+        print(f"Budget exhausted: time limit of {args.time_limit}s reached after {steps} instructions "
+              f"({elapsed:.6f}s).")
+
+def report_profile(profiler, args):
+    if profiler is None:
+        return
+    profiler.report(args.profile_top)
+    if args.profile_folded:
+        profiler.write_folded(args.profile_folded)
+        print(f"Folded call stacks written to {args.profile_folded}")
+
+def report_rewind(args):
+    # --step-back/--run-back-to: go back before the final state is reported
+    if args.step_back is not None:
+        undone = step_back(args.step_back)
+    elif args.run_back_to is not None:
+        undone = run_back_to(args.run_back_to)
+        if undone is None:
+            print(f"Rewind: {pc_location(args.run_back_to)} was not reached in the last "
+                  f"{len(undo_log.entries)} steps.")
+            return
+    else:
+        return
+    print(f"Rewound {undone} steps to step {undo_log.steps} ({pc_location(program_counter)}).")
+
+def create_debugger(args, instruction_count):
+    # Arm the stop points given on the command line
+    created = debugger_module.Debugger(labels, instruction_index, pc_stride, instruction_count)
+    try:
+        for spec in args.breakpoints:
+            created.add_breakpoint(*debugger_module.split_breakpoint(spec))
+        for condition in args.stop_when:
+            created.add_condition(condition)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    for access, ranges in (('w', args.watch), ('r', args.rwatch), ('rw', args.awatch)):
+        for start, end in ranges:
+            created.add_watchpoint(start, end, access)
+    created.attach(memory)
+    if args.debug:
+        created.interrupt("Program start")
+    return created
+
+DEBUG_HELP = """Commands:
+  c, continue               run to the next stop
+  s, step [N]               run N instructions (default 1)
+  b, break LOCATION [if C]  breakpoint at a label or PC, C like 'x5 == 3'
+  watch/rwatch/awatch RANGE stop after a store/load/either in START:END, START+SIZE or ADDRESS
+  when CONDITION            stop when a register condition becomes true
+  d, delete N               remove breakpoint, watchpoint or condition N
+  i, info                   list breakpoints, watchpoints and conditions
+  r, regs                   show the registers
+  x ADDRESS [SIZE]          show SIZE bytes of memory (default 16)
+  back [N]                  rewind N steps (needs --history)
+  q, quit                   end the run here"""
+
+def print_debug_registers():
+    print(f"pc  {program_counter if pc_stride == 1 else f'0x{program_counter:08X}'}")
+    for row in range(0, 32, 4):
+        print("  ".join(f"x{i:<2} 0x{registers[i]:08X}" for i in range(row, row + 4)))
+
+def print_debug_memory(address, size):
+    data = memory.load_bytes(address, size)
+    for offset in range(0, size, 16):
+        chunk = data[offset:offset + 16]
+        print(f"0x{address + offset:08X}  " + " ".join(f"{value:02X}" for value in chunk))
+
+def debug_stop(reason, steps, prompt):
+    # The debugger stopped before the instruction at program_counter. With
+    # --debug, read commands until one resumes the run; returns the number
+    # of steps rewound meanwhile, or None to end the run here.
+    label = debugger.location(program_counter)
+    print(f"{reason} at {pc_location(program_counter)}" + (f" <{label}>" if label else "")
+          + f", after {steps} steps")
+    if not prompt:
+        return None
+    index = instruction_index.get(program_counter)
+    if index is not None:
+        print(f"  {executable_instructions[index]}")
+    undone = 0
+    while True:
+        try:
+            words = input("(debug) ").split()
+        except EOFError:
+            print()
+            return None
+        if not words:
+            continue
+        command, operands = words[0], words[1:]
+        try:
+            if command in ['c', 'continue']:
+                debugger.cont()
+                break
+            elif command in ['s', 'step']:
+                debugger.step(int(operands[0], 0) if operands else 1)
+                break
+            elif command in ['b', 'break'] and operands:
+                location, condition = debugger_module.split_breakpoint(" ".join(operands))
+                print(f"Breakpoint {debugger.add_breakpoint(location, condition)}")
+            elif command in ['watch', 'rwatch', 'awatch'] and len(operands) == 1:
+                access = {'watch': 'w', 'rwatch': 'r', 'awatch': 'rw'}[command]
+                print(f"Watchpoint {debugger.add_watchpoint(*debugger_module.parse_watch_range(operands[0]), access)}")
+            elif command == 'when' and operands:
+                print(f"Condition {debugger.add_condition(' '.join(operands))}")
+            elif command in ['d', 'delete'] and len(operands) == 1:
+                debugger.delete(int(operands[0]))
+            elif command in ['i', 'info']:
+                print("\n".join(debugger.describe()) or "No breakpoints, watchpoints or conditions.")
+            elif command in ['r', 'regs']:
+                print_debug_registers()
+            elif command == 'x' and operands:
+                print_debug_memory(int(operands[0], 0), int(operands[1], 0) if len(operands) > 1 else 16)
+            elif command == 'back':
+                if undo_log is None:
+                    print("Error: rewinding needs the undo log (--history)")
+                    continue
+                rewound = step_back(int(operands[0], 0) if operands else 1)
+                undone += rewound
+                print(f"Rewound {rewound} steps ({pc_location(program_counter)}).")
+            elif command in ['q', 'quit']:
+                return None
+            else:
+                print(DEBUG_HELP)
+        except ValueError as e:
+            print(f"Error: {e}")
+    debugger.resume(instruction_index.get(program_counter))
+    return undone
+
+def main(argv=None):
     global program_counter
     global labels
     global executable_instructions
+    global delta_trace
+    global memory
+    global image_mode
+    global track_writes
+    global undo_log
+    global dump_range
+    global dirty_since
+    global dirty_mark
+    global debugger
+
+    args = parse_arguments(argv)
+    interactive = args.program is None
+    if args.dump_range is not None:
+        dump_range = args.dump_range
+    dirty_since = args.dump_dirty_since
+    set_trace_level(args.trace)
+    if args.binary_trace:
+        track_writes = True  # The interpreter records from the handlers' write set
 
     # Step 1: Read the instruction file
-    file_path = user_input()
-    instruction_lines = read_instructions_from_file(file_path)
-
-    # Step 2: First pass to register labels and prepare executable instructions
-    labels = {}
-    executable_instructions = []
-    
-    for line_number, line in enumerate(instruction_lines):
-        stripped_line = line.strip()
-        
-        # Remove comments
-        if '#' in stripped_line:
-            stripped_line = stripped_line.split('#')[0].strip()
-        
-        # Skip empty lines
-        if not stripped_line:
-            continue
+    file_path = user_input() if interactive else args.program
+    machine_code = elf_loader.is_elf_file(file_path) or binary_loader.is_binary_program(file_path)
+    if machine_code and args.pc_model == 'index':
+        print("Error: Machine-code programs need the byte-addressed PC (--pc-model byte).")
+        sys.exit(1)
+    program_segments = None  # (address, bytes) copied into memory for machine-code programs
+    entry_index = None
+    if elf_loader.is_elf_file(file_path):
+        # ELF executable: PT_LOAD segments, entry point and symbols come from the file
+        program_segments, decoded_program, entry_index = load_elf_program(file_path)
+    elif binary_loader.is_binary_program(file_path):
+        # Machine code: decoded straight from the image, labels come from branch targets
+        program_image, decoded_program = load_binary_program(file_path, args.load_address)
+        program_segments = [(args.load_address, program_image)]
+    else:
+        instruction_lines = read_instructions_from_file(file_path)
+        stride = PC_MODELS[args.pc_model or 'index']
+        base = args.load_address if stride != 1 else 0
 
-        # Check for labels
-        if stripped_line.endswith(':'):
-            label_name = stripped_line[:-1].strip()
-            # Map label to the next instruction's index
-            if label_name in labels:
-                print(f"Error: Duplicate label '{label_name}' found.")
-                sys.exit(1)
-            labels[label_name] = len(executable_instructions)
-        else:
-            # Append the executable instruction
-            executable_instructions.append(stripped_line)
+        # Step 2: First pass to register labels and prepare executable instructions
+        try:
+            executable_instructions, labels = assembler.collect_labels(instruction_lines, base, stride)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        set_program_layout(base, stride, len(executable_instructions))
 
     # Debug: Print label mappings
-    print(f"\nLabel Mappings: {labels}\n")
+    if trace_level in ['delta', 'full']:
+        print(f"\nLabel Mappings: {labels}\n")
+
+    # Decode every instruction once; parse errors are reported here
+    if program_segments is None:
+        decoded_program = decode_program(executable_instructions)
 
     # Step 3: Prompt user for starting PC with validation
     instruction_count = len(executable_instructions)
-    while True:
-        try:
-            starting_pc = int(input(f"Enter the starting instruction index of the program (0 to {instruction_count -1}): ").strip())
-            if not (0 <= starting_pc < instruction_count):
-                print(f"Please enter a valid instruction index between 0 and {instruction_count -1}.")
-                continue
-            break
-        except ValueError:
-            print("Invalid input. Please enter a valid integer for the starting instruction index.")
+    if args.start is not None or not interactive or entry_index is not None:
+        if args.start is not None:
+            starting_pc = args.start
+        else:
+            starting_pc = entry_index if entry_index is not None else 0
+        if not (0 <= starting_pc < instruction_count):
+            print(f"Error: Starting instruction index {starting_pc} is not between 0 and {instruction_count -1}.")
+            sys.exit(1)
+    else:
+        while True:
+            try:
+                starting_pc = int(input(f"Enter the starting instruction index of the program (0 to {instruction_count -1}): ").strip())
+                if not (0 <= starting_pc < instruction_count):
+                    print(f"Please enter a valid instruction index between 0 and {instruction_count -1}.")
+                    continue
+                break
+            except ValueError:
+                print("Invalid input. Please enter a valid integer for the starting instruction index.")
+
+    memory = memory_model.create_memory(args.memory_backend)
+    image_mode = args.image_mode
+    for address, data in program_segments or []:
+        memory.store_bytes(address, data)
 
     # Prompt for optional memory file
-    memory_file = input("Enter the memory initialization file path (leave empty if none): ").strip()
+    if args.memory is not None or not interactive:
+        memory_file = args.memory or ''
+    else:
+        memory_file = input("Enter the memory initialization file path (leave empty if none): ").strip()
     if memory_file:
-        load_memory_from_file(memory_file)
+        load_memory_from_file(memory_file, args.image_base)
 
     # Step 4: Execute instructions
-    program_counter = starting_pc  # Initialize PC as instruction index
-    running = True  # Flag to control the execution loop
-
-    while running and 0 <= program_counter < instruction_count:
-        # Fetch the current instruction
-        line = executable_instructions[program_counter].strip()
-        original_line = line  # Preserve the original line for debugging
-
-        # Parse the instruction
-        opcode, rd, rs1, rs2, imm_or_label, offset = instruction_splitting(line)
-        if not opcode:
-            # If parsing failed, skip to the next instruction
-            program_counter += 1
-            continue
-
-        # Execute the instruction based on its opcode
-        if opcode in instructions:
-            # Branch Instructions
-            if opcode in ['BEQ', 'BNE', 'BLT', 'BGE', 'BLTU', 'BGEU']:
-                branch_taken = instructions[opcode](rs1, rs2, imm_or_label)
-                if not branch_taken:
-                    program_counter += 1
-            # Jump Instructions
-            elif opcode == 'JAL':
-                instructions[opcode](rd, imm_or_label)
-            elif opcode == 'JALR':
-                instructions[opcode](rd, rs1, imm_or_label)
-            # Immediate Arithmetic and Shift Instructions
-            elif opcode in ['ADDI', 'ANDI', 'ORI', 'XORI', 'SLTI', 'SLTIU',
-                            'SLLI', 'SRLI', 'SRAI']:
-                instructions[opcode](rd, rs1, imm_or_label)
-                program_counter += 1
-            # Register-Register Arithmetic and Logical Instructions
-            elif opcode in ['ADD', 'SUB', 'SLT', 'SLTU', 'XOR', 'OR', 'AND',
-                            'SLL', 'SRL', 'SRA']:
-                instructions[opcode](rd, rs1, rs2)
-                program_counter += 1
-            # Load Instructions
-            elif opcode in ['LW', 'LH', 'LHU', 'LB', 'LBU']:
-                instructions[opcode](rd, imm_or_label, rs1)
-                program_counter += 1
-            # Store Instructions
-            elif opcode in ['SW', 'SH', 'SB']:
-                instructions[opcode](rs2, imm_or_label, rs1)
-                program_counter += 1
-            # Upper Immediate Instructions
-            elif opcode in ['LUI', 'AUIPC']:
-                instructions[opcode](rd, imm_or_label)
-                program_counter += 1
-            # System Instructions
-            elif opcode in ['ECALL', 'EBREAK', 'FENCE', 'FENCE.TSO', 'PAUSE']:
-                instructions[opcode]()
-                program_counter += 1
+    program_counter = code_base + starting_pc * pc_stride  # Initialize PC as an address
+    trace_writer = None
+    if args.binary_trace:
+        try:
+            trace_writer = binary_trace.TraceWriter(args.binary_trace, OPCODES, code_base, pc_stride)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    profiler = None
+    if args.profile:
+        profiler = profiler_module.Profiler(decoded_program, executable_instructions, labels, OPCODES,
+                                            code_base, pc_stride, args.profile_sample)
+
+    if args.engine in ['closure', 'block']:
+        # Closure-compiled engines: no per-step trace, final state only
+        cache = None
+        engine_memory = memory
+        if args.engine == 'block' and program_segments is not None:
+            # Watch stores into the code range so self-modifying code invalidates blocks
+            code_end = code_base + len(decoded_program) * pc_stride
+            engine_memory = memory_model.WatchedMemory(memory, code_base, code_end, None)
+        code = closure_engine.compile_program(decoded_program, OPCODES, registers, engine_memory,
+                                              code_base, pc_stride)
+        if trace_writer is not None:
+            binary_trace.trace_closures(code, decoded_program, OPCODES, registers, trace_writer,
+                                        code_base, pc_stride)
+        if profiler is not None:
+            code[:] = [profiler.wrap(index, op) for index, op in enumerate(code)]
+        if args.engine == 'block':
+            compiler = None
+            # Compiled blocks bypass the closures, so profiling and tracing keep them off
+            if not args.no_jit and profiler is None and trace_writer is None:
+                compiler = jit.BlockCompiler(decoded_program, OPCODES, registers, engine_memory,
+                                             code_base, pc_stride)
+            cache = block_cache.BlockCache(code, decoded_program, OPCODES, compiler, args.jit_threshold)
+            if engine_memory is not memory:
+                engine_memory.on_write = make_code_rewriter(decoded_program, code, cache, engine_memory)
+        start_time = time.perf_counter()
+        deadline = start_time + args.time_limit if args.time_limit is not None else None
+        try:
+            if cache is not None:
+                index, steps, halted_by = cache.run(instruction_index[program_counter], args.max_steps, deadline)
             else:
-                print(f"Error: Unhandled opcode '{opcode}'")
-                program_counter += 1
-        else:
-            print(f"Error: Unknown opcode '{opcode}'")
-            program_counter += 1
+                index, steps, halted_by = closure_engine.run_program(code, instruction_index[program_counter],
+                                                                     args.max_steps, deadline)
+            program_counter = code_base + index * pc_stride
+        except PermissionError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        finally:
+            if trace_writer is not None:
+                trace_writer.close()
+        elapsed = time.perf_counter() - start_time
+        if halted_by:
+            log(f"{halted_by} - Halting")
+        budget_exhausted = not halted_by and 0 <= index < len(code)
+        if budget_exhausted:
+            report_budget(steps, elapsed, args)
+        report_final_state(args.engine, steps, elapsed)
+        if cache is not None and trace_level != 'none':
+            print(cache.statistics())
+        report_profile(profiler, args)
+        memory.close()
+        if budget_exhausted:
+            sys.exit(2)
+        if trace_level != 'none':
+            print("Program execution completed.")
+        return
+
+    if trace_level == 'delta':
+        trace_output = open(args.trace_file, 'w') if args.trace_file else sys.stdout
+        delta_trace = delta_trace_module.DeltaTrace(trace_output, args.checkpoint_every)
+        delta_trace.write_checkpoint(0, program_counter, registers, memory)
 
-        # Print the register states after execution
-        printRegisters(instruction=original_line)
+    if args.history:
+        undo_log = undo_log_module.UndoLog(registers, memory, args.history, args.history_checkpoint_every)
 
-        # Ensure x0 remains zero
-        registers[0] = 0
+    stop_map = None  # see debugger.py
+    if (args.breakpoints or args.watch or args.rwatch or args.awatch or args.stop_when or args.debug):
+        debugger = create_debugger(args, len(decoded_program))
+        stop_map = debugger.stop_map
 
-    print("Program execution completed.")
+    running = True  # Flag to control the execution loop
+    steps = 0
+    start_time = time.perf_counter()
+    step_limit = args.max_steps if args.max_steps is not None else float('inf')
+    deadline = start_time + args.time_limit if args.time_limit is not None else None
+    budget_exhausted = False
+    stopped = False  # by the debugger
+
+    # ECALL/EBREAK exit the process from inside the loop, so the final
+    # state is reported on the way out either way
+    try:
+        while running and program_counter in instruction_index:
+            # Budgets: the clock is only read every DEADLINE_CHECK_INTERVAL steps
+            if steps >= step_limit or (deadline is not None and steps
+                                       and not steps % closure_engine.DEADLINE_CHECK_INTERVAL
+                                       and time.perf_counter() >= deadline):
+                budget_exhausted = True
+                break
+            if stop_map is not None and stop_map[instruction_index[program_counter]]:
+                reason = debugger.check(instruction_index[program_counter], registers)
+                if reason is not None:
+                    undone = debug_stop(reason, steps, args.debug)
+                    if undone is None:
+                        stopped = True
+                        break
+                    steps -= undone
+                    continue
+            if steps == dirty_since and dirty_mark is None:
+                dirty_mark = take_dirty_mark()
+            steps += 1
+            pc_before = program_counter
+            if undo_log is not None:
+                undo_log.begin_step(program_counter)
+            if track_writes:
+                written_registers.clear()
+                written_addresses.clear()
+            # Fetch the current decoded instruction through the address map
+            index = instruction_index[program_counter]
+            decoded = decoded_program[index]
+            original_line = executable_instructions[index]  # Preserve the original line for debugging
+            if decoded is None:
+                # If parsing failed at load time, skip to the next instruction
+                program_counter += pc_stride
+                continue
+            op_id, rd, rs1, rs2, imm_or_label, target = decoded
+            opcode = OPCODES[op_id]
+            if profiler is not None:
+                profile_start = profiler.begin(index)
+            if trace_writer is not None and opcode in ['ECALL', 'EBREAK']:
+                trace_writer.write(pc_before, op_id)  # The handler ends the process
+
+            # Execute the instruction based on its opcode
+            if opcode in instructions:
+                # Branch Instructions
+                if opcode in ['BEQ', 'BNE', 'BLT', 'BGE', 'BLTU', 'BGEU']:
+                    branch_taken = instructions[opcode](rs1, rs2, imm_or_label, target)
+                    if not branch_taken:
+                        program_counter += pc_stride
+                # Jump Instructions
+                elif opcode == 'JAL':
+                    instructions[opcode](rd, imm_or_label, target)
+                elif opcode == 'JALR':
+                    instructions[opcode](rd, rs1, imm_or_label)
+                # Immediate Arithmetic and Shift Instructions
+                elif opcode in ['ADDI', 'ANDI', 'ORI', 'XORI', 'SLTI', 'SLTIU',
+                                'SLLI', 'SRLI', 'SRAI']:
+                    instructions[opcode](rd, rs1, imm_or_label)
+                    program_counter += pc_stride
+                # Register-Register Arithmetic and Logical Instructions
+                elif opcode in ['ADD', 'SUB', 'SLT', 'SLTU', 'XOR', 'OR', 'AND',
+                                'SLL', 'SRL', 'SRA']:
+                    instructions[opcode](rd, rs1, rs2)
+                    program_counter += pc_stride
+                # Load Instructions
+                elif opcode in ['LW', 'LH', 'LHU', 'LB', 'LBU']:
+                    instructions[opcode](rd, imm_or_label, rs1)
+                    program_counter += pc_stride
+                # Store Instructions
+                elif opcode in ['SW', 'SH', 'SB']:
+                    instructions[opcode](rs2, imm_or_label, rs1)
+                    program_counter += pc_stride
+                # Upper Immediate Instructions
+                elif opcode in ['LUI', 'AUIPC']:
+                    instructions[opcode](rd, imm_or_label)
+                    program_counter += pc_stride
+                # System Instructions
+                elif opcode in ['ECALL', 'EBREAK', 'FENCE', 'FENCE.TSO', 'PAUSE']:
+                    instructions[opcode]()
+                    program_counter += pc_stride
+                else:
+                    print(f"Error: Unhandled opcode '{opcode}'")
+                    program_counter += pc_stride
+            else:
+                print(f"Error: Unknown opcode '{opcode}'")
+                program_counter += pc_stride
+
+            if profiler is not None:
+                profiler.end(index, instruction_index.get(program_counter), profile_start)
+            if trace_writer is not None:
+                trace_writer.write_step(pc_before, op_id, registers, written_registers,
+                                        memory, written_addresses)
+
+            # Print the register states after execution
+            if trace_level == 'full':
+                printRegisters(instruction=original_line)
+            elif trace_level == 'delta':
+                delta_trace.write_step(steps, pc_before, original_line, registers, written_registers,
+                                       memory, written_addresses, program_counter)
+
+            # Ensure x0 remains zero
+            registers[0] = 0
+        if debugger is not None and not stopped and not budget_exhausted:
+            # A watchpoint hit by the last instruction
+            reason = debugger.check(None, registers)
+            if reason is not None:
+                print(f"{reason} at the end of the program, after {steps} steps")
+    except PermissionError as e:
+        # Store into a read-only memory image
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        if delta_trace:
+            delta_trace.close()
+        if trace_writer is not None:
+            trace_writer.close()
+        elapsed = time.perf_counter() - start_time
+        if budget_exhausted:
+            report_budget(steps, elapsed, args)
+        if undo_log is not None:
+            report_rewind(args)
+        report_final_state(args.engine, steps, elapsed)
+        report_profile(profiler, args)
+        memory.close()
+
+    if budget_exhausted:
+        sys.exit(2)
+    if trace_level != 'none' and not stopped:
+        print("Program execution completed.")
 
 # Dictionary of instructions
 instructions = {
@@ -0,0 +1,81 @@
+import random
+import struct
+import time
+
+import binary_loader
+from assembler import OPCODE_IDS
+from simulator import Simulator
+
+MAJOR_OPCODES = (0x33, 0x13, 0x03, 0x23, 0x63, 0x6F, 0x67, 0x37, 0x17, 0x73, 0x0F)
+
+def random_words(count, seed=1):
+    # Mostly words with a valid major opcode (random fields), some pure noise
+    rng = random.Random(seed)
+    return [rng.getrandbits(32) if rng.random() < 0.2 else rng.getrandbits(25) << 7 | rng.choice(MAJOR_OPCODES)
+            for _ in range(count)]
+
+def image_of(words):
+    return struct.pack(f'<{len(words)}I', *words)
+
+def decode_word_by_word(words, base_address):
+    decoded, listing, labels = [], [], {}
+    for index, word in enumerate(words):
+        record, line = binary_loader.decode_instruction(word, OPCODE_IDS, index, base_address, len(words))
+        decoded.append(record)
+        listing.append(line)
+        if record is not None and record[5] is not None:
+            labels[record[4]] = base_address + record[5] * 4
+    return decoded, listing, labels
+
+def test_decode_image_matches_single_word_decoder():
+    words = random_words(20000) + [0x00000073, 0x00100073, 0x8330000F, 0x0100000F, 0x0000100F]
+    base_address = 0x1000
+    decoded, listing, labels, invalid_words = binary_loader.decode_image(image_of(words), OPCODE_IDS, base_address)
+    expected_decoded, expected_listing, expected_labels = decode_word_by_word(words, base_address)
+    assert decoded == expected_decoded
+    assert list(listing) == expected_listing
+    assert list(labels.items()) == list(expected_labels.items())
+    assert invalid_words == expected_decoded.count(None)
+
+def test_repetitive_image_decodes_like_distinct_words():
+    body = random_words(64, seed=2)
+    words = body * 200
+    decoded, _, labels, _ = binary_loader.decode_image(image_of(words), OPCODE_IDS)
+    expected_decoded, _, expected_labels = decode_word_by_word(words, 0)
+    assert decoded == expected_decoded
+    assert labels == expected_labels
+
+def test_listing_lines_can_be_replaced():
+    _, listing, _, _ = binary_loader.decode_image(image_of([0x00500093, 0x00000073]), OPCODE_IDS)
+    listing[-1] = 'NOP'
+    assert list(listing) == ['ADDI x1, x0, 5', 'NOP']
+    assert listing[0:1] == ['ADDI x1, x0, 5']
+
+def test_binary_program_checkpoint_saves_listing(tmp_path):
+    program = tmp_path / 'program.bin'
+    program.write_bytes(image_of([0x00500093, 0x00000073]))
+    sim = Simulator()
+    sim.load(str(program))
+    sim.run()
+    path = str(tmp_path / 'saved.ckpt')
+    sim.save_checkpoint(path)
+    restored = Simulator()
+    restored.load_checkpoint(path)
+    assert list(restored.executable_instructions) == list(sim.executable_instructions)
+
+def test_decode_image_is_faster_than_word_by_word():
+    # A 4 MiB image of distinct words, against decode_instruction() over a
+    # sample scaled up to the whole image (about 1.3 s and 2.4-3.2 s on a
+    # slow single core)
+    words = random_words(1 << 20, seed=3)
+    image = image_of(words)
+    start = time.perf_counter()
+    binary_loader.decode_image(image, OPCODE_IDS)
+    elapsed = time.perf_counter() - start
+
+    sample = words[:1 << 16]
+    start = time.perf_counter()
+    for index, word in enumerate(sample):
+        binary_loader.decode_instruction(word, OPCODE_IDS, index, 0, len(sample))
+    word_by_word = (time.perf_counter() - start) * (len(words) / len(sample))
+    assert elapsed < word_by_word
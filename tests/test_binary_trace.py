@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+import binary_trace
+from conftest import ROOT
+
+# Stores below address 0 wrap to the top of the 32-bit space in the trace
+NEGATIVE_STORES = """\
+ADDI x1, x0, 7
+ADDI x2, x0, -3
+SW x1, -4(x0)
+SH x2, -8(x0)
+SB x1, 8(x0)
+LW x3, -4(x0)
+EBREAK
+"""
+
+def write_trace(program, engine, trace_path):
+    subprocess.run([sys.executable, os.path.join(ROOT, 'store_load.py'), str(program),
+                    '--engine', engine, '--trace', 'none', '--binary-trace', str(trace_path)],
+                   check=True, capture_output=True)
+    with open(trace_path, 'rb') as file:
+        return file.read()
+
+def test_negative_store_traces_match_across_engines(tmp_path):
+    program = tmp_path / 'negative_stores.txt'
+    program.write_text(NEGATIVE_STORES)
+    interp = write_trace(program, 'interp', tmp_path / 'interp.trace')
+    closure = write_trace(program, 'closure', tmp_path / 'closure.trace')
+    assert interp == closure
+
+    reader = binary_trace.TraceReader(str(tmp_path / 'interp.trace'))
+    addresses = [record[5] for record in reader if record[3] & binary_trace.FLAG_MEMORY]
+    reader.close()
+    assert addresses == [0xFFFFFFFC, 0xFFFFFFF8, 8]
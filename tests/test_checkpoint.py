@@ -0,0 +1,37 @@
+import pytest
+
+from simulator import Simulator
+
+NEGATIVE_STORES = """\
+ADDI x1, x0, 7
+ADDI x2, x0, -3
+SW x1, -4(x0)
+SH x2, -8(x0)
+SB x1, 8(x0)
+EBREAK
+"""
+
+@pytest.mark.parametrize('memory_backend', ['paged', 'dict'])
+def test_round_trip_with_negative_addresses(tmp_path, memory_backend):
+    program = tmp_path / 'negative_stores.txt'
+    program.write_text(NEGATIVE_STORES)
+    sim = Simulator(memory_backend)
+    sim.load(str(program))
+    sim.run()
+    path = str(tmp_path / 'saved.ckpt')
+    sim.save_checkpoint(path)
+
+    restored = Simulator(memory_backend)
+    restored.load_checkpoint(path)
+    assert dict(restored.memory.items_in_range()) == dict(sim.memory.items_in_range())
+    assert restored.memory.load_bytes(-8, 2) == b'\xfd\xff'
+    assert restored.registers == sim.registers
+    assert (restored.program_counter, restored.steps) == (sim.program_counter, sim.steps)
+
+def test_save_reports_unpackable_state_as_value_error(tmp_path):
+    sim = Simulator()
+    sim.registers[5] = 1 << 40
+    path = tmp_path / 'bad.ckpt'
+    with pytest.raises(ValueError):
+        sim.save_checkpoint(str(path))
+    assert not path.exists()
@@ -0,0 +1,126 @@
+import argparse
+import sys
+
+import binary_trace
+from binary_trace import FLAG_MEMORY, FLAG_REGISTER
+
+# Reader for binary traces written with store_load.py --binary-trace.
+#
+#     python trace_reader.py run.trace.gz --opcode SW --from-step 1000 --limit 20
+#     python trace_reader.py run.trace --register x10
+#     python trace_reader.py run.trace.zst --stats
+#
+# Each selected step prints as one line:
+#
+#        1042 pc=0x00000010 SW      [0x00001004]=0x0000002A (4 bytes)
+#
+# Filters combine: a step is shown only if it matches all of them.
+
+def parse_number(text):
+    return int(text, 0)
+
+def parse_register(text):
+    number = int(text[1:]) if text[:1] in 'xX' else int(text)
+    if not 0 <= number < 32:
+        raise argparse.ArgumentTypeError(f"invalid register '{text}'")
+    return number
+
+def format_pc(pc, pc_stride):
+    return f"{pc:<10}" if pc_stride == 1 else f"0x{pc:08X}"
+
+def format_record(step, record, opcodes, pc_stride):
+    pc, op_id, rd, flags, value, address, stored = record
+    line = f"{step:>10} pc={format_pc(pc, pc_stride)} {opcodes[op_id]:<7}"
+    if flags & FLAG_REGISTER:
+        line += f" x{rd}=0x{value:08X}"
+    if flags & FLAG_MEMORY:
+        size = binary_trace.store_size(flags)
+        line += f" [0x{address:08X}]=0x{stored:0{2 * size}X} ({size} bytes)"
+    return line.rstrip()
+
+def make_filter(args, opcodes):
+    # Returns a predicate over records, or None to keep every record
+    tests = []
+    if args.pc is not None:
+        tests.append(lambda record: record[0] == args.pc)
+    if args.opcode is not None:
+        opcode = args.opcode.upper()
+        if opcode not in opcodes:
+            raise ValueError(f"opcode '{args.opcode}' does not appear in this trace's opcode table")
+        op_id = opcodes.index(opcode)
+        tests.append(lambda record: record[1] == op_id)
+    if args.register is not None:
+        tests.append(lambda record: record[3] & FLAG_REGISTER and record[2] == args.register)
+    if args.address is not None:
+        tests.append(lambda record: record[3] & FLAG_MEMORY
+                     and record[5] <= args.address < record[5] + binary_trace.store_size(record[3]))
+    if not tests:
+        return None
+    return lambda record: all(test(record) for test in tests)
+
+def print_statistics(reader, selected, write=print):
+    counts = {}
+    steps = registers = stores = 0
+    for _, record in selected:
+        steps += 1
+        counts[record[1]] = counts.get(record[1], 0) + 1
+        registers += bool(record[3] & FLAG_REGISTER)
+        stores += bool(record[3] & FLAG_MEMORY)
+    write(f"{steps} steps, {registers} register writes, {stores} stores")
+    if not steps:
+        return
+    for op_id, count in sorted(counts.items(), key=lambda item: item[1], reverse=True):
+        write(f"  {reader.opcodes[op_id]:<10} {count:>12} {100 * count / steps:>6.2f}%")
+
+def select_records(reader, args):
+    # (step, record) pairs in the step window that pass the filters
+    keep = make_filter(args, reader.opcodes)
+    shown = 0
+    for step, record in enumerate(reader, 1):
+        if step < args.from_step:
+            continue
+        if args.to_step is not None and step > args.to_step:
+            break
+        if keep is None or keep(record):
+            yield step, record
+            shown += 1
+            if args.limit is not None and shown >= args.limit:
+                break
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Decode and filter a binary RV32I execution trace")
+    parser.add_argument('trace', help="trace file (.gz and .zst are decompressed)")
+    parser.add_argument('--pc', type=parse_number, default=None, help="only steps at this PC")
+    parser.add_argument('--opcode', default=None, help="only steps executing this opcode")
+    parser.add_argument('--register', type=parse_register, default=None, help="only steps writing this register")
+    parser.add_argument('--address', type=parse_number, default=None, help="only stores covering this address")
+    parser.add_argument('--from-step', type=int, default=1, help="first step to consider (steps count from 1)")
+    parser.add_argument('--to-step', type=int, default=None, help="last step to consider")
+    parser.add_argument('--limit', type=int, default=None, help="stop after this many matching steps")
+    parser.add_argument('--stats', action='store_true', help="print per-opcode counts instead of the steps")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    try:
+        reader = binary_trace.TraceReader(args.trace)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    try:
+        selected = select_records(reader, args)
+        if args.stats:
+            print_statistics(reader, selected)
+        else:
+            for step, record in selected:
+                print(format_record(step, record, reader.opcodes, reader.pc_stride))
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    except BrokenPipeError:
+        sys.stderr.close()  # e.g. piped into head
+    finally:
+        reader.close()
+
+if __name__ == "__main__":
+    main()
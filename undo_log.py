@@ -0,0 +1,111 @@
+import collections
+
+import memory_model
+
+# Undo log for reverse execution.
+#
+# While the interpreter runs, every step appends one entry to a ring buffer
+# holding the PC before the step and what the step overwrote:
+#
+#     (pc, [(rd, old value), (address, old bytes, old written mask), ...])
+#
+# The handlers add the changes (see store_load.write_register/store_*), so
+# an entry is only as large as the instruction's write set. Every
+# `checkpoint_every` steps the whole state is also kept: registers, PC and
+# a memory checkpoint, which for paged memory shares its pages copy-on-write
+# (see memory_model.py).
+#
+# rewind() goes back to any step still in the window without executing
+# anything: it restores the nearest later checkpoint, if there is one, and
+# undoes the remaining entries newest first. The buffer keeps at most
+# `history` steps, and checkpoints older than the window are dropped, so
+# memory use is bounded by the window whatever the run length.
+
+DEFAULT_HISTORY = 100000
+DEFAULT_CHECKPOINT_EVERY = 10000
+
+class UndoLog:
+    def __init__(self, registers, memory, history=DEFAULT_HISTORY, checkpoint_every=DEFAULT_CHECKPOINT_EVERY):
+        self.registers = registers
+        self.memory = memory
+        self.entries = collections.deque(maxlen=history)
+        self.checkpoints = collections.deque()  # (step, pc, registers, memory state), oldest first
+        self.checkpoint_every = checkpoint_every
+        self.steps = 0       # steps recorded so far, minus those rewound
+        self.changes = None  # change list of the current step
+        self.next_checkpoint = None
+        self.schedule_checkpoint()
+
+    def schedule_checkpoint(self):
+        if self.checkpoint_every:
+            self.next_checkpoint = (self.steps // self.checkpoint_every + 1) * self.checkpoint_every
+        else:
+            self.next_checkpoint = float('inf')
+
+    def begin_step(self, pc):
+        # Called before each step executes
+        if self.steps >= self.next_checkpoint:
+            self.take_checkpoint(pc)
+        self.changes = []
+        self.entries.append((pc, self.changes))
+        self.steps += 1
+
+    def take_checkpoint(self, pc):
+        try:
+            state = self.memory.checkpoint()
+        except ValueError:
+            self.checkpoint_every = 0  # Mode 'w' images: entries only
+            self.schedule_checkpoint()
+            return
+        self.schedule_checkpoint()
+        self.checkpoints.append((self.steps, pc, tuple(self.registers), state))
+        while self.checkpoints and self.checkpoints[0][0] < self.oldest_step():
+            self.checkpoints.popleft()
+
+    def record_register(self, rd, old_value):
+        self.changes.append((rd, old_value))
+
+    def record_store(self, address, size):
+        # Called before the store, while the old bytes are still in memory
+        self.changes.append((address, self.memory.load_bytes(address, size),
+                             self.memory.written_mask(address, size)))
+
+    def oldest_step(self):
+        return self.steps - len(self.entries)
+
+    def rewind(self, step):
+        # Go back to the state after `step` steps, before the next one ran.
+        # Returns the PC at that point (None when nothing was rewound).
+        if not self.oldest_step() <= step <= self.steps:
+            raise ValueError(f"step {step} is outside the history window "
+                             f"(steps {self.oldest_step()} to {self.steps})")
+        pc = None
+        later = [checkpoint for checkpoint in self.checkpoints if checkpoint[0] >= step]
+        if later:
+            # Jump to the nearest checkpoint and forget the entries after it
+            checkpoint_step, pc, registers, state = later[0]
+            self.registers[:] = registers
+            self.memory = memory_model.restore_memory(self.memory, state)
+            for _ in range(self.steps - checkpoint_step):
+                self.entries.pop()
+            self.steps = checkpoint_step
+        while self.steps > step:
+            pc, changes = self.entries.pop()
+            for change in reversed(changes):
+                if len(change) == 2:
+                    self.registers[change[0]] = change[1]
+                else:
+                    self.memory.revert_bytes(*change)
+            self.steps -= 1
+        while self.checkpoints and self.checkpoints[-1][0] > step:
+            self.checkpoints.pop()
+        self.changes = None
+        self.schedule_checkpoint()
+        return pc
+
+    def find_pc(self, pc):
+        # Latest step count in the window at which the PC was `pc`, or None
+        for back, (entry_pc, _) in enumerate(reversed(self.entries)):
+            if entry_pc == pc:
+                return self.steps - 1 - back
+        return None